@@ -2,6 +2,7 @@
 Base.py — PDF to Markdown extraction (Stage 1 of the 3-stage pipeline).
 
 Converts a PDF file to Markdown text + extracted images using the Marker library.
+Images are filtered and shrunk before saving (image_prep.py).
 Called as a subprocess by main.py's run_processing_pipeline().
 
 Usage: python Base.py <path_to_pdf_file> [optional_output_dir]
@@ -11,8 +12,7 @@ from marker.converters.pdf import PdfConverter    # Marker's PDF-to-rendered-out
 from marker.models import create_model_dict       # Create the model artifact dictionary needed by PdfConverter
 from marker.output import text_from_rendered       # Extract markdown text and image objects from rendered output
 from pathlib import Path                           # Object-oriented filesystem path construction
-from io import BytesIO                             # In-memory binary buffer — holds image bytes before writing
-                                                   # to disk, avoids creating intermediate temp files for each image
+from image_prep import prepare_images, rewrite_image_links  # Drop tiny/blank images, downsize + recompress the rest
 import sys                                         # CLI argument parsing (sys.argv) and exit on error (sys.exit)
 
 # --- Configuration: parse CLI arguments ---
@@ -38,9 +38,12 @@ print(f"Output directory set to: {output_dir}")
 
 # --- 1. Setup Converter and Process PDF ---
 # Initialize Marker's PdfConverter with default model dict and run it on the PDF.
+# paginate_output emits "{N}-----" page separators, which Emmbed.py's chunker
+# turns into per-chunk page metadata.
 print(f"Initializing Marker converter for: {pdf_filename}")
 converter = PdfConverter(
     artifact_dict=create_model_dict(),
+    config={"paginate_output": True},
 )
 rendered = converter(pdf_filename)
 
@@ -49,9 +52,19 @@ rendered = converter(pdf_filename)
 print("Extracting text and images...")
 text, _, images = text_from_rendered(rendered)
 
-# --- 3. Save the Markdown text file ---
+# --- 3. Filter, downsize and save the image files ---
+# Icons, bullets, decorative rules and blank fills are dropped; the rest are
+# downsized and recompressed (see image_prep.py) so Stage 2 uploads less and
+# makes fewer vision-model calls.
+print(f"\nPreparing {len(images)} images...")
+dropped, renamed, stats = prepare_images(images, output_dir)
+print(f"Kept {stats['kept']} images ({stats['bytes_after'] // 1024} KB), dropped {stats['dropped']}")
+
+# --- 4. Save the Markdown text file ---
 # Named after the output folder (e.g., folder "doc1" → "doc1.md").
+# Links to dropped images are removed and re-encoded images are renamed.
 md_filename = output_dir / f"{output_dir.name}.md"
+text = rewrite_image_links(text, dropped, renamed)
 
 try:
     with open(md_filename, "w", encoding="utf-8") as f:
@@ -60,32 +73,4 @@ try:
 except Exception as e:
     print(f"An error occurred while writing the MD file: {e}")
 
-# --- 4. Save the image files ---
-# Iterate extracted images, determine format (PNG/JPEG), and write to output dir.
-print(f"\nSaving {len(images)} images...")
-for filename, image_object in images.items():
-    image_path = output_dir / filename
-    
-    byte_io = BytesIO()
-    
-    try:
-        # Determine image format
-        img_format = image_path.suffix.lstrip('.').upper()
-        if img_format not in ['JPEG', 'JPG', 'PNG']:
-            print(f"Warning: Unknown image format '{img_format}' for {filename}. Defaulting to PNG.")
-            img_format = 'PNG'
-            image_path = image_path.with_suffix('.png')
-
-        # Fix for JPG/JPEG mapping
-        if img_format == 'JPG': img_format = 'JPEG'
-
-        image_object.save(byte_io, format=img_format)
-        image_data = byte_io.getvalue()
-        
-        with open(image_path, "wb") as f:
-            f.write(image_data)
-        
-    except Exception as e:
-        print(f"An error occurred while writing image {filename}: {e}")
-
-print(f"Processing complete for {pdf_filename}.")
\ No newline at end of file
+print(f"Processing complete for {pdf_filename}.")
@@ -1,82 +1,105 @@
 """
 Emmbed.py — Document chunking & embedding storage (Stage 3 / final stage of the pipeline).
 
-Chunks a processed markdown file into 512-character segments with 50-char overlap,
-generates vector embeddings using BGE-large-en-v1.5, and stores them in a
-ChromaDB collection for later retrieval by the RAG chain.
+Chunks a processed markdown file on heading/table boundaries into segments of at
+most CHUNK_MAX_TOKENS tokens of the embedding model's tokenizer (see md_chunker.py),
+generates vector embeddings with the configured embedding backend (see
+embedding_backend.py), and stores them in a ChromaDB collection for later
+retrieval by the RAG chain.
 
-Usage: python Emmbed.py <path_to_markdown_file> <collection_name> <chroma_db_path>
+Running headers/footers are stripped before chunking and exact/near-duplicate
+chunks are dropped after it (see chunk_dedup.py), so repeated text is embedded once.
+
+Each upload gets its own collection (u_{userId}_{docName}), created and filled
+here before the server ever opens it; ChromaDB's persistent client must not
+write a collection that another process has open. Re-uploading a document
+replaces its collection.
+
+Usage: python Emmbed.py <path_to_markdown_file> <collection_name> <chroma_db_path> [doc_id]
 """
 
 import chromadb                          # ChromaDB vector database — PersistentClient for storing embeddings
-from sentence_transformers import SentenceTransformer  # Load BGE-large model to generate vector embeddings
-from langchain_community.document_loaders import UnstructuredMarkdownLoader  # Parse markdown files into LangChain Documents
-from langchain_text_splitters import RecursiveCharacterTextSplitter          # Split documents into fixed-size overlapping chunks
+from embedding_backend import (          # Configured embedding backend (sentence-transformers or ONNX int8)
+    get_embeddings,
+    collection_metadata,
+    get_token_counter,                   # Token counting with the embedding model's tokenizer
+    EMBEDDING_MAX_TOKENS,
+)
+from md_chunker import chunk_markdown    # Heading/table-aware, token-sized markdown chunker
+from chunk_dedup import strip_boilerplate, dedup_chunks  # Drop repeated headers/footers and duplicate chunks
 import uuid                              # Generate unique IDs for each chunk stored in ChromaDB
 import time                              # Measure embedding generation duration
 import sys                               # CLI argument parsing (sys.argv) and exit on error (sys.exit)
-import torch                             # Check GPU availability via torch.cuda.is_available()
 
 # --- 1. Configuration: parse CLI arguments ---
 
 if len(sys.argv) < 4:
     print("Error: Missing arguments.")
-    print("Usage: python Emmbed.py <path_to_markdown_file> <collection_name> <chroma_db_path>")
+    print("Usage: python Emmbed.py <path_to_markdown_file> <collection_name> <chroma_db_path> [doc_id]")
     sys.exit(1)
 
 # Data Configuration
 MARKDOWN_FILE = sys.argv[1]
-CHUNK_SIZE = 512
-CHUNK_OVERLAP = 50
+# Leave headroom below bge's 512-token window for [CLS]/[SEP] and the section-path prefix slack.
+CHUNK_MAX_TOKENS = EMBEDDING_MAX_TOKENS - 64
 
 # Collection and DB Configuration
 COLLECTION_NAME = sys.argv[2]
 CHROMA_PATH = sys.argv[3]  # <--- NEW: Dynamic DB Path
-
-# Embedding Model Configuration
-MODEL_NAME = "BAAI/bge-large-en-v1.5"
+DOC_ID = sys.argv[4] if len(sys.argv) >= 5 else None  # Uploaded document (tagged on every chunk)
 
 # --- 2. Load Embedding Model ---
-# Load BGE-large-en-v1.5 sentence transformer on GPU if available, else CPU.
-print(f"Loading embedding model: {MODEL_NAME}...")
-model = SentenceTransformer(MODEL_NAME, device="cuda" if torch.cuda.is_available() else "cpu")
+# Backend and model are selected via EMBEDDING_BACKEND / EMBEDDING_MODEL_NAME.
+model = get_embeddings()
 print("Model loaded.")
 
 # --- 3. Load, Chunk, and Prepare Document ---
-# Use LangChain's UnstructuredMarkdownLoader + RecursiveCharacterTextSplitter
-# to split the markdown into 512-char chunks with 50-char overlap.
+# Split on heading/table boundaries into token-sized chunks; each chunk carries
+# its section path and starting page in metadata.
 print(f"Loading and splitting document: {MARKDOWN_FILE}...")
-loader = UnstructuredMarkdownLoader(MARKDOWN_FILE)
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=CHUNK_SIZE,
-    chunk_overlap=CHUNK_OVERLAP
-)
-
-docs = loader.load_and_split(text_splitter=text_splitter)
-print(f"Document split into {len(docs)} chunks.")
-
-texts = [doc.page_content for doc in docs]
-metadatas = [doc.metadata for doc in docs]
+with open(MARKDOWN_FILE, "r", encoding="utf-8") as f:
+    markdown_text = f.read()
+
+markdown_text, boilerplate_lines = strip_boilerplate(markdown_text)
+print(f"Removed {boilerplate_lines} repeated header/footer lines.")
+
+chunks = chunk_markdown(markdown_text, get_token_counter(), max_tokens=CHUNK_MAX_TOKENS)
+print(f"Document split into {len(chunks)} chunks.")
+chunks, dedup_stats = dedup_chunks(chunks)
+print(f"Dropped {dedup_stats['exact']} exact and {dedup_stats['near']} near-duplicate chunks; "
+      f"{len(chunks)} left to embed.")
+
+texts = [text for text, _ in chunks]
+uploaded_at = time.time()
+metadatas = [{"source": MARKDOWN_FILE, **metadata} for _, metadata in chunks]
+if DOC_ID:
+    for metadata in metadatas:
+        metadata["doc_id"] = DOC_ID
+        metadata["uploaded_at"] = uploaded_at
 ids = [str(uuid.uuid4()) for _ in texts]
 
 # --- 4. Generate Embeddings ---
-# Encode all chunks with normalized embeddings using the sentence transformer.
+# Encode all chunks; both backends return normalized embeddings.
 print("Generating embeddings for all chunks...")
 start_time = time.time()
-embeddings = model.encode(
-    texts,
-    normalize_embeddings=True,
-    show_progress_bar=True
-)
+embeddings = model.embed_documents(texts)
 end_time = time.time()
 print(f"Embeddings generated in {end_time - start_time:.2f} seconds.")
 
 # --- 5. Initialize ChromaDB and Store Data ---
-# Create/get the collection and insert all chunks with embeddings, metadata, and UUIDs.
+# Create a fresh collection and insert all chunks with embeddings, metadata, and UUIDs.
+# The collection records its embedding model and upload time (used by the storage reaper).
 print(f"Initializing ChromaDB at: {CHROMA_PATH}")
 client = chromadb.PersistentClient(path=CHROMA_PATH)
 
-collection = client.get_or_create_collection(name=COLLECTION_NAME)
+if COLLECTION_NAME in [c if isinstance(c, str) else c.name for c in client.list_collections()]:
+    # Re-upload of the same document: replace its old collection.
+    client.delete_collection(COLLECTION_NAME)
+
+collection = client.create_collection(
+    name=COLLECTION_NAME,
+    metadata={**collection_metadata(), "uploaded_at": uploaded_at, "last_access": uploaded_at},
+)
 
 print(f"Adding {len(texts)} chunks to the '{COLLECTION_NAME}' collection...")
 collection.add(
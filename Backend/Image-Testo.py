@@ -6,6 +6,10 @@ to Ollama's Qwen3 vision model for a text description, and replaces the
 image links with the AI-generated descriptions. This ensures images
 (charts, tables, diagrams) become searchable text in the vector store.
 
+Small figures from the same page are packed into one request (up to
+IMAGE_PACK_MAX images) to cut vision-model calls; Base.py has already
+dropped icons and decorative images and shrunk the rest.
+
 Usage: python Image-Testo.py <input_md_file> <image_directory> <output_md_file>
 """
 
@@ -14,6 +18,8 @@ from ollama import chat, ChatResponse    # chat: send images to Ollama vision mo
 import os                                # os.path.join/exists for image file path construction and validation
 import sys                               # CLI argument parsing (sys.argv) and exit on error (sys.exit)
 import subprocess                        # Run 'ollama run' to ensure the vision model is pulled/available
+from PIL import Image                    # Read image sizes to decide which figures can share a request
+from image_prep import page_of           # Page number from Marker image filenames
 
 # --- Configuration: parse CLI arguments ---
 if len(sys.argv) < 4:
@@ -50,6 +56,17 @@ def ensure_model_available():
 
 # Pull the vision model at script startup so it's ready for image captioning.
 ensure_model_available()
+
+# Figures whose sides are all <= IMAGE_PACK_MAX_SIDE px may share a request.
+IMAGE_PACK_MAX_SIDE = int(os.getenv("IMAGE_PACK_MAX_SIDE", "512"))
+IMAGE_PACK_MAX = int(os.getenv("IMAGE_PACK_MAX", "4"))
+PACKED_PROMPT = (
+    'You are given {count} images, numbered 1 to {count} in the order provided. '
+    'For each image, describe its content concisely and precisely, focusing on any numerical data present. '
+    'Answer with exactly one line per image in the form "Image <number>: <description>".'
+)
+PACKED_LINE_PATTERN = re.compile(r'^\s*\**Image\s+(\d+)\**\s*[:.-]\s*(.+)$', re.IGNORECASE | re.MULTILINE)
+vision_calls = 0              # Requests sent to the vision model, reported at the end
 PROMPT = 'Describe the content of this image concisely and precisely, focusing on any numerical data present. If no numerical data is present, simply describe the image.'
 # ---------------------
 
@@ -70,7 +87,9 @@ def get_image_description(image_filename: str) -> str:
         print(f"Warning: Image file not found at '{image_path}'. Returning placeholder.")
         return f"[[Image Missing: {image_path}]]"
 
+    global vision_calls
     print(f"-> Sending image '{image_path}' to model...")
+    vision_calls += 1
     try:
         response: ChatResponse = chat(
             model=MODEL_NAME, 
@@ -96,6 +115,72 @@ def get_image_description(image_filename: str) -> str:
         return f"[[ERROR: Could not get description for {image_path}]]"
 
 
+def get_packed_descriptions(image_filenames: list[str]) -> dict | None:
+    """Caption several images with one vision-model request.
+    Returns {filename: description markdown}, or None if the reply could not
+    be matched back to every image (the caller then captions them one by one)."""
+    global vision_calls
+    image_paths = [os.path.join(IMAGE_DIRECTORY, name) for name in image_filenames]
+    print(f"-> Sending {len(image_paths)} images from one page to model in a single request...")
+    vision_calls += 1
+    try:
+        response: ChatResponse = chat(
+            model=MODEL_NAME,
+            messages=[
+                {
+                    'role': 'user',
+                    'content': PACKED_PROMPT.format(count=len(image_paths)),
+                    'images': image_paths
+                },
+            ],
+            stream=False
+        )
+    except Exception as e:
+        print(f"Error calling Ollama for packed images {image_filenames}: {e}")
+        return None
+
+    lines = {int(n): text.strip() for n, text in PACKED_LINE_PATTERN.findall(response.message.content)}
+    if set(lines) != set(range(1, len(image_filenames) + 1)):
+        print("   <- Packed reply did not cover every image; falling back to single requests.")
+        return None
+    return {
+        name: f"\n> **Image Description:** {lines[i + 1]}\n"
+        for i, name in enumerate(image_filenames)
+    }
+
+
+def describe_images(image_filenames: list[str]) -> dict:
+    """Caption every image, packing small figures from the same page into
+    shared requests. Returns {filename: description markdown}."""
+    descriptions = {}
+    packable = {}                # page -> [small image filenames]
+    for name in image_filenames:
+        image_path = os.path.join(IMAGE_DIRECTORY, name)
+        page = page_of(name)
+        if page is not None and os.path.exists(image_path):
+            try:
+                with Image.open(image_path) as image:
+                    if max(image.size) <= IMAGE_PACK_MAX_SIDE:
+                        packable.setdefault(page, []).append(name)
+                        continue
+            except Exception as e:
+                print(f"Warning: Could not read '{image_path}': {e}")
+        descriptions[name] = get_image_description(name)
+
+    for names in packable.values():
+        for i in range(0, len(names), IMAGE_PACK_MAX):
+            group = names[i:i + IMAGE_PACK_MAX]
+            packed = get_packed_descriptions(group) if len(group) > 1 else None
+            if packed is None:
+                for name in group:
+                    descriptions[name] = get_image_description(name)
+            else:
+                descriptions.update(packed)
+
+    print(f"Captioned {len(image_filenames)} images with {vision_calls} vision-model calls.")
+    return descriptions
+
+
 def replace_images_in_readme(input_file: str, output_file: str):
     """Read the markdown file, find all ![alt](path) patterns via regex,
     replace each with the vision model's AI-generated description,
@@ -111,16 +196,16 @@ def replace_images_in_readme(input_file: str, output_file: str):
     # The image path is captured in Group 1.
     IMAGE_MARKDOWN_PATTERN = re.compile(r'!\[.*?\]\((.*?)\)')
     
+    print(f"\n--- Starting image replacement in '{input_file}' ---")
+
+    # Caption all images up front so same-page figures can share a request.
+    image_filenames = list(dict.fromkeys(IMAGE_MARKDOWN_PATTERN.findall(content)))
+    descriptions = describe_images(image_filenames)
+
     def replacer(match):
         """Replacement function called for every match found by re.sub."""
         # The captured group 1 contains the image filename/path
-        image_filename = match.group(1) 
-        # Get the description using the full path
-        description = get_image_description(image_filename)
-        # Return the description string to replace the original markdown
-        return description
-
-    print(f"\n--- Starting image replacement in '{input_file}' ---")
+        return descriptions[match.group(1)]
     
     # Use re.sub with a function to process each match
     modified_content = IMAGE_MARKDOWN_PATTERN.sub(replacer, content)
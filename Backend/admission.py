@@ -0,0 +1,401 @@
+"""
+admission.py — Admission control and load shedding per request class.
+
+PDF pipelines, transcription and chat all compete for the same cores, so each
+class gets its own budget of in-flight requests (ADMIT_<CLASS>_CONCURRENCY)
+and a bounded queue behind it (ADMIT_<CLASS>_MAX_QUEUE):
+
+    chat        priority 0   RAG answers (/chat)
+    transcribe  priority 1   /transcribe-audio/ and /ws/transcribe sessions
+    upload      priority 2   PDF processing pipelines
+    batch       priority 3   /chat/batch question lists
+
+A request beyond budget + queue, or one that waited longer than
+ADMIT_<CLASS>_MAX_WAIT seconds (0 = no limit), is shed with Overloaded, which
+main.py turns into 429 + Retry-After. Lower-priority classes do not start new
+work while a higher-priority class has requests queued, so a burst of uploads
+never delays chat. Retry-After and the /queue-status wait estimates come from
+a moving average of each class's service time.
+
+Budgets are totals for the whole server, however many gunicorn workers
+(WEB_WORKERS) it runs:
+
+    - Upload and batch slots and queues live in the shared SQLite store
+      (shared_state.py) as one FIFO per class for all workers. A queued or
+      running request holds a ticket lease that its worker renews; the
+      ticket of a crashed worker expires after SHARED_LEASE_SECONDS and
+      frees its slot.
+    - Chat and transcribe slots are held by a worker's event loop, so each
+      worker admits against an even share, ceil(budget / WEB_WORKERS).
+    - Every worker publishes its queue depths to the shared store once per
+      HEARTBEAT_SECONDS (heartbeat()). The priority rule and /queue-status
+      use the sums over all workers, so chat queued in any worker holds
+      back uploads everywhere.
+"""
+
+import os                        # os.getenv() for per-class budgets; getpid() keys this worker's depths
+import math                      # Round wait estimates up to whole seconds
+import time                      # monotonic() for queue wait and service time; time() for ticket leases
+import uuid                      # Tickets for the shared upload/batch queues
+import asyncio                   # Waiters are futures on the worker's event loop
+import sqlite3                   # Heartbeat survives a locked or unavailable shared store
+from collections import deque    # FIFO of waiters per class
+from contextlib import asynccontextmanager
+
+from Backend.telemetry import counter, histogram
+from Backend.shared_state import shared_store
+
+ADMISSION_EVENTS = counter("admission_events_total", "Requests admitted, queued and shed by class.")
+ADMISSION_QUEUE_SECONDS = histogram("admission_queue_wait_seconds", "Time spent queued before admission by class.")
+
+SERVICE_TIME_SMOOTHING = 0.2     # EWMA weight of the newest service time
+WEB_WORKERS = max(1, int(os.getenv("WEB_WORKERS", "1")))  # Set by gunicorn.conf.py
+NAMESPACE = "admission"          # shared_store namespace
+HEARTBEAT_SECONDS = float(os.getenv("ADMISSION_HEARTBEAT_SECONDS", "1"))
+WORKER_DEPTHS_TTL = 10 * HEARTBEAT_SECONDS  # A stopped worker's depths drop out after this
+SHARED_LEASE_SECONDS = 30        # A ticket not renewed for this long is dropped
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; retry_after is a whole number of seconds."""
+
+    def __init__(self, request_class: str, retry_after: int):
+        super().__init__(f"{request_class} is over capacity, retry after {retry_after}s")
+        self.request_class = request_class
+        self.retry_after = retry_after
+
+
+def _wait_estimate(active: int, queued: int, concurrency: int, service_seconds: float) -> float:
+    """Seconds a request arriving now would wait before starting."""
+    if active < concurrency and not queued:
+        return 0.0
+    return math.ceil((queued + 1) / max(concurrency, 1)) * service_seconds
+
+
+def _budget_from_env(name: str, concurrency: int, max_queue: int, max_wait: float) -> dict:
+    prefix = f"ADMIT_{name.upper()}_"
+    return {
+        "concurrency": int(os.getenv(prefix + "CONCURRENCY", str(concurrency))),
+        "max_queue": int(os.getenv(prefix + "MAX_QUEUE", str(max_queue))),
+        "max_wait": float(os.getenv(prefix + "MAX_WAIT", str(max_wait))),
+    }
+
+
+class RequestClass:
+    """Slots held by this worker's event loop, an even share of the total budget."""
+
+    def __init__(self, name: str, priority: int, concurrency: int, max_queue: int,
+                 max_wait: float, service_seconds: float, workers: int = WEB_WORKERS):
+        self.name, self.priority = name, priority
+        self.total_concurrency, self.total_queue = concurrency, max_queue
+        self.concurrency = max(1, math.ceil(concurrency / workers))
+        self.max_queue = math.ceil(max_queue / workers)
+        self.max_wait = max_wait
+        self.service_seconds = service_seconds   # Moving average, seeds the first estimates
+        self.active = 0
+        self.waiters = deque()
+
+    @classmethod
+    def from_env(cls, name: str, priority: int, concurrency: int, max_queue: int,
+                 max_wait: float, service_seconds: float):
+        return cls(name, priority, **_budget_from_env(name, concurrency, max_queue, max_wait),
+                   service_seconds=service_seconds)
+
+    def wait_estimate(self) -> float:
+        return _wait_estimate(self.active, len(self.waiters), self.concurrency, self.service_seconds)
+
+
+class SharedRequestClass:
+    """Slots and a FIFO queue kept in the shared store, common to all workers.
+
+    Stored as {"active": {ticket: lease_until}, "queued": [[ticket, lease_until], ...],
+    "service_seconds": ewma}; every change is one SharedStore.update() transaction."""
+
+    def __init__(self, name: str, priority: int, concurrency: int, max_queue: int,
+                 max_wait: float, service_seconds: float, store=shared_store):
+        self.name, self.priority = name, priority
+        self.concurrency, self.max_queue, self.max_wait = concurrency, max_queue, max_wait
+        self.default_service_seconds = service_seconds
+        self.store = store
+        self.key = f"class:{name}"
+
+    @classmethod
+    def from_env(cls, name: str, priority: int, concurrency: int, max_queue: int,
+                 max_wait: float, service_seconds: float):
+        return cls(name, priority, **_budget_from_env(name, concurrency, max_queue, max_wait),
+                   service_seconds=service_seconds)
+
+    def _live(self, state, now: float) -> dict:
+        """state with expired tickets dropped."""
+        state = state or {"active": {}, "queued": [], "service_seconds": self.default_service_seconds}
+        state["active"] = {t: until for t, until in state["active"].items() if until > now}
+        state["queued"] = [[t, until] for t, until in state["queued"] if until > now]
+        return state
+
+    def _update(self, fn) -> dict:
+        now = time.time()
+        return self.store.update(NAMESPACE, self.key, lambda state: fn(self._live(state, now), now))
+
+    def state(self) -> dict:
+        return self._live(self.store.get(NAMESPACE, self.key), time.time())
+
+    def wait_estimate(self, state: dict) -> float:
+        return _wait_estimate(len(state["active"]), len(state["queued"]), self.concurrency, state["service_seconds"])
+
+    def reserve(self) -> str:
+        """Join the back of the queue; raises Overloaded if budget + queue are taken."""
+        ticket = uuid.uuid4().hex
+        joined = False
+
+        def join(state, now):
+            nonlocal joined
+            if len(state["active"]) + len(state["queued"]) < self.concurrency + self.max_queue:
+                state["queued"].append([ticket, now + SHARED_LEASE_SECONDS])
+                joined = True
+            return state
+
+        state = self._update(join)
+        if not joined:
+            raise Overloaded(self.name, max(1, math.ceil(self.wait_estimate(state))))
+        return ticket
+
+    def try_start(self, ticket: str, blocked: bool) -> bool:
+        """Move ticket from the head of the queue to a free slot. Otherwise
+        renew its place, rejoining at the back if its lease had lapsed."""
+        started = False
+
+        def take(state, now):
+            nonlocal started
+            tickets = [t for t, _ in state["queued"]]
+            if ticket not in tickets:
+                state["queued"].append([ticket, now + SHARED_LEASE_SECONDS])
+            elif tickets[0] == ticket and len(state["active"]) < self.concurrency and not blocked:
+                state["queued"].pop(0)
+                state["active"][ticket] = now + SHARED_LEASE_SECONDS
+                started = True
+            else:
+                state["queued"][tickets.index(ticket)][1] = now + SHARED_LEASE_SECONDS
+            return state
+
+        self._update(take)
+        return started
+
+    def renew(self, ticket: str):
+        def extend(state, now):
+            if ticket in state["active"]:
+                state["active"][ticket] = now + SHARED_LEASE_SECONDS
+            return state
+
+        self._update(extend)
+
+    def release(self, ticket: str, service_seconds: float = None):
+        """Free the ticket's slot or queue place."""
+        def drop(state, now):
+            state["active"].pop(ticket, None)
+            state["queued"] = [entry for entry in state["queued"] if entry[0] != ticket]
+            if service_seconds is not None:
+                state["service_seconds"] += SERVICE_TIME_SMOOTHING * (service_seconds - state["service_seconds"])
+            return state
+
+        self._update(drop)
+
+
+class AdmissionController:
+    def __init__(self, classes: list[RequestClass], shared_classes: list[SharedRequestClass],
+                 store=shared_store):
+        self.classes = {c.name: c for c in classes}
+        self.shared = {c.name: c for c in shared_classes}
+        self.store = store
+        # Refreshed by heartbeat(): depths of the other workers' in-process
+        # classes, and queue lengths of the shared classes.
+        self._remote = {name: {"active": 0, "queued": 0} for name in self.classes}
+        self._shared_queued = {name: 0 for name in self.shared}
+
+    def _blocked(self, priority: int) -> bool:
+        """True while any higher-priority class has requests queued in any worker."""
+        return any(other.priority < priority and (other.waiters or self._remote[other.name]["queued"])
+                   for other in self.classes.values()) \
+            or any(other.priority < priority and self._shared_queued[other.name]
+                   for other in self.shared.values())
+
+    def _dispatch(self):
+        """Hand free slots to waiters, highest-priority class first."""
+        for request_class in sorted(self.classes.values(), key=lambda c: c.priority):
+            while (request_class.waiters and request_class.active < request_class.concurrency
+                   and not self._blocked(request_class.priority)):
+                waiter = request_class.waiters.popleft()
+                if waiter.done():        # Timed out or cancelled while queued
+                    continue
+                request_class.active += 1
+                waiter.set_result(None)
+
+    def retry_after(self, name: str) -> int:
+        return max(1, math.ceil(self.classes[name].wait_estimate()))
+
+    def check(self, name: str):
+        """Raise Overloaded if a new request of this class would be shed right now."""
+        request_class = self.classes[name]
+        if request_class.active + len(request_class.waiters) >= request_class.concurrency + request_class.max_queue:
+            ADMISSION_EVENTS.inc(request_class=name, event="shed")
+            raise Overloaded(name, self.retry_after(name))
+
+    async def acquire(self, name: str):
+        """Take a slot, queueing up to max_wait seconds. Pair with release()."""
+        self.check(name)
+        request_class = self.classes[name]
+        if request_class.active < request_class.concurrency and not request_class.waiters \
+                and not self._blocked(request_class.priority):
+            request_class.active += 1
+            ADMISSION_EVENTS.inc(request_class=name, event="admitted")
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        request_class.waiters.append(waiter)
+        ADMISSION_EVENTS.inc(request_class=name, event="queued")
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, timeout=request_class.max_wait or None)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                self.release(name)       # Slot was granted just as we gave up
+            elif waiter in request_class.waiters:
+                request_class.waiters.remove(waiter)
+            self._dispatch()             # Our leaving may unblock lower-priority classes
+            if isinstance(e, asyncio.TimeoutError):
+                ADMISSION_EVENTS.inc(request_class=name, event="shed")
+                raise Overloaded(name, self.retry_after(name)) from None
+            raise
+        ADMISSION_QUEUE_SECONDS.observe(time.monotonic() - start, request_class=name)
+        ADMISSION_EVENTS.inc(request_class=name, event="admitted")
+
+    def release(self, name: str, service_seconds: float = None):
+        request_class = self.classes[name]
+        request_class.active -= 1
+        if service_seconds is not None:
+            request_class.service_seconds += SERVICE_TIME_SMOOTHING * (service_seconds - request_class.service_seconds)
+        self._dispatch()
+
+    async def reserve(self, name: str) -> str:
+        """Take a place in a shared class's queue, or raise Overloaded if it is
+        full. Pass the ticket to admit(), or to cancel() if the request fails first."""
+        try:
+            return await asyncio.to_thread(self.shared[name].reserve)
+        except Overloaded:
+            ADMISSION_EVENTS.inc(request_class=name, event="shed")
+            raise
+
+    async def cancel(self, name: str, ticket: str):
+        await asyncio.to_thread(self.shared[name].release, ticket)
+
+    async def _keep_alive(self, shared_class: SharedRequestClass, ticket: str):
+        while True:
+            await asyncio.sleep(SHARED_LEASE_SECONDS / 3)
+            try:
+                await asyncio.to_thread(shared_class.renew, ticket)
+            except sqlite3.Error as e:
+                print(f"[ADMISSION] Could not renew {shared_class.name} slot: {e}")
+
+    @asynccontextmanager
+    async def _admit_shared(self, name: str, ticket: str):
+        shared_class = self.shared[name]
+        ticket = ticket or await self.reserve(name)
+        start = time.monotonic()
+        try:
+            if not await asyncio.to_thread(shared_class.try_start, ticket, self._blocked(shared_class.priority)):
+                ADMISSION_EVENTS.inc(request_class=name, event="queued")
+                while not await asyncio.to_thread(shared_class.try_start, ticket, self._blocked(shared_class.priority)):
+                    if shared_class.max_wait and time.monotonic() - start > shared_class.max_wait:
+                        ADMISSION_EVENTS.inc(request_class=name, event="shed")
+                        raise Overloaded(name, max(1, math.ceil(shared_class.wait_estimate(shared_class.state()))))
+                    await asyncio.sleep(HEARTBEAT_SECONDS)
+                ADMISSION_QUEUE_SECONDS.observe(time.monotonic() - start, request_class=name)
+            ADMISSION_EVENTS.inc(request_class=name, event="admitted")
+        except BaseException:
+            shared_class.release(ticket)
+            raise
+
+        keep_alive = asyncio.create_task(self._keep_alive(shared_class, ticket))
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            keep_alive.cancel()
+            await asyncio.to_thread(shared_class.release, ticket, time.monotonic() - start)
+
+    @asynccontextmanager
+    async def admit(self, name: str, ticket: str = None):
+        """async with admission.admit("chat"): ... — raises Overloaded when shed.
+        For a shared class, ticket is the one returned by reserve() (taken here if omitted)."""
+        if name in self.shared:
+            async with self._admit_shared(name, ticket):
+                yield
+            return
+        await self.acquire(name)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(name, time.monotonic() - start)
+
+    def _exchange_depths(self):
+        """Publish this worker's depths; return (other workers' summed depths, shared queue lengths)."""
+        own_key = f"worker:{os.getpid()}"
+        local = {name: {"active": c.active, "queued": len(c.waiters)} for name, c in self.classes.items()}
+        self.store.set(NAMESPACE, own_key, local, ttl=WORKER_DEPTHS_TTL)
+
+        remote = {name: {"active": 0, "queued": 0} for name in self.classes}
+        for key, depths in self.store.items(NAMESPACE).items():
+            if not key.startswith("worker:") or key == own_key:
+                continue
+            for name, depth in depths.items():
+                if name in remote:
+                    remote[name]["active"] += depth["active"]
+                    remote[name]["queued"] += depth["queued"]
+        shared_queued = {name: len(c.state()["queued"]) for name, c in self.shared.items()}
+        return remote, shared_queued
+
+    async def heartbeat(self):
+        """Background loop run by every worker (started in main.py's lifespan)."""
+        while True:
+            try:
+                self._remote, self._shared_queued = await asyncio.to_thread(self._exchange_depths)
+            except sqlite3.Error as e:
+                print(f"[ADMISSION] Heartbeat failed: {e}")
+            self._dispatch()             # Remote queues may have drained
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+
+    async def snapshot(self) -> dict:
+        """Per-class queue depths and wait estimates over all workers, for /queue-status."""
+        result = {}
+        for name, c in self.classes.items():
+            active = c.active + self._remote[name]["active"]
+            queued = len(c.waiters) + self._remote[name]["queued"]
+            result[name] = {
+                "active": active,
+                "queued": queued,
+                "concurrency": c.total_concurrency,
+                "max_queue": c.total_queue,
+                "wait_seconds": round(_wait_estimate(active, queued, c.total_concurrency, c.service_seconds), 1),
+            }
+        for name, c in self.shared.items():
+            state = await asyncio.to_thread(c.state)
+            result[name] = {
+                "active": len(state["active"]),
+                "queued": len(state["queued"]),
+                "concurrency": c.concurrency,
+                "max_queue": c.max_queue,
+                "wait_seconds": round(c.wait_estimate(state), 1),
+            }
+        return result
+
+
+admission = AdmissionController(
+    [
+        RequestClass.from_env("chat", 0, concurrency=8, max_queue=32, max_wait=20, service_seconds=4),
+        RequestClass.from_env("transcribe", 1, concurrency=4, max_queue=8, max_wait=10, service_seconds=3),
+    ],
+    [
+        SharedRequestClass.from_env("upload", 2, concurrency=1, max_queue=4, max_wait=0, service_seconds=120),
+        SharedRequestClass.from_env("batch", 3, concurrency=1, max_queue=4, max_wait=60, service_seconds=120),
+    ],
+)
@@ -0,0 +1,138 @@
+"""
+batch_qa.py — Answer many directory questions at once, streaming results as JSONL.
+
+Used by the /chat/batch endpoint and as a CLI for staff running hundreds of
+questions (and for offline evaluation). Compared with one /chat call per
+question, work is shared across the batch:
+
+    - Identical questions (ignoring case/whitespace/trailing punctuation) are answered once
+    - Department count/list questions are answered from data.json, once per distinct question
+    - All remaining questions are embedded in one embed_documents() call and each
+      retrieval source is queried once for the whole batch (retrieve_batch)
+    - Questions whose retrieval found nothing are answered without an LLM call
+    - LLM generations run with bounded parallelism (BATCH_LLM_CONCURRENCY)
+
+Batch questions are treated as standalone: there is no chat history and no
+query reformulation. Results are yielded as soon as they are ready, so the
+output order is completion order; each line carries the question's index.
+
+Usage (from the repository root):
+    python -m Backend.batch_qa questions.txt answers.jsonl
+    python -m Backend.batch_qa questions.jsonl answers.jsonl --parallel 8
+
+Input is one question per line, either plain text or a JSON object with a
+"question" field.
+"""
+
+import os                        # os.getenv() for LLM concurrency
+import sys                       # Errors go to stderr
+import json                      # JSONL input/output
+import argparse                  # CLI arguments
+from concurrent.futures import ThreadPoolExecutor, as_completed  # Bounded parallel LLM generations
+
+from Backend.telemetry import span
+from Backend.rag_components import (
+    warm_up,                     # Load models + ingest data.json for CLI runs
+    retrieve_batch,              # One embed_documents() call + one query per source for all questions
+    answer_with_context,         # QA prompt over already-retrieved documents
+    answer_department_query,     # Direct data.json answer for department count/list questions
+)
+
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+NO_CONTEXT_ANSWER = "No matching professor profiles were found for this question."
+
+
+def _normalize(question: str) -> str:
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+def _sources(docs: list) -> list[str]:
+    names = []
+    for doc in docs:
+        name = doc.metadata.get("name") or doc.metadata.get("source")
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def answer_batch(questions: list[str], shared_users_db_path: str = None,
+                 user_collection_name: str = None, doc_ids: list[str] = None,
+                 max_parallel: int = BATCH_LLM_CONCURRENCY):
+    """Yield one result dict per input question, in completion order:
+    {"index", "question", "answer", "route", "sources"} or {..., "error"}."""
+    # Group duplicate questions so each distinct one is handled once.
+    groups = {}                  # normalized question -> [indices]
+    for i, question in enumerate(questions):
+        groups.setdefault(_normalize(question), []).append(i)
+
+    def results_for(key, **result):
+        for i in groups[key]:
+            yield {"index": i, "question": questions[i], **result}
+
+    pending = []                 # normalized keys that need retrieval
+    for key, indices in groups.items():
+        dept_answer = answer_department_query(questions[indices[0]])
+        if dept_answer is not None:
+            yield from results_for(key, answer=dept_answer, route="department", sources=[])
+        else:
+            pending.append(key)
+
+    if not pending:
+        return
+
+    with span("retrieve_batch"):
+        contexts = retrieve_batch([questions[groups[key][0]] for key in pending],
+                                  shared_users_db_path, user_collection_name, doc_ids)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+        futures = {}
+        for key, docs in zip(pending, contexts):
+            if not docs:
+                yield from results_for(key, answer=NO_CONTEXT_ANSWER, route="no_context", sources=[])
+                continue
+            future = pool.submit(answer_with_context, questions[groups[key][0]], docs, "batch_qa")
+            futures[future] = (key, docs)
+
+        for future in as_completed(futures):
+            key, docs = futures[future]
+            try:
+                yield from results_for(key, answer=future.result(), route="rag", sources=_sources(docs))
+            except Exception as e:
+                print(f"Batch QA Error: {e}", file=sys.stderr)
+                yield from results_for(key, error=str(e), route="rag")
+
+
+def _read_questions(path: str) -> list[str]:
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = json.loads(line)["question"]
+            questions.append(line)
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of directory questions as JSONL.")
+    parser.add_argument("questions", help="Text file (one question per line) or JSONL with a 'question' field")
+    parser.add_argument("output", help="Output JSONL file (written line by line as answers complete)")
+    parser.add_argument("--parallel", type=int, default=BATCH_LLM_CONCURRENCY,
+                        help="Concurrent LLM generations")
+    args = parser.parse_args()
+
+    questions = _read_questions(args.questions)
+    warm_up()
+    answered = 0
+    with open(args.output, "w", encoding="utf-8") as out:
+        for result in answer_batch(questions, max_parallel=args.parallel):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            answered += 1
+            print(f"[{answered}/{len(questions)}] {result['question'][:60]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+eval_retrieval.py — Retrieval quality vs latency across retriever configurations.
+
+Builds a gold question set from data.json and runs every question through the
+production retriever (rag_components.get_hybrid_retriever) under each
+configuration, so tuning the retrieval depth (JSON_RETRIEVER_MAX_K, the
+adaptive score cut vs a fixed k) or switching the static index can be
+justified with numbers instead of guesses.
+
+Gold questions (sampled per branch, deterministic for a given --seed):
+
+    email       "What is the email of <name>?"              → <name>'s profile_summary
+    research    "What is <name>'s research area?"           → <name>'s profile_summary
+    department  "Which department is <name> in?"           → <name>'s profile_summary
+    publications "List the publications by <name>."         → <name>'s publications/books
+
+Names that are missing ("N/A") or shared by several profiles are skipped.
+A retrieved document is relevant if its metadata name matches and its type is
+one of the question's gold types.
+
+Metrics per configuration:
+    recall@k    Share of the question's gold documents among the retrieved ones
+    MRR         Mean reciprocal rank of the first relevant document
+    latency     p50/p95 of embed + search per query
+    docs        Mean number of documents retrieved per question
+    tokens      Mean prompt tokens of the QA prompt built from the retrieved
+                context (counted with the embedding tokenizer, so approximate)
+
+Only the static data.json collection is evaluated; per-user PDF collections
+(USER_RETRIEVER_MAX_K, chunk sizes) need a document corpus with gold answers.
+
+Usage (from the repository root):
+    python -m Backend.benchmarks.eval_retrieval --k 2 4 8 --index chroma static
+    python -m Backend.benchmarks.eval_retrieval --k 6 --depth adaptive fixed
+    python -m Backend.benchmarks.eval_retrieval --per-branch 20 --output eval.json
+"""
+
+import json                      # data.json and the optional results file
+import time                      # Per-query latency
+import random                    # Deterministic gold-set sampling
+import argparse                  # CLI flags
+import statistics                # Mean recall / MRR / tokens
+from collections import Counter, defaultdict
+
+from Backend import rag_components
+from Backend.embedding_backend import get_token_counter
+from Backend.static_index import StaticVectorIndex
+from Backend.benchmarks.load_test import percentile
+
+PROFILE_TYPES = ("profile_summary",)
+PUBLICATION_TYPES = ("publications", "books")
+
+TEMPLATES = {
+    "email": ("What is the email of {name}?", PROFILE_TYPES),
+    "research": ("What is {name}'s research area?", PROFILE_TYPES),
+    "department": ("Which department is {name} in?", PROFILE_TYPES),
+    "publications": ("List the publications by {name}.", PUBLICATION_TYPES),
+}
+
+
+def build_gold_set(data: list[dict], per_branch: int, seed: int) -> list[dict]:
+    """[{"question", "kind", "name", "types", "gold"}] where gold is the number
+    of relevant documents in the collection."""
+    docs_by_name = defaultdict(Counter)      # name -> Counter(type)
+    profiles_by_branch = defaultdict(list)   # branch -> [item]
+    for item in data:
+        meta = item.get("metadata", {})
+        docs_by_name[meta.get("name")][meta.get("type")] += 1
+        if meta.get("type") == "profile_summary":
+            profiles_by_branch[item.get("branch", "unknown")].append(item)
+
+    rng = random.Random(seed)
+    gold = []
+    for branch in sorted(profiles_by_branch):
+        candidates = [
+            item for item in profiles_by_branch[branch]
+            if item["metadata"].get("name") not in (None, "", "N/A")
+            and docs_by_name[item["metadata"]["name"]]["profile_summary"] == 1
+        ]
+        for item in rng.sample(candidates, min(per_branch, len(candidates))):
+            name = item["metadata"]["name"]
+            for kind, (template, types) in TEMPLATES.items():
+                if kind == "email" and "Email:" not in item["page_content"]:
+                    continue
+                relevant = sum(docs_by_name[name][t] for t in types)
+                if relevant:
+                    gold.append({"question": template.format(name=name), "kind": kind,
+                                 "name": name, "types": types, "gold": relevant})
+    return gold
+
+
+def _is_relevant(doc, case: dict) -> bool:
+    return doc.metadata.get("name") == case["name"] and doc.metadata.get("type") in case["types"]
+
+
+def evaluate(gold: list[dict], count_tokens) -> dict:
+    """Run every gold question through a freshly built production retriever."""
+    retriever = rag_components.get_hybrid_retriever(None)
+    recalls, reciprocal_ranks, latencies, tokens, depths = [], [], [], [], []
+    by_kind = defaultdict(list)
+    for case in gold:
+        start = time.perf_counter()
+        docs = retriever.invoke(case["question"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        depths.append(len(docs))
+
+        hits = [i for i, doc in enumerate(docs) if _is_relevant(doc, case)]
+        recall = len(hits) / case["gold"]
+        recalls.append(recall)
+        by_kind[case["kind"]].append(recall)
+        reciprocal_ranks.append(1 / (hits[0] + 1) if hits else 0.0)
+
+        context = "\n\n".join(doc.page_content for doc in docs)
+        prompt = rag_components.QA_SYSTEM_PROMPT.format(context=context) + "\n" + case["question"]
+        tokens.append(count_tokens(prompt))
+
+    return {
+        "recall": round(statistics.mean(recalls), 4),
+        "mrr": round(statistics.mean(reciprocal_ranks), 4),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "prompt_tokens": round(statistics.mean(tokens), 1),
+        "docs": round(statistics.mean(depths), 2),
+        "recall_by_kind": {kind: round(statistics.mean(v), 4) for kind, v in sorted(by_kind.items())},
+    }
+
+
+def print_table(results: list[dict]):
+    kinds = sorted({kind for r in results for kind in r["recall_by_kind"]})
+    header = f"{'index':<8}{'depth':<10}{'k':>4}{'recall@k':>10}{'MRR':>8}{'p50':>9}{'p95':>9}{'tokens':>9}{'docs':>7}"
+    header += "".join(f"{kind[:12]:>14}" for kind in kinds)
+    print("\n" + header + "   (ms; per-kind recall@k)")
+    for r in results:
+        line = (f"{r['index']:<8}{r['depth']:<10}{r['k']:>4}{r['recall']:>10.3f}{r['mrr']:>8.3f}"
+                f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['prompt_tokens']:>9}{r['docs']:>7}")
+        line += "".join(f"{r['recall_by_kind'].get(kind, 0):>14.3f}" for kind in kinds)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality vs latency over data.json.")
+    parser.add_argument("--k", type=int, nargs="+", default=[2, 4, 6, 8], help="JSON_RETRIEVER_MAX_K values")
+    parser.add_argument("--depth", nargs="+", choices=["adaptive", "fixed"], default=["adaptive", "fixed"],
+                        help="Score-based cut (min k .. k) or always exactly k documents")
+    parser.add_argument("--index", nargs="+", choices=["chroma", "static"], default=["chroma", "static"],
+                        help="Search backends: Chroma HNSW or the in-process static index")
+    parser.add_argument("--per-branch", type=int, default=10, help="Profiles sampled per branch")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    data = json.loads(rag_components.JSON_DATA_PATH.read_text(encoding="utf-8"))
+    gold = build_gold_set(data, args.per_branch, args.seed)
+    print(f"Gold set: {len(gold)} questions ({dict(Counter(case['kind'] for case in gold))})")
+
+    rag_components.load_models()
+    rag_components.check_and_ingest_json()
+    collection = rag_components.global_chroma_client.get_collection(name=rag_components.JSON_COLLECTION_NAME)
+    static_index = StaticVectorIndex.from_collection(collection, mode="memory") if "static" in args.index else None
+    count_tokens = get_token_counter()
+
+    # Warm the embedding model and HNSW index so the first configuration isn't penalised.
+    rag_components._static_index = None
+    rag_components.get_hybrid_retriever(None).invoke("warm-up query")
+
+    results = []
+    min_k = rag_components.JSON_RETRIEVER_MIN_K
+    for index in args.index:
+        rag_components._static_index = static_index if index == "static" else None
+        for depth in args.depth:
+            for k in args.k:
+                rag_components.JSON_RETRIEVER_MAX_K = k
+                rag_components.JSON_RETRIEVER_MIN_K = k if depth == "fixed" else min_k
+                print(f"Evaluating index={index} depth={depth} k={k} ...")
+                results.append({"index": index, "depth": depth, "k": k, **evaluate(gold, count_tokens)})
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "questions": len(gold), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
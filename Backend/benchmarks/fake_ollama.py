@@ -0,0 +1,118 @@
+"""
+fake_ollama.py — Local stand-in for the Ollama chat API, used by the benchmarks.
+
+Implements just enough of /api/chat (streaming NDJSON and non-streaming) for
+ChatOllama and the `ollama` client, with configurable time-to-first-token and
+per-token latency, so load tests measure our own stack instead of ollama.com.
+Query-reformulation prompts are answered by echoing the user's message, so
+retrieval still sees a sensible query.
+
+Configuration (env vars):
+    FAKE_OLLAMA_TTFT_MS           Delay before the first token (default 300)
+    FAKE_OLLAMA_TOKEN_MS          Delay between tokens (default 20)
+    FAKE_OLLAMA_TOKENS            Tokens per answer (default 60)
+    FAKE_OLLAMA_MAX_CONCURRENCY   Concurrent generations; excess requests queue (default 16)
+
+Usage (from Backend/): uvicorn benchmarks.fake_ollama:app --port 11435
+"""
+
+import os                        # os.getenv() for latency/throughput configuration
+import json                      # NDJSON streaming responses
+import time                      # Per-call timing for /_bench/stats
+import asyncio                   # Simulated token latency and concurrency limit
+from datetime import datetime, timezone  # created_at timestamps in Ollama's format
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+TTFT_MS = float(os.getenv("FAKE_OLLAMA_TTFT_MS", "300"))
+TOKEN_MS = float(os.getenv("FAKE_OLLAMA_TOKEN_MS", "20"))
+TOKENS = int(os.getenv("FAKE_OLLAMA_TOKENS", "60"))
+MAX_CONCURRENCY = int(os.getenv("FAKE_OLLAMA_MAX_CONCURRENCY", "16"))
+
+app = FastAPI()
+_slots = asyncio.Semaphore(MAX_CONCURRENCY)
+
+# Wall-clock seconds per completed call, keyed by "reformulate" / "generate",
+# plus time spent waiting for a generation slot.
+_stats: dict[str, list[float]] = {"reformulate": [], "generate": [], "queue_wait": []}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _answer_tokens(messages: list[dict]) -> tuple[str, list[str]]:
+    """Return (call kind, tokens) for a chat request."""
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    last_user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    if "query reformulator" in system:
+        return "reformulate", [word + " " for word in last_user.split()] or ["query"]
+    words = ["Professor", "Example", "works", "on", "distributed", "systems", "and", "teaches", "CSE."]
+    return "generate", [words[i % len(words)] + " " for i in range(TOKENS)]
+
+
+def _prompt_tokens(messages: list[dict]) -> int:
+    return sum(len(str(m.get("content", "")).split()) for m in messages)
+
+
+@app.get("/api/tags")
+async def tags():
+    return {"models": []}
+
+
+@app.get("/api/version")
+async def version():
+    return {"version": "0.0.0-fake"}
+
+
+@app.get("/_bench/stats")
+async def stats():
+    """Per-call timings recorded since the last reset."""
+    return _stats
+
+
+@app.post("/_bench/reset")
+async def reset():
+    for values in _stats.values():
+        values.clear()
+    return {"reset": True}
+
+
+@app.post("/api/chat")
+async def chat(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    model = body.get("model", "fake")
+    kind, tokens = _answer_tokens(messages)
+    prompt_tokens = _prompt_tokens(messages)
+
+    async def generate():
+        queued = time.perf_counter()
+        async with _slots:
+            started = time.perf_counter()
+            _stats["queue_wait"].append(started - queued)
+            await asyncio.sleep(TTFT_MS / 1000)
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(TOKEN_MS / 1000)
+                yield token
+            _stats[kind].append(time.perf_counter() - queued)
+
+    final = {
+        "model": model, "created_at": None, "done": True, "done_reason": "stop",
+        "prompt_eval_count": prompt_tokens, "eval_count": len(tokens),
+        "total_duration": 0, "load_duration": 0, "prompt_eval_duration": 0, "eval_duration": 0,
+    }
+
+    if body.get("stream", True):
+        async def stream():
+            async for token in generate():
+                chunk = {"model": model, "created_at": _now(),
+                         "message": {"role": "assistant", "content": token}, "done": False}
+                yield json.dumps(chunk) + "\n"
+            yield json.dumps({**final, "created_at": _now(),
+                              "message": {"role": "assistant", "content": ""}}) + "\n"
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    content = "".join([token async for token in generate()])
+    return {**final, "created_at": _now(), "message": {"role": "assistant", "content": content}}
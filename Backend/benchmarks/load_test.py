@@ -0,0 +1,351 @@
+"""
+load_test.py — End-to-end load and latency benchmark against a local fake Ollama.
+
+Starts fake_ollama.py and the FastAPI app (main.py) as subprocesses, with the
+app's OLLAMA_BASE_URL / OLLAMA_HOST pointed at the fake, then drives concurrent
+virtual users through a weighted mix of scenarios:
+
+    rag         /chat questions about professors (full RAG chain)
+    followup    /chat follow-ups with history (reformulation + RAG)
+    department  /chat department count/list queries (direct JSON lookup)
+    meta        /chat questions about the conversation (history-only path)
+    upload      /upload-pdf/ followed by /status polling until the pipeline ends
+
+Reports p50/p95/p99/mean latency, throughput and error counts per scenario,
+plus the LLM share (per-call timings recorded by the fake server) and a
+per-stage breakdown: the app's /metrics is scraped before and after the run,
+and the difference of each stage histogram (rag_stage_duration_seconds,
+pipeline_stage_duration_seconds) gives the stage's call count, mean and p95
+(as a bucket upper bound) for this run alone. Results can be saved as a
+named baseline and compared against one to flag regressions.
+
+Usage (from Backend/):
+    python -m benchmarks.load_test --users 8 --duration 60
+    python -m benchmarks.load_test --pdf sample.pdf --uploads 3 --save-baseline main
+    python -m benchmarks.load_test --compare main --threshold 0.2
+"""
+
+import os                        # Environment for the spawned servers
+import sys                       # sys.executable — run uvicorn with the current interpreter
+import json                      # Session cookie payload, baselines, data.json
+import math                      # Nearest-rank percentile index
+import re                        # Parse the Prometheus text exposition from /metrics
+import time                      # Latency measurement and deadlines
+import random                    # Scenario mix and question sampling
+import asyncio                   # Concurrent virtual users
+import argparse                  # CLI flags
+import statistics                # Mean latency
+import subprocess                # Start fake Ollama + app servers
+from base64 import b64encode     # Starlette session cookie encoding
+from pathlib import Path         # Object-oriented filesystem path construction
+
+import httpx                     # Async HTTP client for driving the app
+from itsdangerous import TimestampSigner  # Sign session cookies the way SessionMiddleware does
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+BENCH_SECRET_KEY = "benchmark-secret-key"
+
+STAGE_HISTOGRAMS = ("rag_stage_duration_seconds", "pipeline_stage_duration_seconds")
+METRIC_LINE = re.compile(r'^(\w+?)(_bucket|_sum|_count)\{(.*)\} (\S+)$')
+
+SCENARIO_WEIGHTS = {"rag": 0.5, "followup": 0.15, "department": 0.2, "meta": 0.15}
+DEPARTMENTS = ["CSE", "biotech", "civil", "mechanical", "electronics", "law", "management"]
+
+
+def session_cookie(user: dict, secret_key: str = BENCH_SECRET_KEY) -> str:
+    """Build a signed session cookie identical to what SessionMiddleware issues,
+    so benchmark users can upload without going through Google OAuth."""
+    data = b64encode(json.dumps({"user": user}).encode("utf-8"))
+    return TimestampSigner(secret_key).sign(data).decode("utf-8")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def parse_stage_histograms(text: str) -> dict:
+    """{stage: {"buckets": {le: cumulative count}, "sum": s, "count": n}} from /metrics text."""
+    stages = {}
+    for line in text.splitlines():
+        match = METRIC_LINE.match(line)
+        if not match or match.group(1) not in STAGE_HISTOGRAMS:
+            continue
+        _, part, raw_labels, value = match.groups()
+        labels = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', raw_labels))
+        stage = stages.setdefault(labels.get("stage", ""), {"buckets": {}, "sum": 0.0, "count": 0})
+        if part == "_bucket":
+            le = float(labels["le"])   # float("+Inf") is inf
+            stage["buckets"][le] = stage["buckets"].get(le, 0) + float(value)
+        else:
+            stage[part[1:]] += float(value)
+    return stages
+
+
+def stage_breakdown(before: dict, after: dict) -> dict:
+    """Per-stage count/mean/p95 of the observations made between two scrapes."""
+    breakdown = {}
+    for stage, now in after.items():
+        base = before.get(stage, {"buckets": {}, "sum": 0.0, "count": 0})
+        count = now["count"] - base["count"]
+        if count <= 0:
+            continue
+        p95 = math.inf
+        for le in sorted(now["buckets"]):
+            if now["buckets"][le] - base["buckets"].get(le, 0) >= 0.95 * count:
+                p95 = le
+                break
+        breakdown[stage] = {
+            "count": int(count),
+            "mean_ms": round((now["sum"] - base["sum"]) / count * 1000, 1),
+            "p95_le_ms": round(p95 * 1000, 1) if p95 != math.inf else None,
+        }
+    return breakdown
+
+
+def summarize(values: list[float], errors: int, elapsed: float) -> dict:
+    return {
+        "count": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 3) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 1),
+        "p95_ms": round(percentile(values, 95) * 1000, 1),
+        "p99_ms": round(percentile(values, 99) * 1000, 1),
+        "mean_ms": round(statistics.mean(values) * 1000, 1) if values else 0.0,
+    }
+
+
+class Servers:
+    """Start/stop the fake Ollama server and the app under test."""
+
+    def __init__(self, app_port: int, fake_port: int, fake_env: dict):
+        self.app_port, self.fake_port, self.fake_env = app_port, fake_port, fake_env
+        self.procs = []
+
+    def _spawn(self, args: list[str], env: dict):
+        self.procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", *args],
+            cwd=BACKEND_DIR, env={**os.environ, **env},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        ))
+
+    async def _wait_until_up(self, url: str, timeout: float):
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                try:
+                    if (await client.get(url, timeout=2)).status_code == 200:
+                        return
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.5)
+        raise RuntimeError(f"Server at {url} did not come up within {timeout:.0f}s")
+
+    async def start(self, startup_timeout: float):
+        fake_url = f"http://127.0.0.1:{self.fake_port}"
+        self._spawn(["benchmarks.fake_ollama:app", "--port", str(self.fake_port), "--log-level", "warning"],
+                    self.fake_env)
+        await self._wait_until_up(f"{fake_url}/api/version", 30)
+
+        self._spawn(["main:app", "--port", str(self.app_port), "--log-level", "warning"], {
+            "PYTHONPATH": str(BACKEND_DIR.parent),
+            "OLLAMA_BASE_URL": fake_url,
+            "OLLAMA_HOST": fake_url,
+            "OLLAMA_API_KEY": "benchmark",
+            "SECRET_KEY": BENCH_SECRET_KEY,
+            "GOOGLE_CLIENT_ID": os.getenv("GOOGLE_CLIENT_ID", "benchmark"),
+            "GOOGLE_CLIENT_SECRET": os.getenv("GOOGLE_CLIENT_SECRET", "benchmark"),
+        })
+        # /readyz turns 200 once background warm-up (model load + ingestion) has finished.
+        await self._wait_until_up(f"http://127.0.0.1:{self.app_port}/readyz", startup_timeout)
+
+    def stop(self):
+        for proc in reversed(self.procs):
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def load_names() -> list[str]:
+    with open(BACKEND_DIR / "data.json", "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return sorted({item["metadata"]["name"] for item in data
+                   if item.get("metadata", {}).get("type") == "profile_summary"
+                   and item["metadata"].get("name")})
+
+
+def build_chat_request(scenario: str, names: list[str]) -> dict:
+    name = random.choice(names)
+    if scenario == "rag":
+        question = random.choice([f"What is the email of {name}?",
+                                  f"What are {name}'s research areas?",
+                                  f"List publications by {name}"])
+        return {"message": question, "history": []}
+    if scenario == "followup":
+        return {"message": "Tell me more about them",
+                "history": [{"role": "user", "content": f"Who is {name}?"},
+                            {"role": "assistant", "content": f"{name} is a professor at KIIT."}]}
+    if scenario == "department":
+        return {"message": f"How many professors are in {random.choice(DEPARTMENTS)}?", "history": []}
+    return {"message": "What was my last question?",
+            "history": [{"role": "user", "content": f"Who is {name}?"},
+                        {"role": "assistant", "content": f"{name} is a professor at KIIT."}]}
+
+
+async def chat_user(base_url: str, names: list[str], deadline: float, results: dict):
+    cookies = {"session": session_cookie({"sub": "guest", "name": "Guest User", "email": "guest@local"})}
+    scenarios, weights = zip(*SCENARIO_WEIGHTS.items())
+    async with httpx.AsyncClient(base_url=base_url, cookies=cookies, timeout=120) as client:
+        while time.monotonic() < deadline:
+            scenario = random.choices(scenarios, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await client.post("/chat", json=build_chat_request(scenario, names))
+                response.raise_for_status()
+                results[scenario]["latencies"].append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                results[scenario]["errors"] += 1
+
+
+async def upload_user(base_url: str, index: int, pdf_path: Path, results: dict, timeout: float):
+    user = {"sub": f"bench{index}", "name": f"Bench User {index}", "email": f"bench{index}@local"}
+    cookies = {"session": session_cookie(user)}
+    async with httpx.AsyncClient(base_url=base_url, cookies=cookies, timeout=60) as client:
+        start = time.perf_counter()
+        try:
+            with open(pdf_path, "rb") as f:
+                # A distinct name per upload: /status is keyed by the sanitized filename.
+                response = await client.post("/upload-pdf/", files={"file": (f"bench_{index}.pdf", f, "application/pdf")})
+            response.raise_for_status()
+            results["upload_accept"]["latencies"].append(time.perf_counter() - start)
+            doc = response.json()["collection_name"]
+
+            status = "processing"
+            while status in ("queued", "processing", "unknown") and time.perf_counter() - start < timeout:
+                await asyncio.sleep(1)
+                status = (await client.get(f"/status/{doc}")).json()["status"]
+            if status == "completed":
+                results["upload_pipeline"]["latencies"].append(time.perf_counter() - start)
+            else:
+                results["upload_pipeline"]["errors"] += 1
+        except (httpx.HTTPError, KeyError):
+            results["upload_accept"]["errors"] += 1
+
+
+async def fetch_llm_stats(fake_port: int) -> dict:
+    async with httpx.AsyncClient() as client:
+        stats = (await client.get(f"http://127.0.0.1:{fake_port}/_bench/stats")).json()
+    return {f"llm_{kind}": summarize(values, 0, 0) for kind, values in stats.items()}
+
+
+async def fetch_stage_histograms(base_url: str) -> dict:
+    async with httpx.AsyncClient() as client:
+        return parse_stage_histograms((await client.get(f"{base_url}/metrics", timeout=30)).text)
+
+
+async def run(args) -> dict:
+    servers = Servers(args.app_port, args.fake_port, {
+        "FAKE_OLLAMA_TTFT_MS": str(args.ttft_ms),
+        "FAKE_OLLAMA_TOKEN_MS": str(args.token_ms),
+        "FAKE_OLLAMA_TOKENS": str(args.tokens),
+        "FAKE_OLLAMA_MAX_CONCURRENCY": str(args.llm_concurrency),
+    })
+    base_url = f"http://127.0.0.1:{args.app_port}"
+    names = load_names()
+    scenarios = list(SCENARIO_WEIGHTS) + ["upload_accept", "upload_pipeline"]
+    results = {name: {"latencies": [], "errors": 0} for name in scenarios}
+
+    await servers.start(args.startup_timeout)
+    try:
+        stages_before = await fetch_stage_histograms(base_url)
+        start = time.monotonic()
+        deadline = start + args.duration
+        tasks = [chat_user(base_url, names, deadline, results) for _ in range(args.users)]
+        if args.pdf:
+            tasks += [upload_user(base_url, i, Path(args.pdf), results, args.pipeline_timeout)
+                      for i in range(args.uploads)]
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - start
+
+        report = {name: summarize(r["latencies"], r["errors"], elapsed)
+                  for name, r in results.items() if r["latencies"] or r["errors"]}
+        report.update(await fetch_llm_stats(args.fake_port))
+        stages = stage_breakdown(stages_before, await fetch_stage_histograms(base_url))
+        return {
+            "config": {k: v for k, v in vars(args).items() if k not in ("save_baseline", "compare")},
+            "elapsed_s": round(elapsed, 1),
+            "results": report,
+            "stages": stages,
+        }
+    finally:
+        servers.stop()
+
+
+def print_report(report: dict):
+    print(f"\n{'scenario':<18}{'count':>7}{'err':>5}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'mean':>9}  (ms)")
+    for name, r in report["results"].items():
+        print(f"{name:<18}{r['count']:>7}{r['errors']:>5}{r['throughput_rps']:>8}"
+              f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['mean_ms']:>9}")
+
+    print(f"\n{'stage':<18}{'count':>7}{'mean':>9}{'p95 <=':>9}  (ms)")
+    for name, r in sorted(report.get("stages", {}).items()):
+        print(f"{name:<18}{r['count']:>7}{r['mean_ms']:>9}{str(r['p95_le_ms'] or '>max'):>9}")
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> bool:
+    """Print p95 deltas vs the baseline; return True if any scenario regressed beyond threshold."""
+    regressed = False
+    print(f"\n{'scenario':<18}{'base p95':>10}{'now p95':>10}{'delta':>9}")
+    for name, now in report["results"].items():
+        base = baseline["results"].get(name)
+        if not base or not base["p95_ms"]:
+            continue
+        delta = (now["p95_ms"] - base["p95_ms"]) / base["p95_ms"]
+        flag = "  REGRESSION" if delta > threshold else ""
+        regressed |= bool(flag)
+        print(f"{name:<18}{base['p95_ms']:>10}{now['p95_ms']:>10}{delta:>+9.1%}{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load/latency benchmark with a fake Ollama backend.")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent chat sessions")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to drive chat load")
+    parser.add_argument("--pdf", help="PDF to upload (enables upload scenarios)")
+    parser.add_argument("--uploads", type=int, default=1, help="Concurrent uploads of --pdf")
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--llm-concurrency", type=int, default=16)
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--fake-port", type=int, default=11435)
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--pipeline-timeout", type=float, default=900)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p95 regression (fraction)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nBaseline saved to {path}")
+
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text(encoding="utf-8"))
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+chunk_dedup.py — Boilerplate stripping and near-duplicate chunk removal before embedding.
+
+PDF conversions repeat running headers, footers, copyright lines and the same
+caption text on many pages. Emmbed.py runs two passes so that text is embedded
+and stored once:
+
+    strip_boilerplate()  Before chunking: drops lines that recur on at least
+                         BOILERPLATE_MIN_PAGES pages and BOILERPLATE_MIN_FRACTION
+                         of all pages (digits are ignored when comparing, so
+                         "Page 3 of 10" matches "Page 4 of 10"). Needs Marker's
+                         page separators; documents without them are left as-is.
+    dedup_chunks()       After chunking: exact duplicates (normalised text hash)
+                         and near duplicates (64-bit SimHash over word shingles,
+                         Hamming distance <= SIMHASH_MAX_DISTANCE) are dropped.
+                         The first occurrence survives and records how many
+                         chunks it absorbed in metadata["duplicates_absorbed"].
+
+Pure Python — no Backend.* or third-party imports — so the pipeline subprocess
+can import it directly.
+"""
+
+import os                        # os.getenv() for thresholds
+import re                        # Line/text normalisation
+import hashlib                   # Exact-duplicate hashes and shingle hashes for SimHash
+
+from md_chunker import PAGE_SEPARATOR_PATTERN  # Marker's "{N}-----" page separators
+
+BOILERPLATE_MIN_PAGES = int(os.getenv("BOILERPLATE_MIN_PAGES", "3"))
+BOILERPLATE_MIN_FRACTION = float(os.getenv("BOILERPLATE_MIN_FRACTION", "0.3"))
+BOILERPLATE_DIGIT_WORDS = 6     # Lines up to this many words compare with digits ignored
+SIMHASH_MAX_DISTANCE = int(os.getenv("SIMHASH_MAX_DISTANCE", "6"))   # One-word edits in a chunk land around 3-6; unrelated text is ~20+ apart
+SHINGLE_SIZE = 3
+MIN_SHINGLES_FOR_SIMHASH = 8     # Shorter chunks are only matched exactly
+SIMHASH_BITS = 64
+SIMHASH_BANDS = SIMHASH_MAX_DISTANCE + 1   # Pigeonhole: near duplicates share at least one band
+
+DIGITS_PATTERN = re.compile(r'\d+')
+NON_WORD_PATTERN = re.compile(r'[^\w\s]')
+
+
+def _line_key(line: str) -> str:
+    key = " ".join(line.lower().split())
+    # Page numbers and dates vary in short header/footer lines only; longer
+    # lines that differ in their numbers are real content.
+    if len(key.split()) <= BOILERPLATE_DIGIT_WORDS:
+        key = DIGITS_PATTERN.sub("#", key)
+    return key
+
+
+def _is_boilerplate_candidate(line: str) -> bool:
+    # Headings define sections; structural lines (table rows/separators,
+    # fences, rules) legitimately repeat and carry no text of their own.
+    stripped = line.strip()
+    return len(stripped) >= 4 and not stripped.startswith(("#", "|", "```", "---", "***", "{"))
+
+
+def strip_boilerplate(markdown: str) -> tuple[str, int]:
+    """Remove lines repeated across many pages. Returns (markdown, lines removed)."""
+    lines = markdown.splitlines()
+    pages_per_key = {}
+    page, page_count = 0, 0
+    for line in lines:
+        if PAGE_SEPARATOR_PATTERN.match(line.strip()):
+            page_count += 1
+            page = page_count
+            continue
+        if _is_boilerplate_candidate(line):
+            pages_per_key.setdefault(_line_key(line), set()).add(page)
+
+    if page_count < BOILERPLATE_MIN_PAGES:
+        return markdown, 0
+
+    min_pages = max(BOILERPLATE_MIN_PAGES, BOILERPLATE_MIN_FRACTION * page_count)
+    boilerplate = {key for key, pages in pages_per_key.items() if len(pages) >= min_pages}
+    kept = [line for line in lines
+            if not (_is_boilerplate_candidate(line) and _line_key(line) in boilerplate)]
+    return "\n".join(kept), len(lines) - len(kept)
+
+
+def _normalize(text: str) -> str:
+    return " ".join(NON_WORD_PATTERN.sub(" ", text.lower()).split())
+
+
+def _simhash(words: list[str]) -> int:
+    weights = [0] * SIMHASH_BITS
+    for i in range(len(words) - SHINGLE_SIZE + 1):
+        shingle = " ".join(words[i:i + SHINGLE_SIZE]).encode("utf-8")
+        h = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def _bands(fingerprint: int) -> list[tuple[int, int]]:
+    width = SIMHASH_BITS // SIMHASH_BANDS
+    return [(band, fingerprint >> (band * width) & ((1 << width) - 1)) for band in range(SIMHASH_BANDS)]
+
+
+def dedup_chunks(chunks: list[tuple[str, dict]]) -> tuple[list[tuple[str, dict]], dict]:
+    """Drop exact and near-duplicate chunks (compared without their section-path
+    prefix). Returns (surviving chunks, {"exact": n, "near": n})."""
+    kept = []
+    exact_index = {}             # content hash -> position in kept
+    band_index = {}              # (band, value) -> [positions in kept]
+    fingerprints = []            # SimHash per kept chunk (None if too short)
+    stats = {"exact": 0, "near": 0}
+
+    for text, metadata in chunks:
+        section = metadata.get("section", "")
+        body = text[len(section):] if section and text.startswith(section) else text
+        words = _normalize(body).split()
+        digest = hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+
+        match = exact_index.get(digest)
+        kind = "exact"
+        fingerprint = None
+        if match is None and len(words) - SHINGLE_SIZE + 1 >= MIN_SHINGLES_FOR_SIMHASH:
+            fingerprint = _simhash(words)
+            candidates = {pos for key in _bands(fingerprint) for pos in band_index.get(key, [])}
+            for pos in sorted(candidates):
+                if bin(fingerprint ^ fingerprints[pos]).count("1") <= SIMHASH_MAX_DISTANCE:
+                    match, kind = pos, "near"
+                    break
+
+        if match is not None:
+            kept[match][1]["duplicates_absorbed"] += 1
+            stats[kind] += 1
+            continue
+
+        position = len(kept)
+        kept.append((text, {**metadata, "duplicates_absorbed": 0}))
+        exact_index[digest] = position
+        fingerprints.append(fingerprint)
+        if fingerprint is not None:
+            for key in _bands(fingerprint):
+                band_index.setdefault(key, []).append(position)
+
+    return kept, stats
@@ -0,0 +1,129 @@
+"""
+conversation_store.py — Server-side per-session chat history with rolling summarization.
+
+The client no longer resends the whole conversation on every message. Each
+session gets a conversation ID; the server keeps:
+
+    questions   Every user question (text only, capped) for direct
+                "what was my first/last question" lookups
+    turns       Recent (question, answer) pairs not yet folded into the summary
+    summary     An incrementally updated LLM summary of older turns
+
+Only the last HISTORY_WINDOW_TURNS turns plus the summary are sent to the
+LLM, so prompt size stays bounded in long sessions. Once SUMMARY_BATCH_TURNS
+turns have fallen out of the window they are handed to the summarizer
+(rag_components.summarize_turns) in a background task and removed.
+
+Conversations live in the shared SQLite store (shared_state.py), so every
+server worker sees the same history; each change is an atomic
+read-modify-write. Conversations idle for longer than
+CONVERSATION_TTL_SECONDS expire.
+"""
+
+import os                        # os.getenv() for window / TTL configuration
+import time                      # Stale-summarization detection
+
+from Backend.shared_state import shared_store
+
+HISTORY_WINDOW_TURNS = int(os.getenv("HISTORY_WINDOW_TURNS", "4"))
+SUMMARY_BATCH_TURNS = int(os.getenv("SUMMARY_BATCH_TURNS", "2"))
+CONVERSATION_TTL_SECONDS = int(os.getenv("CONVERSATION_TTL_SECONDS", str(24 * 3600)))
+MAX_QUESTIONS_KEPT = 200
+# A summarization claimed longer ago than this (e.g. by a worker that died) may be retried.
+SUMMARY_STALE_SECONDS = 300
+
+NAMESPACE = "conversation"
+
+
+class Conversation:
+    """Snapshot of one conversation; mutate it only through ConversationStore."""
+
+    def __init__(self, data: dict = None):
+        data = data or {}
+        self.questions = data.get("questions", [])      # user questions, oldest first
+        self.turns = data.get("turns", [])              # [{"question", "answer"}] not yet summarized
+        self.summary = data.get("summary", "")
+        self.summarizing_since = data.get("summarizing_since")
+
+    def to_dict(self) -> dict:
+        return {"questions": self.questions, "turns": self.turns,
+                "summary": self.summary, "summarizing_since": self.summarizing_since}
+
+    def is_empty(self) -> bool:
+        return not self.questions
+
+    def recent_turns(self) -> list[dict]:
+        return self.turns[-HISTORY_WINDOW_TURNS:] if HISTORY_WINDOW_TURNS > 0 else []
+
+
+class ConversationStore:
+    """Conversation ID → Conversation, persisted in the shared store."""
+
+    def __init__(self, store=shared_store, ttl_seconds: int = CONVERSATION_TTL_SECONDS):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+
+    def _update(self, conversation_id: str, fn) -> Conversation:
+        def apply(data):
+            conversation = Conversation(data)
+            fn(conversation)
+            return conversation.to_dict()
+        return Conversation(self.store.update(NAMESPACE, conversation_id, apply, ttl=self.ttl_seconds))
+
+    def get(self, conversation_id: str) -> Conversation:
+        return Conversation(self.store.get(NAMESPACE, conversation_id))
+
+    def seed(self, conversation_id: str, history: list[dict]) -> Conversation:
+        """Populate an empty conversation from client-side history
+        (e.g. after a server restart); [{"role", "content"}, ...]."""
+        def apply(conversation):
+            if not conversation.is_empty():
+                return
+            question = None
+            for msg in history:
+                if msg.get("role") == "user":
+                    question = msg.get("content", "")
+                    conversation.questions.append(question)
+                elif msg.get("role") == "assistant" and question is not None:
+                    conversation.turns.append({"question": question, "answer": msg.get("content", "")})
+                    question = None
+            del conversation.questions[:-MAX_QUESTIONS_KEPT]
+        return self._update(conversation_id, apply)
+
+    def add_turn(self, conversation_id: str, question: str, answer: str):
+        def apply(conversation):
+            conversation.questions.append(question)
+            del conversation.questions[:-MAX_QUESTIONS_KEPT]
+            conversation.turns.append({"question": question, "answer": answer})
+        self._update(conversation_id, apply)
+
+    def take_overflow(self, conversation_id: str) -> tuple[str, list[dict]]:
+        """Claim the turns that have left the window for summarization.
+        Returns (current summary, turns), with no turns if fewer than
+        SUMMARY_BATCH_TURNS are waiting or another summary is running."""
+        claimed = []
+
+        def apply(conversation):
+            overflow = conversation.turns[:max(len(conversation.turns) - HISTORY_WINDOW_TURNS, 0)]
+            running = (conversation.summarizing_since is not None
+                       and time.time() - conversation.summarizing_since < SUMMARY_STALE_SECONDS)
+            if running or len(overflow) < SUMMARY_BATCH_TURNS:
+                return
+            conversation.summarizing_since = time.time()
+            claimed.extend(overflow)
+
+        conversation = self._update(conversation_id, apply)
+        return conversation.summary, claimed
+
+    def fold(self, conversation_id: str, summary: str | None, count: int):
+        """Finish a summarization: replace the summary and drop the `count`
+        oldest turns. summary=None (summarizer failed) keeps everything."""
+        def apply(conversation):
+            if summary is not None:
+                conversation.summary = summary
+                del conversation.turns[:count]
+            conversation.summarizing_since = None
+        self._update(conversation_id, apply)
+
+    def delete(self, conversation_id: str):
+        self.store.delete(NAMESPACE, conversation_id)
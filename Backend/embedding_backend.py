@@ -0,0 +1,189 @@
+"""
+embedding_backend.py — Pluggable embedding backends (sentence-transformers / ONNX int8).
+
+Both the server (rag_components.py) and the pipeline (Emmbed.py) get their
+embedding model from here, so the model choice lives in one place:
+
+    EMBEDDING_BACKEND     "sentence-transformers" (default) or "onnx"
+    EMBEDDING_MODEL_NAME  HF model id, e.g. BAAI/bge-large-en-v1.5, BAAI/bge-base-en-v1.5,
+                          BAAI/bge-small-en-v1.5
+    EMBEDDING_ONNX_DIR    Directory holding the converted model (onnx backend only)
+
+Every collection records the model it was embedded with in its metadata
+(EMBEDDING_MODEL_KEY). Querying a collection with a different model returns
+garbage neighbours, so check_collection_model() refuses it.
+
+Usage (convert + int8-quantize a model for the onnx backend):
+    python embedding_backend.py convert [--model BAAI/bge-small-en-v1.5] [--output onnx_models/bge-small-en-v1.5]
+"""
+
+import os                        # os.getenv() for backend/model selection
+import sys                       # CLI argument parsing for the convert command
+import argparse                  # Parse the convert command's flags
+from pathlib import Path         # Object-oriented filesystem path construction
+
+BASE_DIR = Path(__file__).parent
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "sentence-transformers").lower()
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "BAAI/bge-large-en-v1.5")
+ONNX_MODELS_DIR = BASE_DIR / "onnx_models"
+EMBEDDING_ONNX_DIR = Path(os.getenv(
+    "EMBEDDING_ONNX_DIR",
+    str(ONNX_MODELS_DIR / EMBEDDING_MODEL_NAME.split("/")[-1]),
+))
+
+# bge models were trained with a 512-token window; longer inputs are truncated.
+EMBEDDING_MAX_TOKENS = 512
+ONNX_BATCH_SIZE = 32
+
+# Collection metadata key recording which model produced the stored vectors.
+EMBEDDING_MODEL_KEY = "embedding_model"
+
+
+class EmbeddingModelMismatch(ValueError):
+    """Raised when a collection was embedded with a different model than the active one."""
+
+
+def collection_metadata() -> dict:
+    """Metadata to attach to every newly created collection."""
+    return {EMBEDDING_MODEL_KEY: EMBEDDING_MODEL_NAME}
+
+
+def check_collection_model(collection) -> None:
+    """Raise EmbeddingModelMismatch if `collection` was embedded with another model.
+
+    Collections created before the model was recorded carry no key; they were
+    always embedded with bge-large, so that is what they are compared against."""
+    stored = (collection.metadata or {}).get(EMBEDDING_MODEL_KEY, "BAAI/bge-large-en-v1.5")
+    if stored != EMBEDDING_MODEL_NAME:
+        raise EmbeddingModelMismatch(
+            f"Collection '{collection.name}' was embedded with '{stored}', "
+            f"but the active embedding model is '{EMBEDDING_MODEL_NAME}'. "
+            f"Re-ingest the collection or set EMBEDDING_MODEL_NAME={stored}."
+        )
+
+
+class OnnxEmbeddings:
+    """LangChain-compatible embeddings backed by an int8-quantized ONNX export of a bge model.
+
+    Uses CLS pooling + L2 normalisation, which is what bge (and therefore the
+    sentence-transformers backend) does, so vectors are interchangeable with
+    the full-precision model up to quantization noise."""
+
+    def __init__(self, model_dir: Path, batch_size: int = ONNX_BATCH_SIZE):
+        import numpy as np
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = Path(model_dir) / "model_quantized.onnx"
+        if not model_path.exists():
+            model_path = Path(model_dir) / "model.onnx"
+        if not model_path.exists():
+            raise FileNotFoundError(
+                f"No ONNX model in '{model_dir}'. Run: python embedding_backend.py convert"
+            )
+
+        self._np = np
+        self.batch_size = batch_size
+        self.tokenizer = Tokenizer.from_file(str(Path(model_dir) / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=EMBEDDING_MAX_TOKENS)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: list[str]):
+        np = self._np
+        encoded = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encoded], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encoded], dtype=np.int64),
+        }
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encoded], dtype=np.int64)
+
+        last_hidden_state = self.session.run(None, feeds)[0]
+        cls = last_hidden_state[:, 0]
+        return cls / np.linalg.norm(cls, axis=1, keepdims=True)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode_batch(texts[i:i + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._encode_batch([text])[0].tolist()
+
+
+def get_embeddings():
+    """Build the configured embedding backend. Both backends expose
+    embed_documents() / embed_query() and return L2-normalised vectors."""
+    print(f"Loading embedding model: {EMBEDDING_MODEL_NAME} (backend: {EMBEDDING_BACKEND})...")
+    if EMBEDDING_BACKEND == "onnx":
+        return OnnxEmbeddings(EMBEDDING_ONNX_DIR)
+    if EMBEDDING_BACKEND != "sentence-transformers":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{EMBEDDING_BACKEND}'")
+
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={'device': "cuda" if torch.cuda.is_available() else "cpu"},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+
+
+def get_token_counter():
+    """Return a callable counting tokens with the active model's tokenizer
+    (special tokens excluded). Uses the lightweight `tokenizers` package, so
+    callers that only need chunk sizing never import torch."""
+    from tokenizers import Tokenizer
+
+    local = EMBEDDING_ONNX_DIR / "tokenizer.json"
+    if local.exists():
+        tokenizer = Tokenizer.from_file(str(local))
+    else:
+        tokenizer = Tokenizer.from_pretrained(EMBEDDING_MODEL_NAME)
+    tokenizer.no_truncation()
+    tokenizer.no_padding()
+    return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+
+def convert_to_onnx(model_name: str, output_dir: Path):
+    """Export `model_name` to ONNX and apply int8 dynamic quantization.
+    Writes model.onnx, model_quantized.onnx and tokenizer.json into output_dir."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from transformers import AutoTokenizer
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Exporting {model_name} to ONNX in {output_dir}...")
+    ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+
+    print("Applying int8 dynamic quantization...")
+    quantize_dynamic(
+        model_input=str(output_dir / "model.onnx"),
+        model_output=str(output_dir / "model_quantized.onnx"),
+        weight_type=QuantType.QInt8,
+    )
+    print(f"Done. Use it with: EMBEDDING_BACKEND=onnx EMBEDDING_MODEL_NAME={model_name} "
+          f"EMBEDDING_ONNX_DIR={output_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding backend utilities.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="Export a model to int8-quantized ONNX.")
+    convert.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    convert.add_argument("--output", default=None)
+    args = parser.parse_args(sys.argv[1:])
+
+    if args.command == "convert":
+        out = Path(args.output) if args.output else ONNX_MODELS_DIR / args.model.split("/")[-1]
+        convert_to_onnx(args.model, out)
@@ -0,0 +1,118 @@
+"""
+embedding_service.py — In-process micro-batching in front of the embedding model.
+
+Concurrent /chat requests each embed a single query; run one at a time they
+leave most of the model's matrix throughput unused. EmbeddingService collects
+texts from all callers into one queue and a dispatcher thread runs them
+through the model together:
+
+    - A batch closes when it holds EMBED_MAX_BATCH texts or the oldest text
+      has waited EMBED_MAX_WAIT_MS, whichever comes first.
+    - embed_query() texts are interactive and always go first; embed_documents()
+      texts (data.json ingestion, /chat/batch) are bulk and fill the rest of the
+      batch, so a large ingestion delays a query by at most one batch.
+
+Batch sizes and queue waits are exported on /metrics as
+embedding_batch_size{priority} and embedding_queue_wait_seconds{priority}.
+
+It exposes embed_query()/embed_documents() like the wrapped backend, so it is a
+drop-in replacement for rag_components.embeddings. The pipeline subprocess
+(Emmbed.py) embeds a whole document in one call and keeps its own model.
+"""
+
+import os                        # os.getenv() for batch limits; getpid() to restart after fork
+import time                      # Batch window deadlines and queue wait measurement
+import threading                 # Dispatcher thread + condition variable guarding the queues
+from collections import deque    # FIFO queues per priority
+from concurrent.futures import Future  # Per-text result handed back to the waiting caller
+
+from Backend.telemetry import histogram
+
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+
+BATCH_SIZE = histogram(
+    "embedding_batch_size", "Texts per embedding model call by the highest priority in the batch.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+QUEUE_WAIT_SECONDS = histogram(
+    "embedding_queue_wait_seconds", "Time a text waited for an embedding batch by priority.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Serialises dispatcher start-up between threads making their first call at once.
+_start_lock = threading.Lock()
+
+
+class EmbeddingService:
+    def __init__(self, model, max_batch: int = EMBED_MAX_BATCH, max_wait_ms: float = EMBED_MAX_WAIT_MS):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._pid = None
+
+    def _ensure_dispatcher(self):
+        # The dispatcher thread (and its lock) do not survive fork: each
+        # gunicorn worker starts its own on first use.
+        if self._pid == os.getpid():
+            return
+        with _start_lock:
+            if self._pid == os.getpid():
+                return               # Another thread started it while we waited
+            self._cond = threading.Condition()
+            self._queues = {INTERACTIVE: deque(), BULK: deque()}
+            threading.Thread(target=self._dispatch_forever, name="embedding-batcher", daemon=True).start()
+            self._pid = os.getpid()  # Published last: other threads then see a ready service
+
+    def _submit(self, texts: list[str], priority: str) -> list[Future]:
+        self._ensure_dispatcher()
+        now = time.monotonic()
+        futures = [Future() for _ in texts]
+        with self._cond:
+            self._queues[priority].extend((text, future, now) for text, future in zip(texts, futures))
+            self._cond.notify()
+        return futures
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._submit([text], INTERACTIVE)[0].result()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [future.result() for future in self._submit(list(texts), BULK)]
+
+    def _next_batch(self) -> list[tuple]:
+        """Block until a batch is ready; returns [(text, future, enqueued_at, priority)]."""
+        interactive, bulk = self._queues[INTERACTIVE], self._queues[BULK]
+        with self._cond:
+            while not interactive and not bulk:
+                self._cond.wait()
+            oldest = min(q[0][2] for q in (interactive, bulk) if q)
+            deadline = oldest + self.max_wait
+            while len(interactive) + len(bulk) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = []
+            for priority, queue in ((INTERACTIVE, interactive), (BULK, bulk)):
+                while queue and len(batch) < self.max_batch:
+                    batch.append((*queue.popleft(), priority))
+            return batch
+
+    def _dispatch_forever(self):
+        while True:
+            batch = self._next_batch()
+            started = time.monotonic()
+            for _, _, enqueued_at, priority in batch:
+                QUEUE_WAIT_SECONDS.observe(started - enqueued_at, priority=priority)
+            BATCH_SIZE.observe(len(batch), priority=batch[0][3])
+            try:
+                vectors = self.model.embed_documents([text for text, _, _, _ in batch])
+            except Exception as e:
+                for _, future, _, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _, _), vector in zip(batch, vectors):
+                future.set_result(vector)
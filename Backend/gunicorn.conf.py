@@ -0,0 +1,45 @@
+"""
+gunicorn.conf.py — Multi-worker server with models preloaded before fork.
+
+The master imports the app and loads the model weights once
+(rag_components.load_models), then forks WEB_WORKERS uvicorn workers. Workers
+share the weights copy-on-write instead of each loading bge-large (>1 GB)
+again, and re-create their fork-unsafe clients in post_fork. The master runs
+no inference: torch's thread pool and the embedding dispatcher thread do not
+survive fork, so data.json ingestion and the warm-up pass run in each worker's
+lifespan (rag_components.warm_up; one worker ingests, the others wait for it).
+Cross-request state (job status, conversations, reaper lease) lives in the
+shared SQLite store (shared_state.py), so any worker can serve any request.
+
+Usage (from Backend/):
+    gunicorn main:app -c gunicorn.conf.py
+"""
+
+import os                        # Worker count / bind address from the environment
+import sys                       # Check whether torch was loaded before setting its thread count
+import time                      # Server run id
+
+bind = os.getenv("BIND", "0.0.0.0:7860")
+workers = int(os.getenv("WEB_WORKERS", os.cpu_count() or 1))
+os.environ["WEB_WORKERS"] = str(workers)  # admission.py splits per-worker budgets by it
+# Shared by this master's workers: main.py clears the previous run's metric exports once per run.
+os.environ["SERVER_RUN_ID"] = f"{os.getpid()}:{time.time():.0f}"
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True               # Import main.py in the master so post-fork workers share it
+timeout = int(os.getenv("WORKER_TIMEOUT", "300"))
+graceful_timeout = 30
+
+
+def when_ready(server):
+    """Runs in the master before any worker is forked."""
+    from Backend.rag_components import load_models
+    server.log.info("Preloading model weights in the master process...")
+    load_models()
+
+
+def post_fork(server, worker):
+    from Backend.rag_components import reinit_after_fork
+    reinit_after_fork()
+    # Split the cores between workers so torch's intra-op threads don't oversubscribe.
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(max(1, (os.cpu_count() or 1) // workers))
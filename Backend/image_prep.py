@@ -0,0 +1,136 @@
+"""
+image_prep.py — Filter and shrink Marker-extracted images before vision captioning.
+
+Base.py runs every extracted image through prepare_images():
+
+    Drop       Images smaller than IMAGE_MIN_SIDE px on a side or IMAGE_MIN_AREA px
+               in total (icons, bullets), thin strips with an aspect ratio above
+               IMAGE_MAX_ASPECT (decorative rules), and near-uniform images whose
+               grayscale entropy is below IMAGE_MIN_ENTROPY bits (blank fills).
+    Downsize   Longest side capped at IMAGE_MAX_SIDE px — well above what the
+               vision model needs to read a chart.
+    Recompress Few-colour line art → palette PNG; everything else → JPEG at
+               IMAGE_JPEG_QUALITY.
+
+An image that fails to prepare is saved as extracted, or dropped if that
+fails too. Dropped images' markdown links are removed and re-encoded images'
+links are renamed (rewrite_image_links), so Image-Testo.py only ever sees
+images worth captioning and no link points at a missing file. It also uses page_of() to pack small figures from the same page
+into one captioning request.
+
+Used by the pipeline scripts, so it only imports third-party modules (no Backend.*).
+"""
+
+import os                        # os.getenv() for thresholds
+import re                        # Markdown image links and page numbers in Marker filenames
+from io import BytesIO           # Encode images in memory before writing them
+from pathlib import Path         # Object-oriented filesystem path construction
+from PIL import Image            # Marker hands images over as PIL images
+
+IMAGE_MIN_SIDE = int(os.getenv("IMAGE_MIN_SIDE", "48"))
+IMAGE_MIN_AREA = int(os.getenv("IMAGE_MIN_AREA", str(96 * 96)))
+IMAGE_MAX_ASPECT = float(os.getenv("IMAGE_MAX_ASPECT", "12"))
+IMAGE_MIN_ENTROPY = float(os.getenv("IMAGE_MIN_ENTROPY", "2.0"))
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1024"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "80"))
+PALETTE_MAX_COLORS = 64
+
+IMAGE_LINK_PATTERN = re.compile(r'!\[[^\]]*\]\(([^)]*)\)')
+PAGE_PATTERN = re.compile(r'_page_(\d+)_')
+
+
+def drop_reason(image: Image.Image) -> str | None:
+    """Why an image is not worth captioning, or None to keep it."""
+    width, height = image.size
+    if min(width, height) < IMAGE_MIN_SIDE or width * height < IMAGE_MIN_AREA:
+        return f"too small ({width}x{height})"
+    if max(width, height) / max(min(width, height), 1) > IMAGE_MAX_ASPECT:
+        return f"decorative strip ({width}x{height})"
+    entropy = image.convert("L").entropy()
+    if entropy < IMAGE_MIN_ENTROPY:
+        return f"low entropy ({entropy:.2f} bits)"
+    return None
+
+
+def _encoded(image: Image.Image, fmt: str, **options) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+def shrink(image: Image.Image) -> tuple[bytes, str]:
+    """Downsize to IMAGE_MAX_SIDE and re-encode. Returns (bytes, file suffix)."""
+    image = image.copy()
+    image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE), Image.LANCZOS)
+    if image.mode in ("RGBA", "LA", "P"):
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image.convert("RGBA"), mask=image.convert("RGBA").split()[-1])
+        image = background
+    else:
+        image = image.convert("RGB")
+
+    if image.getcolors(PALETTE_MAX_COLORS) is not None:
+        palette = image.quantize(colors=PALETTE_MAX_COLORS)
+        return _encoded(palette, "PNG", optimize=True), ".png"
+    return _encoded(image, "JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True), ".jpeg"
+
+
+def _save_original(image: Image.Image, path: Path) -> int:
+    """Write the image as Marker extracted it (format from the suffix). Returns its size."""
+    data = _encoded(image.convert("RGB"), "PNG" if path.suffix.lower() == ".png" else "JPEG")
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def prepare_images(images: dict, output_dir: Path) -> tuple[set, dict, dict]:
+    """Filter, shrink and write Marker's {filename: PIL image} to output_dir.
+    Returns (dropped filenames, {old filename: new filename}, stats)."""
+    dropped, renamed = set(), {}
+    stats = {"kept": 0, "dropped": 0, "bytes_after": 0}
+    for filename, image in images.items():
+        try:
+            reason = drop_reason(image)
+            if reason:
+                print(f"Dropping image {filename}: {reason}")
+                dropped.add(filename)
+                stats["dropped"] += 1
+                continue
+
+            data, suffix = shrink(image)
+            new_filename = str(Path(filename).with_suffix(suffix))
+            if new_filename != filename:
+                renamed[filename] = new_filename
+            with open(output_dir / new_filename, "wb") as f:
+                f.write(data)
+            stats["kept"] += 1
+            stats["bytes_after"] += len(data)
+        except Exception as e:
+            print(f"An error occurred while preparing image {filename}: {e}")
+            renamed.pop(filename, None)
+            try:
+                stats["bytes_after"] += _save_original(image, output_dir / filename)
+                stats["kept"] += 1
+            except Exception as e:
+                print(f"Could not save image {filename} either, dropping it: {e}")
+                dropped.add(filename)
+                stats["dropped"] += 1
+    return dropped, renamed, stats
+
+
+def rewrite_image_links(markdown: str, dropped: set, renamed: dict) -> str:
+    """Remove links to dropped images and point renamed ones at their new file."""
+    def replace(match):
+        target = match.group(1)
+        if target in dropped:
+            return ""
+        if target in renamed:
+            return match.group(0).replace(f"({target})", f"({renamed[target]})")
+        return match.group(0)
+    return IMAGE_LINK_PATTERN.sub(replace, markdown)
+
+
+def page_of(filename: str) -> int | None:
+    """Page number from Marker's image filenames (e.g. '_page_4_Figure_2.jpeg')."""
+    match = PAGE_PATTERN.search(filename)
+    return int(match.group(1)) if match else None
@@ -0,0 +1,53 @@
+"""
+llm_callbacks.py — LangChain callback handler feeding LLM timings into telemetry.py.
+
+Kept separate from telemetry.py so that importing the metrics registry does
+not pull in LangChain; rag_components imports this lazily in load_models().
+"""
+
+import time                      # perf_counter() for call timing
+from langchain_core.callbacks import BaseCallbackHandler  # Hook LLM start/end for timing + token usage
+
+from Backend.telemetry import record_llm_call
+
+
+class LLMTelemetryCallback(BaseCallbackHandler):
+    """Times chat-model calls and counts tokens, labelled by the "stage:<name>" tag."""
+
+    def __init__(self):
+        self._starts = {}
+
+    @staticmethod
+    def _stage(tags) -> str:
+        for tag in tags or []:
+            if tag.startswith("stage:"):
+                return tag.split(":", 1)[1]
+        return "llm"
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, tags=None, **kwargs):
+        self._starts[run_id] = (self._stage(tags), time.perf_counter())
+
+    def on_llm_start(self, serialized, prompts, *, run_id, tags=None, **kwargs):
+        self._starts[run_id] = (self._stage(tags), time.perf_counter())
+
+    def _finish(self, run_id, response=None):
+        stage, start = self._starts.pop(run_id, ("llm", None))
+        if start is None:
+            return
+        usage = {}
+        if response is not None:
+            try:
+                usage = response.generations[0][0].message.usage_metadata or {}
+            except (AttributeError, IndexError):
+                usage = {}
+        record_llm_call(
+            stage, time.perf_counter() - start,
+            prompt_tokens=usage.get("input_tokens", 0),
+            completion_tokens=usage.get("output_tokens", 0),
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, response)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
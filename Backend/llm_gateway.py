@@ -0,0 +1,228 @@
+"""
+llm_gateway.py — Resilient chat-model wrapper: deadlines, hedged requests, circuit breaker, fallback.
+
+LLMGateway is a LangChain chat model that wraps the remote ChatOllama
+(gpt-oss:120b on OLLAMA_BASE_URL) so the RAG chain and history answers
+inherit these protections without changing how they call the LLM:
+
+    Deadline         Each call must finish within LLM_DEADLINE_SECONDS.
+    Hedging          If the remote has not answered after LLM_HEDGE_AFTER_SECONDS,
+                     an identical second request is sent and whichever finishes
+                     first wins (0 disables hedging).
+    Circuit breaker  After LLM_BREAKER_FAILURES consecutive failures/timeouts the
+                     remote is skipped for LLM_BREAKER_RESET_SECONDS; then one trial
+                     call decides whether to close the breaker again.
+    Fallback         While the breaker is open, or when a remote call fails, the
+                     request goes to a smaller local model (LOCAL_LLM_MODEL_ID on
+                     LOCAL_OLLAMA_BASE_URL). Leave LOCAL_LLM_MODEL_ID empty to disable.
+
+build_ollama() configures the underlying HTTP client with pooled keep-alive
+connections and timeouts, so repeated calls reuse TLS connections to the
+remote instead of reconnecting.
+
+Imported lazily by rag_components.load_models(), like llm_callbacks.py.
+"""
+
+import os                        # os.getenv() for deadlines, hedging and fallback configuration
+import time                      # Breaker open/half-open timing
+import asyncio                   # Async hedging path (ainvoke)
+import threading                 # Breaker state is shared by request threads
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait  # Sync hedging path
+from typing import Any, Optional
+
+import httpx                     # Connection-pool limits and timeouts for the Ollama client
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import Field
+
+from Backend.telemetry import counter
+
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "60"))
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "15"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LOCAL_OLLAMA_BASE_URL = os.getenv("LOCAL_OLLAMA_BASE_URL", "http://localhost:11434")
+LOCAL_LLM_MODEL_ID = os.getenv("LOCAL_LLM_MODEL_ID", "")
+
+GATEWAY_EVENTS = counter("llm_gateway_events_total", "LLM gateway hedges, timeouts, errors and fallbacks.")
+
+# Remote calls run here so a hedged or timed-out request can be abandoned
+# without blocking the caller; the HTTP timeout bounds how long it lingers.
+_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONNECTIONS, thread_name_prefix="llm-gateway")
+
+
+def _reset_executor():
+    # Worker threads do not survive fork; a forked server worker needs its own pool.
+    global _executor
+    _executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONNECTIONS, thread_name_prefix="llm-gateway")
+
+
+os.register_at_fork(after_in_child=_reset_executor)
+
+
+def build_ollama(base_url: str, model: str, api_key: str = None, **kwargs):
+    """ChatOllama with a pooled keep-alive HTTP client and a hard per-request timeout."""
+    from langchain_ollama.chat_models import ChatOllama
+
+    client_kwargs = {
+        "timeout": httpx.Timeout(LLM_DEADLINE_SECONDS, connect=5.0),
+        "limits": httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            keepalive_expiry=120,
+        ),
+    }
+    if api_key:
+        client_kwargs["headers"] = {"Authorization": f"Bearer {api_key}"}
+    return ChatOllama(base_url=base_url, model=model, client_kwargs=client_kwargs, **kwargs)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed → open → (after reset_seconds) half-open trial."""
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES,
+                 reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a remote call may be attempted now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds or self._trial_running:
+                return False
+            self._trial_running = True   # half-open: let exactly one call through
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"[LLM GATEWAY] Remote degraded after {self.failures} failures — breaker open.")
+                self.opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+
+class LLMGateway(BaseChatModel):
+    """Chat model that routes to `primary` with deadline + hedging, failing over to `fallback`."""
+
+    primary: BaseChatModel
+    fallback: Optional[BaseChatModel] = None
+    deadline_seconds: float = LLM_DEADLINE_SECONDS
+    hedge_after_seconds: float = LLM_HEDGE_AFTER_SECONDS
+    breaker: Any = Field(default_factory=CircuitBreaker)
+
+    @property
+    def _llm_type(self) -> str:
+        return "ollama-gateway"
+
+    @staticmethod
+    def _result(message) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _call_primary(self, messages, stop):
+        """One remote call with a hedge after hedge_after_seconds; raises TimeoutError
+        at the deadline or the first error if every attempt failed."""
+        deadline = time.monotonic() + self.deadline_seconds
+        attempts = [_executor.submit(self.primary.invoke, messages, stop=stop)]
+        errors = []
+        while attempts:
+            hedge_pending = len(attempts) == 1 and not errors and 0 < self.hedge_after_seconds
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                GATEWAY_EVENTS.inc(event="timeout")
+                raise TimeoutError(f"LLM call exceeded {self.deadline_seconds}s deadline")
+            timeout = min(remaining, self.hedge_after_seconds) if hedge_pending else remaining
+            done, _ = wait(attempts, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                attempts.remove(future)
+                if future.exception() is None:
+                    return future.result()
+                errors.append(future.exception())
+            if not done and hedge_pending:
+                GATEWAY_EVENTS.inc(event="hedge")
+                attempts.append(_executor.submit(self.primary.invoke, messages, stop=stop))
+        raise errors[0]
+
+    async def _acall_primary(self, messages, stop):
+        """Async twin of _call_primary; losing attempts are cancelled."""
+        attempts = {asyncio.ensure_future(self.primary.ainvoke(messages, stop=stop))}
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline_seconds
+        errors = []
+        try:
+            while attempts:
+                hedge_pending = len(attempts) == 1 and not errors and 0 < self.hedge_after_seconds
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    GATEWAY_EVENTS.inc(event="timeout")
+                    raise TimeoutError(f"LLM call exceeded {self.deadline_seconds}s deadline")
+                timeout = min(remaining, self.hedge_after_seconds) if hedge_pending else remaining
+                done, attempts = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(task.exception())
+                if not done and hedge_pending:
+                    GATEWAY_EVENTS.inc(event="hedge")
+                    attempts.add(asyncio.ensure_future(self.primary.ainvoke(messages, stop=stop)))
+            raise errors[0]
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.fallback is None or self.breaker.allow():
+            try:
+                message = self._call_primary(messages, stop)
+                self.breaker.record_success()
+                return self._result(message)
+            except Exception as e:
+                self.breaker.record_failure()
+                GATEWAY_EVENTS.inc(event="error")
+                if self.fallback is None:
+                    raise
+                print(f"[LLM GATEWAY] Remote call failed ({e!r}) — using local fallback.")
+        GATEWAY_EVENTS.inc(event="fallback")
+        return self._result(self.fallback.invoke(messages, stop=stop))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.fallback is None or self.breaker.allow():
+            try:
+                message = await self._acall_primary(messages, stop)
+                self.breaker.record_success()
+                return self._result(message)
+            except Exception as e:
+                self.breaker.record_failure()
+                GATEWAY_EVENTS.inc(event="error")
+                if self.fallback is None:
+                    raise
+                print(f"[LLM GATEWAY] Remote call failed ({e!r}) — using local fallback.")
+        GATEWAY_EVENTS.inc(event="fallback")
+        return self._result(await self.fallback.ainvoke(messages, stop=stop))
+
+
+def build_gateway(base_url: str, model: str, api_key: str = None, **kwargs) -> LLMGateway:
+    """Remote model behind the gateway, with the local fallback if LOCAL_LLM_MODEL_ID is set."""
+    primary = build_ollama(base_url, model, api_key, **kwargs)
+    fallback = build_ollama(LOCAL_OLLAMA_BASE_URL, LOCAL_LLM_MODEL_ID, **kwargs) if LOCAL_LLM_MODEL_ID else None
+    return LLMGateway(primary=primary, fallback=fallback)
@@ -4,10 +4,14 @@ main.py — FastAPI server & route definitions.
 Serves the frontend pages, handles Google OAuth / guest authentication,
 PDF upload with background processing, audio transcription, and the
 main chat endpoint that delegates to the RAG chain in rag_components.py.
+Chat, transcription and PDF pipelines pass through per-class admission
+budgets (admission.py); excess requests get 429 + Retry-After.
 """
 
 import os                        # Access environment variables via os.getenv()
-import shutil                    # shutil.rmtree() to delete temp dirs after pipeline processing
+import asyncio                   # Periodic reaper task; run blocking RAG/pipeline work in threads
+import json                      # Parse control messages on the transcription WebSocket
+import shutil                    # shutil.rmtree() to delete temp dirs after pipeline processing; which("nice")
 from dotenv import load_dotenv, find_dotenv  # Load .env file for secrets (OAuth, session key)
 from fastapi import (            # FastAPI web framework core components
     FastAPI,                     # Application instance
@@ -15,42 +19,69 @@ from fastapi import (            # FastAPI web framework core components
     HTTPException,               # Return HTTP error responses
     BackgroundTasks,             # Run PDF pipeline asynchronously in the background
     Request,                     # Access session data and request info in routes
+    WebSocket,                   # Streaming audio frames for incremental transcription
+    WebSocketDisconnect,
 )
 from fastapi.responses import (
     HTMLResponse,                # Serve raw HTML pages (login, chat, upload)
     RedirectResponse,            # Redirect after auth or page guards
     JSONResponse,                # JSON replies for logout, session-expired, etc.
+    PlainTextResponse,           # Prometheus text exposition for /metrics
+    StreamingResponse,           # JSONL results from /chat/batch as they complete
 )
 from fastapi.staticfiles import StaticFiles  # Mount frontend folder as /static for CSS/JS/images
 from pathlib import Path         # Object-oriented filesystem path construction
-import speech_recognition as sr  # Google Speech Recognition for audio-to-text transcription
-import io                        # io.BytesIO — in-memory binary stream for audio format conversion
-from pydub import AudioSegment   # Convert uploaded audio (webm) to WAV before transcription
 import subprocess                # Run pipeline scripts (Base.py, Image-Testo.py, Emmbed.py) as subprocesses
 import sys                       # sys.executable — get current Python interpreter path for subprocesses
 from pydantic import BaseModel   # Define typed request body schema (ChatRequest)
-from contextlib import asynccontextmanager  # Wrap app startup/shutdown logic in lifespan handler
+from contextlib import asynccontextmanager, AsyncExitStack  # Lifespan handler; batch slot held while streaming
 import re                        # Regex for filename sanitization and user ID cleaning
-from langchain_core.messages import HumanMessage, AIMessage  # Build typed chat history for LangChain RAG chain
-from typing import Dict          # Type hint for the processing_status dictionary
+import uuid                      # Per-session conversation IDs
+import time                      # Start time in the key of this worker's metric export
+import sqlite3                   # Metric publishing survives a locked shared store
 
 from starlette.middleware.sessions import SessionMiddleware  # Cookie-based session middleware (24h expiry)
+from starlette.background import BackgroundTask               # Release the batch slot if streaming is cut short
 from authlib.integrations.starlette_client import OAuth       # Google OAuth2 client for sign-in flow
 
+from Backend.telemetry import (  # Timing spans, per-request traces and the /metrics registry
+    span, trace_request, render_metrics, export_metrics, PIPELINE_STAGE_SECONDS,
+)
+from Backend.static_assets import StaticAssets  # Cached HTML pages + precompressed, fingerprinted assets
+from Backend.shared_state import shared_store  # SQLite state shared by all server workers
+from Backend.conversation_store import ConversationStore  # Server-side chat history + rolling summary
+from Backend.batch_qa import answer_batch  # Bulk QA: batched embedding/retrieval, bounded LLM parallelism
+from Backend.admission import admission, Overloaded  # Per-class budgets, priority queueing, load shedding
+from Backend import speech_engine  # Speech-to-text engines (Google / local Whisper) in a worker process pool
+# rag_components defers its heavy imports (LangChain, ChromaDB, torch) to first use,
+# so importing it here keeps server startup fast.
 from Backend.rag_components import (
-    load_models,                 # Initialize LLM, embeddings, and ChromaDB at startup
+    warm_up,                     # Load models, ingest data.json, run a dummy embedding/search pass
+    is_retrieval_ready,          # True once warm_up() has completed
     get_rag_chain_for_collection,# Build the full RAG chain for a given user collection
-    check_and_ingest_json,       # Ingest data.json into ChromaDB's global collection
-    delete_user_collections,     # Remove all of a user's ChromaDB collections on logout
+    delete_user_collections,     # Remove a user's ChromaDB collections on logout
+    get_user_collection_name,    # Prefix of a user's document collections (u_{userId})
+    document_collection_name,    # Collection of one uploaded document (u_{userId}_{docName})
+    reap_user_storage,           # Expire idle user collections and enforce per-user quotas
     answer_from_history_only,    # Answer meta-questions purely from chat history
+    build_chat_history,          # Summary + recent-turn window as LangChain messages
+    summarize_turns,             # Fold turns that left the window into the rolling summary
     META_QUESTION_PATTERNS,      # Regex to detect conversation-about-itself questions
     answer_department_query,     # Direct JSON lookup for department count/list queries
     DEPARTMENT_QUERY_PATTERNS,
 )
 
-# In-memory dict tracking PDF processing state per document.
+# PDF processing state per document lives in the shared store (namespace
+# "job_status") so /status polling works whichever worker ran the pipeline.
 # Values: "processing" | "completed" | "failed"
-processing_status: Dict[str, str] = {}
+JOB_STATUS_TTL_SECONDS = 24 * 3600
+
+
+def set_processing_status(short_name: str, status: str):
+    shared_store.set("job_status", short_name, status, ttl=JOB_STATUS_TTL_SECONDS)
+
+# Per-session chat history, keyed by the conversation ID stored in the session cookie.
+conversation_store = ConversationStore()
 
 load_dotenv(find_dotenv())
 
@@ -72,15 +103,100 @@ if not ABSOLUTE_FRONTEND_PATH.exists():
 USERS_DATA_FOLDER.mkdir(exist_ok=True)
 USERS_CHROMA_DB_PATH.mkdir(exist_ok=True)
 
+# How often the background reaper sweeps the shared user store.
+USER_DATA_REAP_INTERVAL = int(os.getenv("USER_DATA_REAP_INTERVAL", "600"))
+
+
+async def _reap_user_storage_periodically():
+    """Background loop: expire idle user collections and enforce quotas.
+    Every worker runs this loop; a lease in the shared store lets only one
+    of them sweep per interval."""
+    while True:
+        await asyncio.sleep(USER_DATA_REAP_INTERVAL)
+        if await asyncio.to_thread(shared_store.acquire_lease, "user_storage_reaper", USER_DATA_REAP_INTERVAL * 0.9):
+            await asyncio.to_thread(reap_user_storage, str(USERS_CHROMA_DB_PATH))
+            await asyncio.to_thread(shared_store.purge_expired)
+
+
+# Each worker's metric export, keyed by pid and start time so a restarted
+# worker never overwrites its predecessor's counters. Exports are kept after
+# a worker exits (counters must not go backwards) and cleared when a new
+# server run starts.
+METRICS_PUBLISH_INTERVAL = int(os.getenv("METRICS_PUBLISH_INTERVAL", "5"))
+# Set by gunicorn.conf.py so all workers of one master share it; a plain
+# uvicorn process is a run of its own.
+SERVER_RUN_ID = os.getenv("SERVER_RUN_ID") or f"{os.getpid()}:{time.time():.0f}"
+_metrics_key = None
+
+
+def _start_metrics_run():
+    """Drop metric exports left by a previous server run. Runs in every
+    worker's lifespan; only the first worker of a run sees a different
+    run id, so the exports of its siblings are never cleared."""
+    seen = {}
+
+    def claim(current):
+        seen["previous"] = current
+        return SERVER_RUN_ID
+
+    shared_store.update("metrics_run", "current", claim)
+    if seen["previous"] != SERVER_RUN_ID:
+        shared_store.clear("metrics")
+
+
+def _publish_metrics():
+    global _metrics_key
+    if _metrics_key is None or not _metrics_key.startswith(f"{os.getpid()}:"):
+        _metrics_key = f"{os.getpid()}:{time.time():.0f}"
+    shared_store.set("metrics", _metrics_key, export_metrics())
+
+
+async def _publish_metrics_periodically():
+    """Background loop: export this worker's metrics for /metrics in other workers."""
+    while True:
+        await asyncio.sleep(METRICS_PUBLISH_INTERVAL)
+        try:
+            await asyncio.to_thread(_publish_metrics)
+        except sqlite3.Error as e:
+            print(f"[METRICS] Publish failed: {e}")
+
+
+# Warm-up progress, reported by /readyz.
+warmup_state = {"stage": "pending", "error": None}
 
-# App startup hook — loads LLM + embedding models and ingests static
-# JSON data into ChromaDB before the server starts accepting requests.
+
+async def _warm_up_in_background():
+    """Load models, ingest data.json and run a dummy embedding pass off the
+    event loop, so pages and /healthz are served while retrieval warms up."""
+    warmup_state["stage"] = "warming_up"
+    try:
+        await asyncio.to_thread(warm_up)
+        warmup_state["stage"] = "ready"
+    except asyncio.CancelledError:
+        raise
+    except BaseException as e:   # load_models() calls exit() on fatal errors
+        warmup_state["stage"] = "failed"
+        warmup_state["error"] = repr(e)
+        print(f"[WARM-UP FAILED] {e!r}")
+
+
+# App startup hook — starts model loading + JSON ingestion as background
+# warm-up; the server accepts requests immediately and /readyz reports
+# when retrieval is actually ready.
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("Application startup...")
-    load_models()
-    check_and_ingest_json()
+    await asyncio.to_thread(_start_metrics_run)
+    warmer = asyncio.create_task(_warm_up_in_background())
+    reaper = asyncio.create_task(_reap_user_storage_periodically())
+    heartbeat = asyncio.create_task(admission.heartbeat())
+    metrics_publisher = asyncio.create_task(_publish_metrics_periodically())
     yield
+    warmer.cancel()
+    reaper.cancel()
+    heartbeat.cancel()
+    metrics_publisher.cancel()
+    speech_engine.shutdown()
     print("Application shutdown...")
 
 
@@ -95,7 +211,23 @@ app.add_middleware(
     max_age=86400,  # 24 hours — prevents mid-conversation expiry
 )
 
+# Unversioned /static stays mounted for files referenced from JS (e.g. the
+# audio worklet); HTML pages link to the fingerprinted /assets/ URLs instead.
 app.mount("/static", StaticFiles(directory=ABSOLUTE_FRONTEND_PATH), name="static")
+static_assets = StaticAssets(ABSOLUTE_FRONTEND_PATH)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """Shed requests get 429 with a Retry-After estimate from the class's queue."""
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(exc.retry_after)},
+        content={
+            "detail": f"Server is busy, please try again in {exc.retry_after} seconds.",
+            "retry_after": exc.retry_after,
+        },
+    )
 
 oauth = OAuth()
 oauth.register(
@@ -107,14 +239,31 @@ oauth.register(
 )
 
 
+# Largest question list accepted by /chat/batch.
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+
+
 # Pydantic model for the /chat POST body:
-# user message, optional uploaded-doc collection name, and recent chat history.
+# user message, optional uploaded-doc name(s), and optional chat history.
+# collection_name selects one uploaded document; collection_names lets one
+# chat search several of the user's documents at once. History is kept
+# server-side; the client's copy is only used to seed an empty conversation
+# (e.g. after a server restart).
 class ChatRequest(BaseModel):
     message: str
     collection_name: str | None = None
+    collection_names: list[str] = []
     history: list[dict] = []
 
 
+# Pydantic model for the /chat/batch POST body: many standalone questions,
+# optionally searched against the same uploaded document(s) as /chat.
+class BatchChatRequest(BaseModel):
+    questions: list[str]
+    collection_name: str | None = None
+    collection_names: list[str] = []
+
+
 def sanitize_name(name: str) -> str:
     """Clean a filename for use as a ChromaDB collection name.
     Strips special chars, ensures minimum 3 chars, caps at 63."""
@@ -125,37 +274,38 @@ def sanitize_name(name: str) -> str:
     return name[:63]
 
 
-def get_unique_collection_name(user_id: str, short_name: str) -> str:
-    """Build a per-user collection name like u_{userId}_{docName} (max 63 chars)
-    to isolate each user's uploaded documents in ChromaDB."""
-    safe_uid = re.sub(r'[^a-zA-Z0-9]', '', user_id)
-    return f"u_{safe_uid}_{short_name}"[:63]
+# Pipeline subprocesses run at a lower CPU priority so chat keeps its cores.
+# They are started through nice(1): preexec_fn is not safe in a threaded server.
+PIPELINE_NICE = int(os.getenv("PIPELINE_NICE", "10"))
+PIPELINE_PREFIX = ["nice", "-n", str(PIPELINE_NICE)] if PIPELINE_NICE and shutil.which("nice") else []
 
 
-def run_processing_pipeline(pdf_path: Path, unique_collection_name: str, short_name: str):
+def run_processing_pipeline(pdf_path: Path, user_collection_name: str, short_name: str):
     """Background task that runs the 3-stage PDF pipeline:
     Base.py (extract PDF → markdown + images)
     → Image-Testo.py (caption images via vision model)
-    → Emmbed.py (chunk, embed, store in ChromaDB).
+    → Emmbed.py (chunk, embed, store in the document's own collection).
     Cleans up temp files on completion regardless of success/failure."""
-    global processing_status
     try:
-        processing_status[short_name] = "processing"
+        set_processing_status(short_name, "processing")
         output_dir = pdf_path.parent
         base_md_file = output_dir / f"{output_dir.name}.md"
         described_md_file = output_dir / f"{output_dir.name}_with_descriptions.md"
         python_executable = sys.executable
 
-        print(f"\n--- [PIPELINE START] Collection: {unique_collection_name} ---")
-        subprocess.run([python_executable, "Base.py", str(pdf_path), str(output_dir)], check=True, capture_output=True, text=True)
-        subprocess.run([python_executable, "Image-Testo.py", str(base_md_file), str(output_dir), str(described_md_file)], check=True, capture_output=True, text=True)
-        subprocess.run([python_executable, "Emmbed.py", str(described_md_file), unique_collection_name, str(USERS_CHROMA_DB_PATH)], check=True, capture_output=True, text=True)
+        print(f"\n--- [PIPELINE START] Collection: {user_collection_name}, doc: {short_name} ---")
+        with span("extract", metric=PIPELINE_STAGE_SECONDS):
+            subprocess.run([*PIPELINE_PREFIX, python_executable, "Base.py", str(pdf_path), str(output_dir)], check=True, capture_output=True, text=True)
+        with span("caption", metric=PIPELINE_STAGE_SECONDS):
+            subprocess.run([*PIPELINE_PREFIX, python_executable, "Image-Testo.py", str(base_md_file), str(output_dir), str(described_md_file)], check=True, capture_output=True, text=True)
+        with span("embed", metric=PIPELINE_STAGE_SECONDS):
+            subprocess.run([*PIPELINE_PREFIX, python_executable, "Emmbed.py", str(described_md_file), user_collection_name, str(USERS_CHROMA_DB_PATH), short_name], check=True, capture_output=True, text=True)
 
         print(f"--- [PIPELINE SUCCESS] ---")
-        processing_status[short_name] = "completed"
+        set_processing_status(short_name, "completed")
     except Exception as e:
         print(f"[PIPELINE FAILED] {e}")
-        processing_status[short_name] = "failed"
+        set_processing_status(short_name, "failed")
     finally:
         if output_dir.exists():
             try:
@@ -164,29 +314,21 @@ def run_processing_pipeline(pdf_path: Path, unique_collection_name: str, short_n
                 print(f"Error cleanup: {e}")
 
 
-def transcribe_and_translate_audio(audio_content: bytes) -> dict:
-    """Convert uploaded audio bytes to WAV, run Google Speech Recognition,
-    and return the English transcript. Falls back to an error message on failure."""
-    r = sr.Recognizer()
-    try:
-        audio_segment = AudioSegment.from_file(io.BytesIO(audio_content))
-        wav_buffer = io.BytesIO()
-        audio_segment.export(wav_buffer, format="wav", parameters=["-ac", "1", "-ar", "22050"])
-        wav_buffer.seek(0)
-        with sr.AudioFile(wav_buffer) as source:
-            audio = r.record(source)
-        return {"text_english": r.recognize_google(audio, language="en-US")}
-    except Exception:
-        return {"text_english": "Could not understand audio."}
+async def run_admitted_pipeline(pdf_path: Path, user_collection_name: str, short_name: str, ticket: str):
+    """Background task: wait for the reserved upload slot, then run the pipeline in a thread."""
+    async with admission.admit("upload", ticket):
+        await asyncio.to_thread(run_processing_pipeline, pdf_path, user_collection_name, short_name)
 
 
 async def _delete_user_data_and_clear_session(request: Request):
-    """Full cleanup on explicit logout: wipes ChromaDB collections + session."""
+    """Full cleanup on explicit logout: wipes the user's ChromaDB collection + session."""
     user = request.session.get('user')
     if user and user.get('sub') != 'guest':
         user_id = user.get('sub')
         print(f"--- [FULL CLEANUP] Deleting data for user: {user_id} ---")
         delete_user_collections(str(USERS_CHROMA_DB_PATH), user_id)
+    if request.session.get('conversation_id'):
+        conversation_store.delete(request.session['conversation_id'])
     request.session.clear()
 
 
@@ -234,7 +376,8 @@ async def end_session(request: Request):
     """
     Called by the tab-close beacon (beforeunload).
     Only clears the session cookie — does NOT delete ChromaDB data,
-    because beforeunload also fires on page refresh.
+    because beforeunload also fires on page refresh. Abandoned data is
+    expired by the background reaper after USER_DATA_TTL_SECONDS.
     """
     await _clear_session_only(request)
     return JSONResponse(content={"message": "Session cleared"})
@@ -260,8 +403,7 @@ async def serve_login_page(request: Request):
     """Serve index.html (login page). Redirects to /chat if already logged in."""
     if request.session.get('user'):
         return RedirectResponse(url='/chat')
-    path = ABSOLUTE_FRONTEND_PATH / "index.html"
-    return HTMLResponse(content=path.read_text(encoding='utf-8'))
+    return static_assets.page(request, "index.html")
 
 
 @app.get("/upload", response_class=HTMLResponse)
@@ -272,8 +414,7 @@ async def serve_upload_page(request: Request):
         return RedirectResponse(url='/')
     if user.get('sub') == 'guest':
         return RedirectResponse(url='/chat')
-    path = ABSOLUTE_FRONTEND_PATH / "upload.html"
-    return HTMLResponse(content=path.read_text(encoding='utf-8'))
+    return static_assets.page(request, "upload.html")
 
 
 @app.get("/chat", response_class=HTMLResponse)
@@ -281,8 +422,13 @@ async def serve_chat_page(request: Request):
     """Serve chat.html. Redirects to login if no active session."""
     if not request.session.get('user'):
         return RedirectResponse(url='/')
-    path = ABSOLUTE_FRONTEND_PATH / "chat.html"
-    return HTMLResponse(content=path.read_text(encoding='utf-8'))
+    return static_assets.page(request, "chat.html")
+
+
+@app.get("/assets/{asset_path:path}")
+async def serve_asset(request: Request, asset_path: str):
+    """Serve a fingerprinted CSS/JS/image file (gzip/brotli negotiated, cached immutably)."""
+    return static_assets.asset(request, asset_path)
 
 
 # ──────────────────────────────────────────────
@@ -292,7 +438,7 @@ async def serve_chat_page(request: Request):
 @app.get("/status/{collection_name}")
 async def get_processing_status(collection_name: str):
     """Return current PDF processing status for polling from the upload page."""
-    return {"status": processing_status.get(collection_name, "unknown")}
+    return {"status": shared_store.get("job_status", collection_name, "unknown")}
 
 
 @app.post("/upload-pdf/")
@@ -314,6 +460,8 @@ async def upload_pdf(
     file.file.seek(0)
     if file_size > 1 * 1024 * 1024:
         raise HTTPException(status_code=400, detail="File size exceeds 1MB limit.")
+    # Shed before reading the file if the upload queue (shared by all workers) is full.
+    ticket = await admission.reserve("upload")
 
     try:
         if not file.filename.lower().endswith(".pdf"):
@@ -329,12 +477,19 @@ async def upload_pdf(
             while content := await file.read(1024 * 1024):
                 buffer.write(content)
 
-        unique_col_name = get_unique_collection_name(user_id, safe_filename)
-        background_tasks.add_task(run_processing_pipeline, file_path, unique_col_name, safe_filename)
+        doc_col_name = document_collection_name(get_user_collection_name(user_id), safe_filename)
+        set_processing_status(safe_filename, "queued")
+        background_tasks.add_task(run_admitted_pipeline, file_path, doc_col_name, safe_filename, ticket)
+        ticket = None                # Now owned by the pipeline task
 
         return {"filename": file.filename, "message": "Processing...", "collection_name": safe_filename}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
+    finally:
+        if ticket:
+            await admission.cancel("upload", ticket)
 
 
 # ──────────────────────────────────────────────
@@ -343,62 +498,268 @@ async def upload_pdf(
 
 @app.post("/transcribe-audio/")
 async def transcribe_audio(audio_file: UploadFile = File(...)):
-    """Accept an audio file upload and return the transcribed English text."""
-    content = await audio_file.read()
-    return transcribe_and_translate_audio(content)
+    """Accept an audio file upload and return the transcribed English text.
+    Transcription runs in speech_engine's worker pool, off the event loop."""
+    async with admission.admit("transcribe"):
+        content = await audio_file.read()
+        return await speech_engine.transcribe(content)
+
+
+@app.websocket("/ws/transcribe")
+async def transcribe_stream(websocket: WebSocket):
+    """Incremental transcription. The client streams raw 16 kHz mono 16-bit PCM
+    as binary frames and sends {"type": "stop"} when recording ends. The server
+    replies with {"type": "partial"|"final", "text": ...} messages as utterances
+    are decoded ({"type": "error", "text": ...} if one was dropped because the
+    speech service stayed busy), then {"type": "done"}. Silence is dropped by
+    VAD and only the current utterance is buffered — no complete file is ever
+    assembled."""
+    if not websocket.session.get('user'):
+        await websocket.close(code=1008)
+        return
+    # A streaming session holds one transcribe slot for its whole duration.
+    # Accept first: a close before the handshake reaches the browser as 1006,
+    # not as the 1013 the frontend shows a busy message for.
+    await websocket.accept()
+    try:
+        await admission.acquire("transcribe")
+    except Overloaded:
+        await websocket.close(code=1013)     # Try again later
+        return
+    try:
+        await _transcribe_session(websocket)
+    finally:
+        admission.release("transcribe")
+
+
+async def _transcribe_session(websocket: WebSocket):
+    """Receive PCM frames and send partial/final transcripts until stop or disconnect."""
+    segmenter = speech_engine.VadSegmenter()
+    partial_task = None
+
+    async def send_partial(pcm: bytes):
+        text = await speech_engine.transcribe_utterance(pcm)
+        if text:
+            await websocket.send_json({"type": "partial", "text": text})
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            stopping = False
+            if message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except json.JSONDecodeError:
+                    continue             # Ignore malformed control frames
+                stopping = isinstance(control, dict) and control.get("type") == "stop"
+            events = segmenter.flush() if stopping else segmenter.push(message.get("bytes") or b"")
+
+            for kind, pcm in events:
+                if kind == "partial":
+                    # Skip a partial while the previous one is still decoding.
+                    if partial_task is None or partial_task.done():
+                        partial_task = asyncio.create_task(send_partial(pcm))
+                    continue
+                if partial_task and not partial_task.done():
+                    partial_task.cancel()
+                text = await speech_engine.transcribe_utterance(pcm, wait=speech_engine.STT_FINAL_MAX_WAIT)
+                if text is None:
+                    # Tell the user this utterance was dropped instead of sending an empty final.
+                    await websocket.send_json({"type": "error", "text": speech_engine.BUSY_TEXT})
+                else:
+                    await websocket.send_json({"type": "final", "text": text})
+
+            if stopping:
+                await websocket.send_json({"type": "done"})
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if partial_task and not partial_task.done():
+            partial_task.cancel()
+    try:
+        await websocket.close()
+    except RuntimeError:
+        pass  # Already closed by the client
 
 
 # ──────────────────────────────────────────────
 # ROUTES — Chat
 # ──────────────────────────────────────────────
 
+def _document_selection(user: dict, collection_name: str | None, collection_names: list[str]):
+    """(user collection prefix, doc_ids) for the uploaded document(s) a request
+    asks to search; (None, []) for guests or when no document is selected."""
+    if user.get('sub') == 'guest':
+        return None, []
+    requested = ([collection_name] if collection_name else []) + collection_names
+    doc_ids = list(dict.fromkeys(sanitize_name(name) for name in requested))
+    if not doc_ids:
+        return None, []
+    return get_user_collection_name(user.get('sub')), doc_ids
+
+
+def _summarize_conversation(conversation_id: str):
+    """Background task: fold turns that left the history window into the summary."""
+    summary, turns = conversation_store.take_overflow(conversation_id)
+    if not turns:
+        return
+    try:
+        with span("summarize"):
+            summary = summarize_turns(summary, turns)
+    except Exception as e:
+        print(f"Summarization Error: {e}")
+        summary = None
+    conversation_store.fold(conversation_id, summary, len(turns))
+
+
 @app.post("/chat")
-async def handle_chat_message(request: Request, chat_req: ChatRequest):
-    """Main chat endpoint. Builds LangChain message history, intercepts
-    META questions (about the conversation) and department count/list queries,
-    and falls back to the full RAG chain for everything else."""
+async def handle_chat_message(request: Request, chat_req: ChatRequest, background_tasks: BackgroundTasks):
+    """Main chat endpoint. Looks up the session's server-side conversation,
+    intercepts META questions (about the conversation) and department
+    count/list queries, and falls back to the full RAG chain for everything
+    else. Each answered turn is stored; older turns are summarized in the background."""
+    user = request.session.get('user')
+    if not user:
+        return JSONResponse(
+            status_code=401,
+            content={"answer": "Session expired. Please log in again.", "session_expired": True}
+        )
+
+    if not is_retrieval_ready():
+        return {"answer": "System initializing, please try again in a moment."}
+
+    conversation_id = request.session.get('conversation_id')
+    if not conversation_id:
+        conversation_id = request.session['conversation_id'] = uuid.uuid4().hex
+    conversation = conversation_store.get(conversation_id)
+    if conversation.is_empty() and chat_req.history:
+        conversation = conversation_store.seed(conversation_id, chat_req.history)
+    # Runs after the response is sent, once this turn has been stored.
+    background_tasks.add_task(_summarize_conversation, conversation_id)
+
+    # Per-request trace: stage spans + token counts, labelled by the route taken.
+    with trace_request("chat") as trace:
+        # --- META-QUESTION INTERCEPTION ---
+        if META_QUESTION_PATTERNS.search(chat_req.message):
+            trace["route"] = "meta"
+            # An LLM call like the RAG path: same chat budget, off the event loop.
+            try:
+                async with admission.admit("chat"):
+                    answer = await asyncio.to_thread(answer_from_history_only, chat_req.message, conversation)
+            except Overloaded:
+                trace["route"] = "shed"
+                raise
+            conversation_store.add_turn(conversation_id, chat_req.message, answer)
+            return {"answer": answer}
+
+        # --- DEPARTMENT COUNT/LIST INTERCEPTION ---
+        # "How many professors in CSE?" hits data.json directly — the vector
+        # retriever's k limit would otherwise give a wildly wrong count.
+        dept_answer = answer_department_query(chat_req.message)
+        if dept_answer is not None:
+            trace["route"] = "department"
+            conversation_store.add_turn(conversation_id, chat_req.message, dept_answer)
+            return {"answer": dept_answer}
+
+        target_collection, doc_ids = _document_selection(user, chat_req.collection_name, chat_req.collection_names)
+
+        try:
+            rag_chain = get_rag_chain_for_collection(str(USERS_CHROMA_DB_PATH), target_collection, doc_ids)
+            if rag_chain is None:
+                trace["route"] = "unavailable"
+                return {"answer": "System initializing, please try again in a moment."}
+
+            chat_history = build_chat_history(conversation)
+            # Admitted against the chat budget; the blocking chain runs in a
+            # thread so queued requests and other routes keep being served.
+            async with admission.admit("chat"):
+                result = await asyncio.to_thread(
+                    rag_chain.invoke, {"input": chat_req.message, "chat_history": chat_history}
+                )
+            trace["route"] = "rag"
+            conversation_store.add_turn(conversation_id, chat_req.message, result["answer"])
+            return {"answer": result["answer"]}
+        except Overloaded:
+            trace["route"] = "shed"
+            raise
+        except Exception as e:
+            print(f"Chat Error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/chat/batch")
+async def handle_batch_chat(request: Request, batch_req: BatchChatRequest):
+    """Answer a list of standalone questions, streaming one JSON line per
+    question as it completes (see batch_qa.py). Lines carry the question's index."""
     user = request.session.get('user')
     if not user:
         return JSONResponse(
             status_code=401,
             content={"answer": "Session expired. Please log in again.", "session_expired": True}
         )
+    if not is_retrieval_ready():
+        raise HTTPException(status_code=503, detail="System initializing, please try again in a moment.")
+    if not batch_req.questions or len(batch_req.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {BATCH_MAX_QUESTIONS} questions.")
 
-    # --- Build chat history objects ---
-    chat_history = []
-    for msg in chat_req.history:
-        if msg['role'] == 'user':
-            chat_history.append(HumanMessage(content=msg['content']))
-        elif msg['role'] == 'assistant':
-            chat_history.append(AIMessage(content=msg['content']))
-
-    # --- META-QUESTION INTERCEPTION ---
-    if META_QUESTION_PATTERNS.search(chat_req.message):
-        answer = answer_from_history_only(chat_req.message, chat_history)
-        return {"answer": answer}
-
-    # --- DEPARTMENT COUNT/LIST INTERCEPTION ---
-    # "How many professors in CSE?" hits data.json directly — the vector
-    # retriever's k limit would otherwise give a wildly wrong count.
-    dept_answer = answer_department_query(chat_req.message)
-    if dept_answer is not None:
-        return {"answer": dept_answer}
-
-    user_id = user.get('sub')
-    target_collection = None
-    if user_id != 'guest' and chat_req.collection_name:
-        target_collection = get_unique_collection_name(user_id, chat_req.collection_name)
+    target_collection, doc_ids = _document_selection(user, batch_req.collection_name, batch_req.collection_names)
 
-    try:
-        rag_chain = get_rag_chain_for_collection(str(USERS_CHROMA_DB_PATH), target_collection)
-        if rag_chain is None:
-            return {"answer": "System initializing, please try again in a moment."}
+    # Batches are the lowest admission class: they wait (or get 429) before
+    # streaming starts and hold their slot until the last line is sent.
+    slot = AsyncExitStack()
+    await slot.enter_async_context(admission.admit("batch"))
+    results = answer_batch(batch_req.questions, str(USERS_CHROMA_DB_PATH), target_collection, doc_ids)
 
-        result = rag_chain.invoke({"input": chat_req.message, "chat_history": chat_history})
-        return {"answer": result["answer"]}
-    except Exception as e:
-        print(f"Chat Error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    async def lines():
+        try:
+            # Each step runs in a worker thread, so the blocking
+            # embedding/LLM work never stalls the event loop.
+            while (result := await asyncio.to_thread(next, results, None)) is not None:
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        finally:
+            await slot.aclose()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", background=BackgroundTask(slot.aclose))
+
+
+# ──────────────────────────────────────────────
+# ROUTES — Observability
+# ──────────────────────────────────────────────
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness probe: 200 only once models are loaded, data.json is ingested
+    and a warm-up query has run; 503 while warming up or if warm-up failed."""
+    if is_retrieval_ready():
+        return {"ready": True, "stage": warmup_state["stage"]}
+    return JSONResponse(status_code=503, content={"ready": False, **warmup_state})
+
+
+@app.get("/queue-status")
+async def queue_status():
+    """Per-class in-flight/queued counts and the wait a new request can expect,
+    so the frontend can show an estimate (see admission.py)."""
+    return await admission.snapshot()
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus-style metrics: stage/pipeline latency histograms, request and token counters,
+    summed over all server workers."""
+    def collect():
+        _publish_metrics()
+        return list(shared_store.items("metrics").values())
+
+    return PlainTextResponse(render_metrics(await asyncio.to_thread(collect)), media_type="text/plain; version=0.0.4")
 
 
 # ──────────────────────────────────────────────
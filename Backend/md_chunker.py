@@ -0,0 +1,175 @@
+"""
+md_chunker.py — Markdown-aware, token-sized chunker used by Emmbed.py.
+
+Splits Marker's markdown on heading boundaries, keeps tables and code blocks
+intact where they fit, and packs blocks of the same section into chunks of at
+most `max_tokens` tokens as counted by the embedding model's tokenizer. Every
+chunk carries its section path ("Heading > Subheading") and the page it starts
+on, taken from Marker's pagination separators / page span anchors.
+
+Pure Python — no unstructured/LangChain imports — so Stage 3 starts quickly.
+"""
+
+import re                        # Line classification (headings, tables, fences, page markers)
+
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+# Marker's paginate_output separator: "{3}------------------------------------------------"
+PAGE_SEPARATOR_PATTERN = re.compile(r'^\{(\d+)\}-{3,}\s*$')
+# Marker's page anchors: <span id="page-3-0"></span>
+PAGE_SPAN_PATTERN = re.compile(r'<span id="page-(\d+)-\d+"></span>')
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+SECTION_SEPARATOR = " > "
+
+
+def _blocks(markdown: str):
+    """Yield (kind, text, section_path, page) blocks in document order.
+    kind is "heading", "table", "code" or "text"; page is 1-based or None."""
+    headings = []                # Stack of (level, title)
+    page = None
+    lines = markdown.splitlines()
+    i = 0
+
+    def section():
+        return SECTION_SEPARATOR.join(title for _, title in headings)
+
+    while i < len(lines):
+        line = lines[i]
+
+        sep = PAGE_SEPARATOR_PATTERN.match(line.strip())
+        if sep:
+            page = int(sep.group(1)) + 1
+            i += 1
+            continue
+
+        span = PAGE_SPAN_PATTERN.search(line)
+        if span:
+            page = int(span.group(1)) + 1
+            line = PAGE_SPAN_PATTERN.sub('', line)
+
+        if not line.strip():
+            i += 1
+            continue
+
+        heading = HEADING_PATTERN.match(line.strip())
+        if heading:
+            level, title = len(heading.group(1)), heading.group(2).strip()
+            while headings and headings[-1][0] >= level:
+                headings.pop()
+            if title:
+                headings.append((level, title))
+            yield "heading", title, section(), page
+            i += 1
+            continue
+
+        if line.lstrip().startswith("```"):
+            block = [line]
+            i += 1
+            while i < len(lines):
+                block.append(lines[i])
+                i += 1
+                if block[-1].lstrip().startswith("```"):
+                    break
+            yield "code", "\n".join(block), section(), page
+            continue
+
+        if line.lstrip().startswith("|"):
+            block = []
+            while i < len(lines) and lines[i].lstrip().startswith("|"):
+                block.append(PAGE_SPAN_PATTERN.sub('', lines[i]))
+                i += 1
+            yield "table", "\n".join(block), section(), page
+            continue
+
+        block = []
+        while i < len(lines):
+            current = PAGE_SPAN_PATTERN.sub('', lines[i])
+            stripped = current.strip()
+            if (not stripped or HEADING_PATTERN.match(stripped)
+                    or PAGE_SEPARATOR_PATTERN.match(stripped)
+                    or stripped.startswith("|") or stripped.startswith("```")):
+                break
+            block.append(current)
+            i += 1
+        yield "text", "\n".join(block), section(), page
+
+
+def _split_oversized(kind: str, text: str, budget: int, count_tokens) -> list[str]:
+    """Split a single block that does not fit into `budget` tokens.
+    Tables are split by rows (repeating the header), text by sentences,
+    and anything still too large by words."""
+    if kind == "table":
+        rows = text.split("\n")
+        header = rows[:2] if len(rows) > 2 and set(rows[1].replace("|", "").strip()) <= set("-: ") else rows[:1]
+        units, joiner, prefix = rows[len(header):], "\n", "\n".join(header) + "\n"
+    elif kind == "text":
+        units, joiner, prefix = SENTENCE_PATTERN.split(text), " ", ""
+    else:
+        units, joiner, prefix = text.split("\n"), "\n", ""
+
+    pieces, current = [], []
+    for unit in units:
+        candidate = joiner.join(current + [unit])
+        if current and count_tokens(prefix + candidate) > budget:
+            pieces.append(prefix + joiner.join(current))
+            current = []
+        if count_tokens(prefix + unit) > budget:
+            words, part = unit.split(), []
+            for word in words:
+                if part and count_tokens(prefix + " ".join(part + [word])) > budget:
+                    pieces.append(prefix + " ".join(part))
+                    part = []
+                part.append(word)
+            current = [" ".join(part)] if part else []
+            continue
+        current.append(unit)
+    if current:
+        pieces.append(prefix + joiner.join(current))
+    return pieces
+
+
+def chunk_markdown(markdown: str, count_tokens, max_tokens: int = 448) -> list[tuple[str, dict]]:
+    """Chunk markdown into (text, metadata) pairs of at most max_tokens tokens.
+
+    Chunks never span two sections. Each chunk's text is prefixed with its
+    section path so the embedding sees the heading context, and its metadata
+    holds "section", "page" (when known) and "chunk_index"."""
+    chunks = []
+    current, current_tokens, current_section, current_page = [], 0, None, None
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            body = "\n\n".join(current)
+            text = f"{current_section}\n\n{body}" if current_section else body
+            metadata = {"section": current_section or "", "chunk_index": len(chunks)}
+            if current_page is not None:
+                metadata["page"] = current_page
+            chunks.append((text, metadata))
+        current, current_tokens = [], 0
+
+    for kind, text, section, page in _blocks(markdown):
+        if kind == "heading" or section != current_section:
+            flush()
+            current_section, current_page = section, page
+            if kind == "heading":
+                continue
+
+        header_tokens = count_tokens(current_section) + 2 if current_section else 0
+        budget = max(max_tokens - header_tokens, 32)
+
+        tokens = count_tokens(text)
+        if tokens <= budget:
+            pieces = [(text, tokens)]
+        else:
+            pieces = [(p, count_tokens(p)) for p in _split_oversized(kind, text, budget, count_tokens)]
+        for piece, piece_tokens in pieces:
+            if current and current_tokens + piece_tokens + 1 > budget:
+                flush()
+            if not current:
+                current_page = page if page is not None else current_page
+            current.append(piece)
+            current_tokens += piece_tokens + (1 if len(current) > 1 else 0)
+
+    flush()
+    return chunks
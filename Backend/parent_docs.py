@@ -0,0 +1,188 @@
+"""
+parent_docs.py — Parent-document retrieval for the static data.json collection.
+
+Long publications/books records and some profile summaries run far past the
+embedding model's 512-token window, so a whole-record vector never represents
+their tail. Records are therefore split into small child chunks for embedding:
+
+    Child    At most CHILD_MAX_TOKENS tokens, prefixed with the record's first
+             line ("Books/Book Chapters by <name>:") so every child names its
+             professor. Metadata keeps the record's source/type/name and adds
+             parent_id (the record) and profile_id (the professor, whose
+             profile_summary record is looked up through it).
+    Parent   The original data.json record, kept in memory and returned to the
+             LLM in place of the children that matched it.
+
+expand_to_parents() maps ranked children to deduplicated parents under a
+PARENT_CONTEXT_MAX_CHARS budget. A parent longer than PARENT_MAX_CHARS is
+represented by its matched children only, so one 50k-character publication list
+cannot crowd out the rest of the context. Spare slots go to the profile_summary
+of professors whose publications/books matched.
+
+Bump INGEST_VERSION whenever the child layout changes; check_and_ingest_json()
+re-ingests collections stamped with a different version.
+"""
+
+import os                        # os.getenv() for size limits
+import hashlib                   # Stable parent ids from record content
+
+from Backend.md_chunker import chunk_markdown  # Sentence-boundary splitting of oversized lines
+
+INGEST_VERSION = "parent-child-1"
+INGEST_VERSION_KEY = "ingest_version"
+PARENT_COUNT_KEY = "parent_count"
+
+CHILD_MAX_TOKENS = int(os.getenv("CHILD_MAX_TOKENS", "256"))
+# Children fetched per returned parent: several children of one record often rank together.
+PARENT_FANOUT = int(os.getenv("PARENT_FANOUT", "3"))
+PARENT_MAX_CHARS = int(os.getenv("PARENT_MAX_CHARS", "4000"))
+PARENT_CONTEXT_MAX_CHARS = int(os.getenv("PARENT_CONTEXT_MAX_CHARS", "12000"))
+
+PARENT_ID_KEY = "parent_id"
+PROFILE_ID_KEY = "profile_id"
+CHILD_INDEX_KEY = "child_index"
+PROFILE_TYPE = "profile_summary"
+HEADER_MAX_CHARS = 200
+
+
+def parent_id(item: dict) -> str:
+    """Stable id of a data.json record (same record → same id across restarts)."""
+    meta = item.get("metadata", {})
+    key = "\x1f".join([meta.get("source", ""), meta.get("type", ""), item["page_content"]])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def profile_id(item: dict) -> str:
+    """Id shared by all records of one professor."""
+    return f"{item.get('branch', '')}:{item.get('metadata', {}).get('name', '')}"
+
+
+def load_parents(data: list[dict]) -> tuple[dict, dict]:
+    """Index data.json records. Returns ({parent_id: item}, {profile_id: profile_summary parent_id})."""
+    parents, profiles = {}, {}
+    for item in data:
+        if "page_content" not in item:
+            continue
+        pid = parent_id(item)
+        parents[pid] = item
+        if item.get("metadata", {}).get("type") == PROFILE_TYPE:
+            profiles.setdefault(profile_id(item), pid)
+    return parents, profiles
+
+
+def _header(text: str) -> str:
+    first_line = text.strip().split("\n", 1)[0]
+    return first_line[:HEADER_MAX_CHARS]
+
+
+def _pack_lines(text: str, count_tokens, budget: int) -> list[str]:
+    """Greedily pack whole lines (one publication per line in data.json) into
+    pieces of at most budget tokens; a single oversized line is split on
+    sentence boundaries by the markdown chunker."""
+    pieces, current, current_tokens = [], [], 0
+    for line in text.split("\n"):
+        tokens = count_tokens(line)
+        if current and current_tokens + tokens + 1 > budget:
+            pieces.append("\n".join(current))
+            current, current_tokens = [], 0
+        if tokens > budget:
+            pieces += [p for p, _ in chunk_markdown(line, count_tokens, max_tokens=budget)]
+            continue
+        current.append(line)
+        current_tokens += tokens + 1
+    if current:
+        pieces.append("\n".join(current))
+    return [piece for piece in pieces if piece.strip()]
+
+
+def split_records(data: list[dict], count_tokens, max_tokens: int = CHILD_MAX_TOKENS) -> list[tuple[str, dict]]:
+    """Split every record into (child text, child metadata) pairs."""
+    children = []
+    for item in data:
+        if "page_content" not in item:
+            continue
+        text = item["page_content"]
+        base = {
+            **item.get("metadata", {}),
+            PARENT_ID_KEY: parent_id(item),
+            PROFILE_ID_KEY: profile_id(item),
+        }
+        if count_tokens(text) <= max_tokens:
+            children.append((text, {**base, CHILD_INDEX_KEY: 0}))
+            continue
+
+        header = _header(text)
+        budget = max(max_tokens - count_tokens(header) - 1, 32)
+        body = text.strip()[len(header):].lstrip("\n") if text.strip().startswith(header) else text
+        for i, piece in enumerate(_pack_lines(body, count_tokens, budget)):
+            children.append((f"{header}\n{piece}", {**base, CHILD_INDEX_KEY: i}))
+    return children
+
+
+def expand_to_parents(children: list, parents: dict, profiles: dict, k: int,
+                      max_chars: int = PARENT_CONTEXT_MAX_CHARS) -> list:
+    """Map ranked (child Document, score) pairs to at most k (parent Document,
+    score) pairs, best first; a parent scores as its best-matching child.
+    Documents without a parent_id (e.g. a collection ingested before
+    parent-child chunking) are passed through unchanged."""
+    from langchain_core.documents import Document
+
+    matched = {}                 # parent_id -> matched child Documents, in rank order
+    scores = {}                  # parent_id -> best child score
+    order = []                   # parent ids / passthrough (Document, score) pairs, in rank order
+    for doc, score in children:
+        pid = doc.metadata.get(PARENT_ID_KEY)
+        if pid not in parents:
+            order.append((doc, score))
+        elif pid not in matched:
+            matched[pid], scores[pid] = [doc], score
+            order.append(pid)
+        else:
+            matched[pid].append(doc)
+
+    results, used, included = [], 0, set()
+
+    def add(doc, score) -> bool:
+        nonlocal used
+        if results and used + len(doc.page_content) > max_chars:
+            return False
+        results.append((doc, score))
+        used += len(doc.page_content)
+        return True
+
+    def parent_document(pid: str):
+        item = parents[pid]
+        return {**item.get("metadata", {}), PARENT_ID_KEY: pid, PROFILE_ID_KEY: profile_id(item)}
+
+    for entry in order:
+        if len(results) >= k:
+            break
+        if isinstance(entry, tuple):
+            add(*entry)
+            continue
+        item = parents[entry]
+        if len(item["page_content"]) <= PARENT_MAX_CHARS:
+            content = item["page_content"]
+        else:
+            # Matched children in document order, sharing one header line.
+            header = _header(item["page_content"])
+            pieces = sorted(matched[entry], key=lambda d: d.metadata.get(CHILD_INDEX_KEY, 0))
+            bodies = [d.page_content[len(header):].lstrip("\n") if d.page_content.startswith(header)
+                      else d.page_content for d in pieces]
+            content = header + "\n" + "\n...\n".join(bodies)
+        if add(Document(page_content=content, metadata=parent_document(entry)), scores[entry]):
+            included.add(entry)
+
+    # Spare slots: the profile summary of professors whose other records
+    # matched, scored as the record that linked to it.
+    for entry in order:
+        if len(results) >= k:
+            break
+        if isinstance(entry, tuple) or entry not in included:
+            continue
+        summary_id = profiles.get(profile_id(parents[entry]))
+        if summary_id and summary_id not in included and len(parents[summary_id]["page_content"]) <= PARENT_MAX_CHARS:
+            summary = Document(page_content=parents[summary_id]["page_content"], metadata=parent_document(summary_id))
+            if add(summary, scores[entry]):
+                included.add(summary_id)
+    return results
@@ -7,30 +7,48 @@ uploaded PDFs), smart query interception for META and department queries,
 and building the full history-aware RAG chain.
 """
 
-import torch                     # Check GPU availability via torch.cuda.is_available()
-import chromadb                  # ChromaDB vector database — PersistentClient for storing/querying embeddings
 import os                        # os.access() for path permissions, os.getenv() for env vars
 import json                      # Parse data.json (static professor profiles)
 import uuid                      # Generate unique IDs for ChromaDB document entries
 import re                        # Regex for META/department query patterns and user ID sanitization
+import time                      # Last-access timestamps for user-collection TTL expiry
+from contextlib import contextmanager  # _ingest_lock() context manager
 from pathlib import Path         # Object-oriented filesystem path construction
-from langchain_core.messages import HumanMessage, AIMessage  # Typed message objects for chat history handling
-from langchain_classic.chains import (
-    create_history_aware_retriever,   # Wraps a retriever to reformulate queries using chat history
-    create_retrieval_chain,           # Ties retriever + QA chain into a single end-to-end chain
-)
-from langchain_classic.chains.combine_documents import (
-    create_stuff_documents_chain,     # Feeds all retrieved docs into a single LLM prompt ("stuff" strategy)
-)
 from dotenv import load_dotenv   # Load .env file for OLLAMA_API_KEY
 
-from langchain_ollama.chat_models import ChatOllama       # Ollama-hosted LLM client (gpt-oss:120b)
-from langchain_huggingface import HuggingFaceEmbeddings    # HuggingFace sentence embeddings (BGE-large-en-v1.5)
-from langchain_chroma import Chroma                        # LangChain wrapper around ChromaDB for retriever creation
-from langchain_core.prompts import ChatPromptTemplate      # Build structured system/human prompt templates
-from langchain_core.runnables import RunnableLambda        # Wrap a plain Python function as a LangChain Runnable,
-                                                           # used to combine multiple retrievers into one callable
-                                                           # that the retrieval chain can invoke like any other step
+try:
+    import fcntl                 # Cross-process file lock so one worker ingests data.json
+except ImportError:              # Windows: the dev server is a single process, no lock needed
+    fcntl = None
+
+# Heavy dependencies (chromadb, LangChain, Ollama client, torch via the embedding
+# backend) are imported inside the functions that use them, so importing this
+# module is cheap and the server can start answering before warm-up finishes.
+from Backend.embedding_backend import (
+    get_embeddings,              # Build the configured embedding backend (sentence-transformers or ONNX int8)
+    collection_metadata,         # Metadata recording the embedding model on new collections
+    check_collection_model,      # Refuse to query a collection embedded with a different model
+    EmbeddingModelMismatch,
+    EMBEDDING_BACKEND,           # "sentence-transformers" | "onnx"
+)
+from Backend.embedding_service import EmbeddingService  # Micro-batches concurrent embed calls, queries first
+from Backend.telemetry import (
+    span,                        # Time a hot-path stage into rag_stage_duration_seconds + request trace
+    record_retrieval,            # Chosen depth + candidate scores per source (histogram + request trace)
+)
+from Backend.static_index import (
+    StaticVectorIndex,           # In-memory / mmap exact-search index over the static collection
+    STATIC_INDEX_MODE,           # "off" | "memory" | "mmap"
+)
+from Backend.parent_docs import (
+    load_parents,                # Index data.json records by parent_id / profile_id
+    split_records,               # Records → small child chunks linked to their parent
+    expand_to_parents,           # Ranked children → deduplicated parent records under a size cap
+    INGEST_VERSION,              # Bumped when the child layout changes; forces re-ingestion
+    INGEST_VERSION_KEY,
+    PARENT_COUNT_KEY,
+    PARENT_FANOUT,
+)
 
 load_dotenv()
 
@@ -53,17 +71,48 @@ JSON_DATA_PATH = BASE_DIR / "data.json"
 # vector search). Populated by check_and_ingest_json() at startup.
 _raw_json_data = []
 
-EMBEDDING_MODEL_NAME = "BAAI/bge-large-en-v1.5"
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# data.json records by parent_id, and each professor's profile_summary
+# parent_id by profile_id. The collection stores child chunks; retrieval
+# returns these parents (see parent_docs.py).
+_parent_records = {}
+_profile_parents = {}
+
+# Optional in-process copy of the static collection (see static_index.py).
+# Rebuilt from Chroma by refresh_static_index() after every ingestion check.
+_static_index = None
+STATIC_INDEX_CACHE_DIR = GLOBAL_DB_PATH / "static_index"
 
 OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY")
-OLLAMA_BASE_URL = "https://ollama.com"
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "https://ollama.com")
 LLM_MODEL_ID = "gpt-oss:120b"
 
-# k=4 is ideal: each professor is 1-2 chunks (~2KB). Pulling 4 chunks gives
-# 2-4 relevant professors without flooding the context with unrelated profiles.
-JSON_RETRIEVER_K = 4
-USER_RETRIEVER_K = 4
+# Adaptive retrieval depth: each source fetches up to *_MAX_K candidates with
+# their cosine similarities and keeps the leading run that stays at or above
+# RETRIEVAL_MIN_SCORE without dropping more than RETRIEVAL_MAX_GAP from the
+# previous candidate — but never fewer than *_MIN_K. A precise "email of
+# <name>" question keeps one profile; a broad topic question keeps up to MAX_K.
+JSON_RETRIEVER_MIN_K = int(os.getenv("JSON_RETRIEVER_MIN_K", "1"))
+JSON_RETRIEVER_MAX_K = int(os.getenv("JSON_RETRIEVER_MAX_K", "6"))
+USER_RETRIEVER_MIN_K = int(os.getenv("USER_RETRIEVER_MIN_K", "2"))
+USER_RETRIEVER_MAX_K = int(os.getenv("USER_RETRIEVER_MAX_K", "8"))
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.55"))
+RETRIEVAL_MAX_GAP = float(os.getenv("RETRIEVAL_MAX_GAP", "0.06"))
+
+# Per-user storage: one collection per uploaded document, named
+# u_{userId}_{doc_id} (document_collection_name()). Emmbed.py writes each
+# collection once, before any server process opens it — Chroma's persistent
+# client is not safe with two processes writing one collection's segment. A
+# chat searches several of the user's documents by querying their
+# collections together. The reaper deletes collections idle longer than
+# USER_DATA_TTL_SECONDS and evicts a user's oldest documents once their
+# collections hold more than USER_MAX_CHUNKS chunks in total.
+UPLOADED_AT_KEY = "uploaded_at"
+LAST_ACCESS_KEY = "last_access"
+USER_DATA_TTL_SECONDS = int(os.getenv("USER_DATA_TTL_SECONDS", str(7 * 24 * 3600)))
+USER_MAX_CHUNKS = int(os.getenv("USER_MAX_CHUNKS", "5000"))
+# Minimum gap between last_access writes for the same collection.
+LAST_ACCESS_WRITE_INTERVAL = 60
+_last_access_written: dict[str, float] = {}
 
 # Patterns that are questions about the conversation itself, not about professors.
 # These must be answered from chat history — never from ChromaDB.
@@ -76,6 +125,29 @@ META_QUESTION_PATTERNS = re.compile(
     re.IGNORECASE
 )
 
+# Concise, persona-driven QA prompt.
+# The key rules: don't dump everything, match the response length to what was asked.
+QA_SYSTEM_PROMPT = """You are a helpful assistant for the KIIT University professor directory.
+Answer using ONLY the professor profiles retrieved below.
+
+How to respond:
+- Single professor, general question → 3-5 lines: name, role, department, a key highlight, email if available.
+- Single professor, "tell me more" / "full details" → list every available field for that professor only.
+- "Who teaches X?" or "best professor for Y?" → name 2-3 professors, one line each explaining why.
+- "List all professors in [dept]" → compact format: Name | Role | Email.
+- Missing field → say "not listed" inline, do not make it a separate bullet.
+- Never add a "Summary" section or usage tips at the end.
+- Never invent or infer information not present in the profiles.
+
+Retrieved Profiles:
+{context}"""
+
+# "What was my first/last question?" — answered straight from the conversation store.
+QUESTION_LOOKUP_PATTERN = re.compile(
+    r"\b(first|last|previous) (question|message|query)\b",
+    re.IGNORECASE
+)
+
 # Detects questions asking about the count or full list of professors in a department.
 DEPARTMENT_QUERY_PATTERNS = re.compile(
     r"\b(how many|list\s+all|list|count|number\s+of|total|all\s+(the\s+)?)"
@@ -164,21 +236,31 @@ def answer_department_query(question: str) -> str | None:
 llm = None
 embeddings = None
 global_chroma_client = None
+llm_callback = None              # LLMTelemetryCallback shared by all tagged LLM bindings
+
+# Set by warm_up() once models are loaded, data is ingested and a dummy
+# embedding + search pass has run. main.py's /readyz reports it.
+retrieval_ready = False
 
 
 def load_models():
     """Initialize the three core components at app startup:
-    1. Ollama LLM (gpt-oss:120b) for chat generation
-    2. HuggingFace embeddings (BGE-large-en-v1.5) for vector search
+    1. Ollama LLM (gpt-oss:120b) for chat generation, behind the LLM gateway
+    2. Embedding backend (see embedding_backend.py) for vector search, behind
+       the micro-batching EmbeddingService
     3. Global ChromaDB persistent client for the static professor collection"""
-    global llm, embeddings, global_chroma_client
+    global llm, embeddings, global_chroma_client, llm_callback
+    import chromadb
+    from Backend.llm_gateway import build_gateway             # Remote Ollama behind deadlines, hedging + local fallback
+    from Backend.llm_callbacks import LLMTelemetryCallback    # Times LLM calls, counts tokens per stage
 
     print("--- Loading RAG models ---")
+    llm_callback = LLMTelemetryCallback()
     try:
-        llm = ChatOllama(
-            base_url=OLLAMA_BASE_URL,
-            model=LLM_MODEL_ID,
-            headers={'Authorization': f'Bearer {OLLAMA_API_KEY}'},
+        llm = build_gateway(
+            OLLAMA_BASE_URL,
+            LLM_MODEL_ID,
+            api_key=OLLAMA_API_KEY,
             temperature=0.3,  # Lower temperature = more focused, less verbose
         )
     except Exception as e:
@@ -186,11 +268,7 @@ def load_models():
         exit()
 
     try:
-        embeddings = HuggingFaceEmbeddings(
-            model_name=EMBEDDING_MODEL_NAME,
-            model_kwargs={'device': DEVICE},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        embeddings = EmbeddingService(get_embeddings())
     except Exception as e:
         print(f"FATAL Error loading embedding model: {e}")
         exit()
@@ -207,11 +285,15 @@ def load_models():
 
 def check_and_ingest_json():
     """
-    Ingests data.json into ChromaDB.
-    Re-ingests automatically if the item count in data.json changes,
-    so updating data.json + redeploying is all you need.
+    Ingests data.json into ChromaDB as child chunks linked to their parent record.
+    Re-ingests automatically if the record count in data.json changes, the
+    chunk layout (INGEST_VERSION) changes, or the collection was embedded with
+    a different model, so updating data.json or EMBEDDING_MODEL_NAME +
+    redeploying is all you need.
     """
-    global global_chroma_client, embeddings, _raw_json_data
+    global global_chroma_client, embeddings, _raw_json_data, _parent_records, _profile_parents
+    from langchain_chroma import Chroma  # LangChain wrapper around ChromaDB for batched ingestion
+    from Backend.embedding_backend import get_token_counter
 
     if not global_chroma_client:
         return
@@ -224,35 +306,51 @@ def check_and_ingest_json():
         with open(JSON_DATA_PATH, 'r', encoding='utf-8') as f:
             data = json.load(f)
         _raw_json_data = data  # cache for direct lookups
-        source_count = sum(1 for item in data if "page_content" in item)
+        _parent_records, _profile_parents = load_parents(data)
+        source_count = len(_parent_records)
     except Exception as e:
         print(f"Could not read data.json: {e}")
         return
 
     try:
         collection = global_chroma_client.get_collection(name=JSON_COLLECTION_NAME)
-        stored_count = collection.count()
-        if stored_count == source_count and stored_count > 0:
-            print(f"Global Collection ready with {stored_count} items.")
+        stored = collection.metadata or {}
+        try:
+            check_collection_model(collection)
+            model_matches = True
+        except EmbeddingModelMismatch as e:
+            print(f"{e} Re-ingesting...")
+            model_matches = False
+        version_matches = stored.get(INGEST_VERSION_KEY) == INGEST_VERSION
+        stored_count = stored.get(PARENT_COUNT_KEY)
+        if model_matches and version_matches and stored_count == source_count and collection.count() > 0:
+            print(f"Global Collection ready with {stored_count} records ({collection.count()} chunks).")
+            refresh_static_index()
             return
-        print(f"Count mismatch (stored={stored_count}, source={source_count}). Re-ingesting...")
+        if model_matches and not version_matches:
+            print(f"Ingest version changed ({stored.get(INGEST_VERSION_KEY)} -> {INGEST_VERSION}). Re-ingesting...")
+        elif model_matches:
+            print(f"Count mismatch (stored={stored_count}, source={source_count}). Re-ingesting...")
         global_chroma_client.delete_collection(name=JSON_COLLECTION_NAME)
     except Exception:
-        print(f"Global Collection not found. Ingesting {source_count} items...")
+        print(f"Global Collection not found. Ingesting {source_count} records...")
 
     try:
-        documents, metadatas, ids = [], [], []
-        for item in data:
-            if "page_content" in item:
-                documents.append(item["page_content"])
-                metadatas.append(item.get("metadata", {}))
-                ids.append(str(uuid.uuid4()))
+        children = split_records(data, get_token_counter())
+        documents = [text for text, _ in children]
+        metadatas = [metadata for _, metadata in children]
+        ids = [str(uuid.uuid4()) for _ in children]
 
         if documents:
             vector_store = Chroma(
                 client=global_chroma_client,
                 collection_name=JSON_COLLECTION_NAME,
                 embedding_function=embeddings,
+                collection_metadata={
+                    **collection_metadata(),
+                    INGEST_VERSION_KEY: INGEST_VERSION,
+                    PARENT_COUNT_KEY: source_count,
+                },
             )
             for i in range(0, len(documents), 100):
                 vector_store.add_texts(
@@ -260,98 +358,417 @@ def check_and_ingest_json():
                     metadatas=metadatas[i:i+100],
                     ids=ids[i:i+100]
                 )
-            print(f"Ingested {len(documents)} items into Global DB.")
+            print(f"Ingested {source_count} records as {len(documents)} chunks into Global DB.")
     except Exception as e:
         print(f"Error during JSON ingestion: {e}")
 
+    refresh_static_index()
 
-def get_hybrid_retriever(shared_users_db_path: str, unique_collection_name: str = None):
-    """Build a combined retriever that searches both the global JSON collection
-    (static professor data) and the user's uploaded-PDF collection (if any).
-    Results are deduplicated by content prefix to avoid showing the same chunk twice."""
-    global global_chroma_client, embeddings
 
-    retrievers = []
+def refresh_static_index():
+    """Rebuild the in-process static index from the Chroma collection.
+    No-op when STATIC_INDEX=off; on failure retrieval falls back to Chroma."""
+    global _static_index
+
+    if STATIC_INDEX_MODE == "off":
+        return
 
     try:
-        json_store = Chroma(
-            client=global_chroma_client,
-            collection_name=JSON_COLLECTION_NAME,
-            embedding_function=embeddings,
+        collection = global_chroma_client.get_collection(name=JSON_COLLECTION_NAME)
+        check_collection_model(collection)
+        _static_index = StaticVectorIndex.from_collection(
+            collection, mode=STATIC_INDEX_MODE, cache_dir=STATIC_INDEX_CACHE_DIR
         )
-        retrievers.append(json_store.as_retriever(search_kwargs={"k": JSON_RETRIEVER_K}))
+        print(f"Static index ({STATIC_INDEX_MODE}) loaded with {len(_static_index)} vectors.")
     except Exception as e:
-        print(f"Error accessing Global JSON: {e}")
+        _static_index = None
+        print(f"Static index unavailable, using Chroma: {e}")
+
 
-    if shared_users_db_path and unique_collection_name:
+@contextmanager
+def _ingest_lock():
+    """Held while checking/ingesting data.json: with several workers the
+    first one ingests, the others wait and then find the collection ready."""
+    if fcntl is None:
+        yield
+        return
+    with open(GLOBAL_DB_PATH / ".ingest.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
         try:
-            shared_client = chromadb.PersistentClient(path=str(shared_users_db_path))
-            existing = [c.name for c in shared_client.list_collections()]
-            if unique_collection_name in existing:
-                user_store = Chroma(
-                    client=shared_client,
-                    collection_name=unique_collection_name,
-                    embedding_function=embeddings,
-                )
-                retrievers.append(user_store.as_retriever(search_kwargs={"k": USER_RETRIEVER_K}))
-            else:
-                print(f"Note: User collection '{unique_collection_name}' not found yet.")
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def warm_up():
+    """Background warm-up run from main.py's lifespan: load models (unless the
+    gunicorn master already did), ingest data.json, then push one dummy query
+    through embedding + search so the first real request does not pay for
+    lazy initialisation (HNSW index load, first inference). Sets
+    retrieval_ready when done."""
+    global retrieval_ready
+
+    if embeddings is None:       # Not preloaded by a gunicorn master
+        load_models()
+    with _ingest_lock():
+        check_and_ingest_json()
+    with span("warm_up"):
+        retriever = get_hybrid_retriever(None)
+        if retriever is not None:
+            retriever.invoke("warm-up query")
+    retrieval_ready = True
+    print("--- Retrieval ready ---")
+
+
+def is_retrieval_ready() -> bool:
+    return retrieval_ready
+
+
+def reinit_after_fork():
+    """Run in each worker forked from a preloaded master (gunicorn.conf.py post_fork).
+    Model weights are inherited copy-on-write; the master runs no inference,
+    so torch's thread pool is first started in the worker. Objects holding
+    sockets, threads or SQLite handles are not fork-safe and are recreated:
+    the ChromaDB client, the LLM HTTP clients, and ONNX Runtime sessions
+    (whose thread pools do not survive fork). The embedding service starts
+    its own dispatcher thread in each worker on first use."""
+    global global_chroma_client, llm, embeddings
+    import chromadb
+    from chromadb.api.client import SharedSystemClient
+    from Backend.llm_gateway import build_gateway
+
+    if embeddings is None:       # Master did not preload models
+        return
+    SharedSystemClient.clear_system_cache()
+    global_chroma_client = chromadb.PersistentClient(path=str(GLOBAL_DB_PATH))
+    llm = build_gateway(OLLAMA_BASE_URL, LLM_MODEL_ID, api_key=OLLAMA_API_KEY, temperature=0.3)
+    if EMBEDDING_BACKEND == "onnx":
+        embeddings = EmbeddingService(get_embeddings())
+    _last_access_written.clear()
+
+
+def get_user_collection_name(user_id: str) -> str:
+    """Prefix shared by all of a user's document collections (u_{userId})."""
+    safe_uid = re.sub(r'[^a-zA-Z0-9]', '', user_id)
+    return f"u_{safe_uid}"
+
+
+def document_collection_name(user_collection_name: str, doc_id: str) -> str:
+    """Collection holding one uploaded document, u_{userId}_{docName} (max 63 chars)."""
+    return f"{user_collection_name}_{doc_id}"[:63]
+
+
+def _collection_owner(collection_name: str) -> str:
+    """u_{userId} prefix of a document collection name (user ids are alphanumeric)."""
+    return "_".join(collection_name.split("_", 2)[:2])
+
+
+def touch_user_collection(collection):
+    """Record that a user collection was just used, so the reaper keeps it.
+    Writes are throttled to one per LAST_ACCESS_WRITE_INTERVAL per collection."""
+    now = time.time()
+    if now - _last_access_written.get(collection.name, 0) < LAST_ACCESS_WRITE_INTERVAL:
+        return
+    _last_access_written[collection.name] = now
+    # hnsw:* keys are immutable after creation and must not be passed back to modify().
+    metadata = {k: v for k, v in (collection.metadata or {}).items() if not k.startswith("hnsw:")}
+    metadata[LAST_ACCESS_KEY] = now
+    collection.modify(metadata=metadata)
+
+
+def _similarity(distance: float, space: str) -> float:
+    """Chroma distance → cosine similarity for L2-normalised embeddings."""
+    if space == "l2":            # Squared L2: |a - b|² = 2 - 2·cos
+        return 1 - distance / 2
+    return 1 - distance          # cosine / ip distances are 1 - similarity
+
+
+def _query_collection(collection, vectors: list, k: int, where: dict = None) -> list[list]:
+    """One Chroma query for many vectors; top-k (Document, cosine similarity) pairs per vector."""
+    from langchain_core.documents import Document
+
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    result = collection.query(
+        query_embeddings=[list(map(float, v)) for v in vectors], n_results=k,
+        where=where, include=["documents", "metadatas", "distances"],
+    )
+    return [
+        [(Document(page_content=doc, metadata=meta or {}), _similarity(distance, space))
+         for doc, meta, distance in zip(docs, metas, distances)]
+        for docs, metas, distances in zip(result["documents"], result["metadatas"], result["distances"])
+    ]
+
+
+def select_by_score(scored: list, min_k: int, max_k: int,
+                    min_score: float = None, max_gap: float = None) -> list:
+    """Adaptive depth: keep the best-first run of (Document, score) pairs that
+    stays >= min_score with no drop larger than max_gap between neighbours,
+    clamped to [min_k, max_k]. Returns the kept pairs."""
+    min_score = RETRIEVAL_MIN_SCORE if min_score is None else min_score
+    max_gap = RETRIEVAL_MAX_GAP if max_gap is None else max_gap
+    ranked = sorted(scored, key=lambda pair: pair[1], reverse=True)[:max_k]
+    kept = 0
+    for i, (_, score) in enumerate(ranked):
+        if i >= min_k and (score < min_score or ranked[i - 1][1] - score > max_gap):
+            break
+        kept = i + 1
+    return ranked[:kept]
+
+
+def _cut(source: str, results: list[list], min_k: int, max_k: int) -> list[list]:
+    """Apply select_by_score() to every query's candidates and record the chosen depth."""
+    selected = []
+    for scored in results:
+        kept = select_by_score(scored, min_k, max_k)
+        record_retrieval(source, [score for _, score in scored], len(kept))
+        selected.append([doc for doc, _ in kept])
+    return selected
+
+
+def _retrieval_sources(shared_users_db_path: str, user_collection_name: str = None,
+                       doc_ids: list[str] = None) -> list:
+    """(source name, search function) pairs for the global JSON collection and,
+    if doc_ids are given, the collections of those documents of the user.
+    Each search function takes a list of query vectors and returns one list
+    of Documents per vector, so single and batch retrieval share the same path.
+    Every source fetches a scored candidate pool and cuts it adaptively (_cut)."""
+    global global_chroma_client
+    import chromadb
+
+    sources = []
+
+    # The JSON sources match child chunks and return their parent records,
+    # which are then cut by score.
+    def to_parents(source: str, results: list[list]) -> list[list]:
+        parents = [expand_to_parents(children, _parent_records, _profile_parents, JSON_RETRIEVER_MAX_K)
+                   for children in results]
+        return _cut(source, parents, JSON_RETRIEVER_MIN_K, JSON_RETRIEVER_MAX_K)
+
+    if _static_index is not None:
+        sources.append(("static_index", lambda vectors: to_parents("static_index", (
+            _static_index.similarity_search_with_score_by_vectors(vectors, JSON_RETRIEVER_MAX_K * PARENT_FANOUT)
+        ))))
+    else:
+        try:
+            json_collection = global_chroma_client.get_collection(name=JSON_COLLECTION_NAME)
+            check_collection_model(json_collection)
+            sources.append(("chroma_json", lambda vectors: to_parents("chroma_json", _query_collection(
+                json_collection, vectors, JSON_RETRIEVER_MAX_K * PARENT_FANOUT
+            ))))
         except Exception as e:
-            print(f"Error accessing Shared DB: {e}")
+            print(f"Error accessing Global JSON: {e}")
+
+    if shared_users_db_path and user_collection_name and doc_ids:
+        shared_client = chromadb.PersistentClient(path=str(shared_users_db_path))
+        user_collections = []
+        for doc_id in doc_ids:
+            name = document_collection_name(user_collection_name, doc_id)
+            try:
+                collection = shared_client.get_collection(name=name)
+                check_collection_model(collection)
+                touch_user_collection(collection)
+                user_collections.append(collection)
+            except Exception as e:
+                print(f"Note: User collection '{name}' unavailable: {e}")
+
+        def search_user(vectors):
+            # Candidates from all selected documents, ranked together before the cut.
+            merged = [[] for _ in vectors]
+            for collection in user_collections:
+                for i, scored in enumerate(_query_collection(collection, vectors, USER_RETRIEVER_MAX_K)):
+                    merged[i].extend(scored)
+            return _cut("chroma_user", merged, USER_RETRIEVER_MIN_K, USER_RETRIEVER_MAX_K)
+
+        if user_collections:
+            sources.append(("chroma_user", search_user))
 
-    if not retrievers:
+    return sources
+
+
+def _search_sources(sources: list, vectors: list) -> list[list]:
+    """Run every source once for all vectors and merge per query, deduplicating
+    by content prefix so the same chunk is never shown twice."""
+    merged = [[] for _ in vectors]
+    seen = [set() for _ in vectors]
+    for name, search in sources:
+        try:
+            with span(f"search_{name}"):
+                results = search(vectors)
+            for i, docs in enumerate(results):
+                for doc in docs:
+                    key = doc.page_content[:150]
+                    if key not in seen[i]:
+                        seen[i].add(key)
+                        merged[i].append(doc)
+        except Exception as e:
+            print(f"Retriever error ({name}): {e}")
+    return merged
+
+
+def get_hybrid_retriever(shared_users_db_path: str, user_collection_name: str = None,
+                         doc_ids: list[str] = None):
+    """Build a combined retriever that searches both the global JSON collection
+    (static professor data) and the user's collection (if any), restricted to
+    the given doc_ids — several of the user's documents can be searched at once.
+    The query is embedded once and the vector reused for every source.
+    Results are deduplicated by content prefix to avoid showing the same chunk twice."""
+    global embeddings
+    from langchain_core.runnables import RunnableLambda        # Wrap a plain Python function as a LangChain Runnable,
+                                                               # used to combine multiple sources into one callable
+                                                               # that the retrieval chain can invoke like any other step
+
+    sources = _retrieval_sources(shared_users_db_path, user_collection_name, doc_ids)
+    if not sources:
         return None
 
     def combined_retrieval(query):
-        combined_docs = []
-        seen = set()
-        for r in retrievers:
-            try:
-                for doc in r.invoke(query):
-                    key = doc.page_content[:150]
-                    if key not in seen:
-                        seen.add(key)
-                        combined_docs.append(doc)
-            except Exception as e:
-                print(f"Retriever error: {e}")
-        return combined_docs
+        with span("embed_query"):
+            vector = embeddings.embed_query(query)
+        return _search_sources(sources, [vector])[0]
 
     return RunnableLambda(combined_retrieval)
 
 
+def retrieve_batch(questions: list[str], shared_users_db_path: str = None,
+                   user_collection_name: str = None, doc_ids: list[str] = None) -> list[list]:
+    """Bulk twin of get_hybrid_retriever(): all questions are embedded in one
+    embed_documents() call and each source is queried once for the whole batch.
+    Returns one list of Documents per question."""
+    global embeddings
+    sources = _retrieval_sources(shared_users_db_path, user_collection_name, doc_ids)
+    if not sources or not questions:
+        return [[] for _ in questions]
+    with span("embed_batch"):
+        vectors = embeddings.embed_documents(questions)
+    return _search_sources(sources, vectors)
+
+
 def delete_user_collections(shared_db_path: str, user_id: str):
-    """Delete all ChromaDB collections belonging to a user (matched by the
-    u_{userId}_ prefix). Called on explicit logout to clean up user data."""
+    """Delete all of a user's document collections (matched by the u_{userId}_
+    prefix). Called on explicit logout to clean up user data; idle data left
+    by tab-close is expired by the reaper."""
+    import chromadb
     try:
         client = chromadb.PersistentClient(path=shared_db_path)
-        safe_uid = re.sub(r'[^a-zA-Z0-9]', '', user_id)
-        prefix = f"u_{safe_uid}_"
+        prefix = f"{get_user_collection_name(user_id)}_"
         count = 0
         for col in client.list_collections():
-            if col.name.startswith(prefix):
-                client.delete_collection(col.name)
+            name = col if isinstance(col, str) else col.name
+            if name.startswith(prefix):
+                client.delete_collection(name)
                 count += 1
         print(f"Deleted {count} collections for user {user_id}.")
     except Exception as e:
         print(f"Error cleaning up user collections: {e}")
 
 
-def answer_from_history_only(question: str, chat_history: list) -> str:
+def select_quota_evictions(documents: list[tuple[str, int, float]], max_chunks: int = USER_MAX_CHUNKS) -> list[str]:
+    """Given one user's (collection name, chunk count, uploaded_at) documents,
+    the oldest ones to delete so the rest hold at most max_chunks chunks."""
+    total = sum(count for _, count, _ in documents)
+    evict = []
+    for name, count, _ in sorted(documents, key=lambda d: d[2]):
+        if total <= max_chunks:
+            break
+        evict.append(name)
+        total -= count
+    return evict
+
+
+def reap_user_storage(shared_db_path: str, ttl_seconds: int = USER_DATA_TTL_SECONDS,
+                      max_chunks: int = USER_MAX_CHUNKS):
+    """Garbage-collect the shared user store: delete document collections idle
+    longer than ttl_seconds and enforce the per-user chunk quota on the rest.
+    Collections without last_access (uploaded before the reaper existed) are
+    stamped on first sight, so they expire only after ttl_seconds of disuse."""
+    import chromadb
+    try:
+        client = chromadb.PersistentClient(path=shared_db_path)
+        now, expired, evicted = time.time(), 0, 0
+        documents = {}           # owner -> [(name, chunk count, uploaded_at)]
+        for col in client.list_collections():
+            collection = client.get_collection(col) if isinstance(col, str) else col
+            metadata = collection.metadata or {}
+            last_access = metadata.get(LAST_ACCESS_KEY)
+            if last_access is None:
+                touch_user_collection(collection)
+                last_access = now
+            if now - last_access > ttl_seconds:
+                client.delete_collection(collection.name)
+                _last_access_written.pop(collection.name, None)
+                expired += 1
+                continue
+            documents.setdefault(_collection_owner(collection.name), []).append(
+                (collection.name, collection.count(), metadata.get(UPLOADED_AT_KEY, last_access))
+            )
+        for owner_documents in documents.values():
+            for name in select_quota_evictions(owner_documents, max_chunks):
+                client.delete_collection(name)
+                _last_access_written.pop(name, None)
+                evicted += 1
+        if expired or evicted:
+            print(f"Reaper: deleted {expired} idle and {evicted} over-quota user collections.")
+    except Exception as e:
+        print(f"Error reaping user storage: {e}")
+
+
+def build_chat_history(conversation) -> list:
+    """LangChain messages for the chains: the rolling summary of older turns
+    (if any) followed by the recent window of the server-side conversation."""
+    from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+
+    chat_history = []
+    if conversation.summary:
+        chat_history.append(SystemMessage(content=f"Summary of the earlier conversation: {conversation.summary}"))
+    for turn in conversation.recent_turns():
+        chat_history.append(HumanMessage(content=turn["question"]))
+        chat_history.append(AIMessage(content=turn["answer"]))
+    return chat_history
+
+
+def summarize_turns(previous_summary: str, turns: list[dict]) -> str:
+    """Fold turns that left the history window into the running summary.
+    Called from a background task after the answer has been sent."""
+    from langchain_core.prompts import ChatPromptTemplate
+
+    transcript = "".join(f"User: {t['question']}\nAssistant: {t['answer']}\n" for t in turns)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system",
+         "You maintain a running summary of a conversation with a university professor "
+         "directory assistant. Update the summary with the new exchanges. Keep professor "
+         "names, departments and what the user was looking for; drop pleasantries. "
+         "At most 5 sentences. Return ONLY the updated summary."),
+        ("human", "Current summary:\n{summary}\n\nNew exchanges:\n{transcript}"),
+    ])
+    summary_llm = llm.with_config(tags=["stage:summarize"], callbacks=[llm_callback])
+    result = (prompt | summary_llm).invoke({"summary": previous_summary or "(none)", "transcript": transcript})
+    return result.content.strip()
+
+
+def answer_from_history_only(question: str, conversation) -> str:
     """
     Answers meta-questions about the conversation (e.g. 'what did we talk about?')
-    directly from the in-memory chat history, completely bypassing ChromaDB.
+    from the server-side conversation store, completely bypassing ChromaDB.
+    "What was my first/last question?" is answered directly without an LLM call.
     Called from main.py before the RAG chain is invoked.
     """
-    if not chat_history:
+    from langchain_core.prompts import ChatPromptTemplate
+
+    if conversation.is_empty():
         return "We haven't discussed anything yet — this is the start of our conversation!"
 
+    lookup = QUESTION_LOOKUP_PATTERN.search(question)
+    if lookup:
+        if lookup.group(1).lower() == "first":
+            return f'Your first question was: "{conversation.questions[0]}"'
+        return f'Your last question was: "{conversation.questions[-1]}"'
+
     history_text = ""
-    for msg in chat_history:
-        if isinstance(msg, HumanMessage):
-            history_text += f"User: {msg.content}\n"
-        elif isinstance(msg, AIMessage):
-            first_sentence = msg.content.split('.')[0].strip()
-            history_text += f"Assistant: {first_sentence}.\n"
+    if conversation.summary:
+        history_text += f"Earlier: {conversation.summary}\n"
+    for turn in conversation.recent_turns():
+        first_sentence = turn["answer"].split('.')[0].strip()
+        history_text += f"User: {turn['question']}\nAssistant: {first_sentence}.\n"
 
     prompt = ChatPromptTemplate.from_messages([
         ("system",
@@ -360,23 +777,47 @@ def answer_from_history_only(question: str, chat_history: list) -> str:
          "below. Do not reference any external database.\n\nChat History:\n{history}"),
         ("human", "{question}")
     ])
-    result = (prompt | llm).invoke({"history": history_text, "question": question})
+    history_llm = llm.with_config(tags=["stage:history"], callbacks=[llm_callback])
+    result = (prompt | history_llm).invoke({"history": history_text, "question": question})
     return result.content
 
 
-def get_rag_chain_for_collection(shared_users_db_path: str, unique_collection_name: str = None):
-    """Build the full RAG chain for a given user collection:
+def answer_with_context(question: str, docs: list, stage: str = "qa") -> str:
+    """Answer a standalone question from already-retrieved documents with the
+    same QA prompt as the RAG chain (no history, no reformulation)."""
+    from langchain_core.prompts import ChatPromptTemplate
+
+    qa_prompt = ChatPromptTemplate.from_messages([
+        ("system", QA_SYSTEM_PROMPT),
+        ("human", "{input}"),
+    ])
+    context = "\n\n".join(doc.page_content for doc in docs)
+    qa_llm = llm.with_config(tags=[f"stage:{stage}"], callbacks=[llm_callback])
+    return (qa_prompt | qa_llm).invoke({"context": context, "input": question}).content
+
+
+def get_rag_chain_for_collection(shared_users_db_path: str, user_collection_name: str = None,
+                                 doc_ids: list[str] = None):
+    """Build the full RAG chain for a given user collection and document selection:
     1. History-aware retriever — reformulates follow-up questions into standalone queries
     2. Stuff documents chain — feeds retrieved profiles + history into the QA prompt
     3. Retrieval chain — ties retriever and QA chain together
     Returns a runnable that accepts {"input": str, "chat_history": list}."""
     global llm
+    from langchain_classic.chains import (
+        create_history_aware_retriever,   # Wraps a retriever to reformulate queries using chat history
+        create_retrieval_chain,           # Ties retriever + QA chain into a single end-to-end chain
+    )
+    from langchain_classic.chains.combine_documents import (
+        create_stuff_documents_chain,     # Feeds all retrieved docs into a single LLM prompt ("stuff" strategy)
+    )
+    from langchain_core.prompts import ChatPromptTemplate
 
     if not llm:
         print("Models not loaded.")
         return None
 
-    retriever = get_hybrid_retriever(shared_users_db_path, unique_collection_name)
+    retriever = get_hybrid_retriever(shared_users_db_path, user_collection_name, doc_ids)
     if not retriever:
         return None
 
@@ -403,33 +844,21 @@ def get_rag_chain_for_collection(shared_users_db_path: str, unique_collection_na
         ("human", "{input}"),
     ])
 
+    # Tagged LLM bindings let telemetry time each call and count its tokens per stage.
+    reformulate_llm = llm.with_config(tags=["stage:reformulate"], callbacks=[llm_callback])
+    qa_llm = llm.with_config(tags=["stage:qa"], callbacks=[llm_callback])
+
     history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, contextualize_q_prompt
+        reformulate_llm, retriever, contextualize_q_prompt
     )
 
-    # Concise, persona-driven QA prompt.
-    # The key rules: don't dump everything, match the response length to what was asked.
-    qa_system_prompt = """You are a helpful assistant for the KIIT University professor directory.
-Answer using ONLY the professor profiles retrieved below.
-
-How to respond:
-- Single professor, general question → 3-5 lines: name, role, department, a key highlight, email if available.
-- Single professor, "tell me more" / "full details" → list every available field for that professor only.
-- "Who teaches X?" or "best professor for Y?" → name 2-3 professors, one line each explaining why.
-- "List all professors in [dept]" → compact format: Name | Role | Email.
-- Missing field → say "not listed" inline, do not make it a separate bullet.
-- Never add a "Summary" section or usage tips at the end.
-- Never invent or infer information not present in the profiles.
-
-Retrieved Profiles:
-{context}"""
-
+    # Concise, persona-driven QA prompt (QA_SYSTEM_PROMPT, shared with answer_with_context).
     qa_prompt = ChatPromptTemplate.from_messages([
-        ("system", qa_system_prompt),
+        ("system", QA_SYSTEM_PROMPT),
         ("placeholder", "{chat_history}"),
         ("human", "{input}"),
     ])
 
-    question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
+    question_answer_chain = create_stuff_documents_chain(qa_llm, qa_prompt)
     rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
     return rag_chain
\ No newline at end of file
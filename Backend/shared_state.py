@@ -0,0 +1,134 @@
+"""
+shared_state.py — Cross-process key/value state in a local SQLite file.
+
+With several server workers (see gunicorn.conf.py) a request can land on any
+process, so state that must survive across requests lives here instead of in
+module-level dicts:
+
+    job_status      PDF pipeline status per document (processing/completed/failed)
+    conversation    Server-side chat history (conversation_store.py)
+    lease           Named leases so only one worker runs a periodic job
+    admission       Upload slots/queue and per-worker queue depths (admission.py)
+    metrics         Each worker's exported metric series, summed by /metrics
+    metrics_run     Id of the server run the metric exports belong to
+
+Values are JSON, rows may carry an expiry, and update() runs a
+read-modify-write inside one IMMEDIATE transaction so concurrent workers
+never lose each other's writes. The database runs in WAL mode, so readers do
+not block the writer.
+
+SHARED_STATE_PATH overrides the database location.
+"""
+
+import os                        # os.getenv() for the database path, getpid() for lease holders
+import json                      # Values are stored as JSON text
+import time                      # Expiry timestamps
+import sqlite3                   # Local shared store, safe across processes
+import threading                 # One connection per thread
+from pathlib import Path         # Object-oriented filesystem path construction
+
+SHARED_STATE_PATH = Path(os.getenv(
+    "SHARED_STATE_PATH", Path(__file__).parent / "users_data" / "shared_state.sqlite3"
+))
+
+
+class SharedStore:
+    def __init__(self, path: Path = SHARED_STATE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " expires_at REAL, PRIMARY KEY (namespace, key))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections are per thread and per process: after a fork the child
+        # opens its own instead of reusing the parent's.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, namespace: str, key: str, default=None):
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return default
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value, ttl: float = None):
+        expires_at = time.time() + ttl if ttl else None
+        self._connect().execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), expires_at),
+        )
+
+    def items(self, namespace: str) -> dict:
+        """All unexpired {key: value} entries of a namespace."""
+        rows = self._connect().execute(
+            "SELECT key, value FROM kv WHERE namespace = ? AND (expires_at IS NULL OR expires_at >= ?)",
+            (namespace, time.time()),
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def delete(self, namespace: str, key: str):
+        self._connect().execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def clear(self, namespace: str):
+        self._connect().execute("DELETE FROM kv WHERE namespace = ?", (namespace,))
+
+    def update(self, namespace: str, key: str, fn, default=None, ttl: float = None):
+        """Atomically replace the value with fn(current) and return the new value.
+        fn may return None to delete the entry."""
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            current = default
+            if row is not None and (row[1] is None or row[1] >= time.time()):
+                current = json.loads(row[0])
+            value = fn(current)
+            if value is None:
+                db.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+            else:
+                expires_at = time.time() + ttl if ttl else None
+                db.execute(
+                    "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, json.dumps(value), expires_at),
+                )
+            db.execute("COMMIT")
+            return value
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def purge_expired(self):
+        self._connect().execute(
+            "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time(),)
+        )
+
+    def acquire_lease(self, name: str, ttl: float) -> bool:
+        """True if this process holds the lease `name` for the next ttl seconds
+        (taking it over if it is free, expired or already ours)."""
+        holder = os.getpid()
+        now = time.time()
+
+        def take(current):
+            if current and current["holder"] != holder and current["until"] > now:
+                return current
+            return {"holder": holder, "until": now + ttl}
+
+        return self.update("lease", name, take)["holder"] == holder
+
+
+# Default store shared by main.py and conversation_store.py.
+shared_store = SharedStore()
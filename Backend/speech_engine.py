@@ -0,0 +1,231 @@
+"""
+speech_engine.py — Speech-to-text engines run in a dedicated worker process pool.
+
+Transcription is CPU-bound (local model) or blocking network I/O (Google), so
+it never runs on the event loop. Requests are handed to a ProcessPoolExecutor;
+at most STT_WORKERS + STT_MAX_PENDING requests are in flight, and anything
+beyond that is answered immediately with a "busy" message instead of queueing
+without bound. A streaming final is the user's actual words, so it waits up
+to STT_FINAL_MAX_WAIT seconds for room before the client is told it was lost.
+
+Streaming (/ws/transcribe): VadSegmenter consumes raw 16 kHz mono 16-bit PCM
+frames as they are recorded, drops silence with WebRTC VAD, and emits partial
+decodes of the current utterance plus a final decode when the speaker pauses.
+Only the current utterance is ever buffered.
+
+Engines (STT_ENGINE env var):
+    google   pydub/ffmpeg → WAV → Google Web Speech API (network; default)
+    whisper  faster-whisper (CTranslate2, int8 on CPU), fully offline. Audio is
+             decoded in-process to 16 kHz mono via PyAV; task="translate"
+             yields English text for any spoken language.
+"""
+
+import os                        # os.getenv() for engine/pool configuration
+import io                        # io.BytesIO — in-memory audio streams, no temp files
+import asyncio                   # Await pool results from async endpoints; bound in-flight work
+import multiprocessing           # "spawn" start method for the pool workers
+from concurrent.futures import ProcessPoolExecutor  # Dedicated worker processes for transcription
+
+STT_ENGINE = os.getenv("STT_ENGINE", "google").lower()
+STT_WHISPER_MODEL = os.getenv("STT_WHISPER_MODEL", "base")
+STT_WHISPER_COMPUTE_TYPE = os.getenv("STT_WHISPER_COMPUTE_TYPE", "int8")
+STT_WORKERS = int(os.getenv("STT_WORKERS", "2"))
+STT_MAX_PENDING = int(os.getenv("STT_MAX_PENDING", "8"))
+STT_FINAL_MAX_WAIT = float(os.getenv("STT_FINAL_MAX_WAIT", "10"))
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2                 # 16-bit PCM
+
+# Streaming segmentation settings.
+VAD_AGGRESSIVENESS = int(os.getenv("STT_VAD_AGGRESSIVENESS", "2"))   # 0 (lenient) .. 3 (strict)
+VAD_FRAME_MS = 30                                                    # webrtcvad accepts 10/20/30 ms
+STREAM_PARTIAL_INTERVAL_MS = int(os.getenv("STT_PARTIAL_INTERVAL_MS", "800"))
+STREAM_END_SILENCE_MS = int(os.getenv("STT_END_SILENCE_MS", "600"))
+STREAM_MAX_UTTERANCE_MS = int(os.getenv("STT_MAX_UTTERANCE_MS", "20000"))
+
+UNRECOGNIZED_TEXT = "Could not understand audio."
+BUSY_TEXT = "Speech service is busy, please try again in a moment."
+
+_pool = None
+_slots = None
+
+# Per-worker-process model instance, loaded once by _init_worker().
+_whisper_model = None
+
+
+def _init_worker():
+    """Pool initializer: load the local model once per worker process."""
+    global _whisper_model
+    if STT_ENGINE == "whisper":
+        from faster_whisper import WhisperModel
+        _whisper_model = WhisperModel(
+            STT_WHISPER_MODEL, device="cpu", compute_type=STT_WHISPER_COMPUTE_TYPE,
+            cpu_threads=max(1, (os.cpu_count() or 1) // STT_WORKERS),
+        )
+
+
+def decode_audio(audio_content: bytes):
+    """Decode any container/codec ffmpeg understands to a 16 kHz mono float32 array, in-process."""
+    from faster_whisper.audio import decode_audio as _decode
+    return _decode(io.BytesIO(audio_content), sampling_rate=SAMPLE_RATE)
+
+
+def transcribe_samples(samples) -> str:
+    """Run the local model over 16 kHz mono float32 samples and return English text."""
+    segments, _ = _whisper_model.transcribe(
+        samples, task="translate", beam_size=1, vad_filter=True,
+    )
+    return " ".join(segment.text.strip() for segment in segments).strip()
+
+
+def _recognize_google(audio) -> str:
+    import speech_recognition as sr
+    return sr.Recognizer().recognize_google(audio, language="en-US")
+
+
+def _transcribe_google(audio_content: bytes) -> str:
+    import speech_recognition as sr
+    from pydub import AudioSegment
+
+    r = sr.Recognizer()
+    audio_segment = AudioSegment.from_file(io.BytesIO(audio_content))
+    wav_buffer = io.BytesIO()
+    audio_segment.export(wav_buffer, format="wav", parameters=["-ac", "1", "-ar", str(SAMPLE_RATE)])
+    wav_buffer.seek(0)
+    with sr.AudioFile(wav_buffer) as source:
+        audio = r.record(source)
+    return _recognize_google(audio)
+
+
+def transcribe_and_translate_audio(audio_content: bytes) -> dict:
+    """Worker-side entry point: transcribe uploaded audio bytes with the configured
+    engine and return the English transcript. Falls back to an error message on failure."""
+    try:
+        if STT_ENGINE == "whisper":
+            text = transcribe_samples(decode_audio(audio_content))
+        else:
+            text = _transcribe_google(audio_content)
+        return {"text_english": text or UNRECOGNIZED_TEXT}
+    except Exception as e:
+        print(f"Transcription error: {e}")
+        return {"text_english": UNRECOGNIZED_TEXT}
+
+
+def transcribe_pcm(pcm: bytes) -> str:
+    """Worker-side entry point for streaming: transcribe raw 16 kHz mono 16-bit PCM."""
+    try:
+        if STT_ENGINE == "whisper":
+            import numpy as np
+            samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+            return transcribe_samples(samples)
+        import speech_recognition as sr
+        return _recognize_google(sr.AudioData(pcm, SAMPLE_RATE, SAMPLE_WIDTH))
+    except Exception as e:
+        print(f"Streaming transcription error: {e}")
+        return ""
+
+
+class VadSegmenter:
+    """Split a live PCM stream into utterances using WebRTC VAD.
+
+    push() returns a list of ("partial" | "final", utterance_pcm) events:
+    a partial every STREAM_PARTIAL_INTERVAL_MS of new speech, and a final once
+    STREAM_END_SILENCE_MS of silence follows speech (or the utterance reaches
+    STREAM_MAX_UTTERANCE_MS). Leading silence is never buffered."""
+
+    FRAME_BYTES = SAMPLE_RATE * VAD_FRAME_MS // 1000 * SAMPLE_WIDTH
+
+    def __init__(self):
+        import webrtcvad
+        self.vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+        self._pending = b""
+        self._utterance = bytearray()
+        self._silence_ms = 0
+        self._since_partial_ms = 0
+
+    def _utterance_ms(self) -> int:
+        return len(self._utterance) // self.FRAME_BYTES * VAD_FRAME_MS
+
+    def _finish(self):
+        utterance = bytes(self._utterance)
+        self._utterance.clear()
+        self._silence_ms = self._since_partial_ms = 0
+        return ("final", utterance)
+
+    def push(self, pcm: bytes) -> list[tuple[str, bytes]]:
+        events = []
+        data = self._pending + pcm
+        usable = len(data) - len(data) % self.FRAME_BYTES
+        self._pending = data[usable:]
+
+        for start in range(0, usable, self.FRAME_BYTES):
+            frame = data[start:start + self.FRAME_BYTES]
+            speech = self.vad.is_speech(frame, SAMPLE_RATE)
+            if not self._utterance and not speech:
+                continue
+
+            self._utterance.extend(frame)
+            self._since_partial_ms += VAD_FRAME_MS
+            self._silence_ms = 0 if speech else self._silence_ms + VAD_FRAME_MS
+
+            if (self._silence_ms >= STREAM_END_SILENCE_MS
+                    or self._utterance_ms() >= STREAM_MAX_UTTERANCE_MS):
+                events.append(self._finish())
+            elif speech and self._since_partial_ms >= STREAM_PARTIAL_INTERVAL_MS:
+                self._since_partial_ms = 0
+                events.append(("partial", bytes(self._utterance)))
+        return events
+
+    def flush(self) -> list[tuple[str, bytes]]:
+        """End of stream: finalize whatever utterance is still open."""
+        self._pending = b""
+        return [self._finish()] if self._utterance else []
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Create the worker pool on first use."""
+    global _pool, _slots
+    if _pool is None:
+        # Spawned, not forked: the server process runs torch/ONNX and HTTP
+        # client threads, and a forked child would inherit its locks and memory.
+        _pool = ProcessPoolExecutor(
+            max_workers=STT_WORKERS, initializer=_init_worker,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        _slots = asyncio.Semaphore(STT_WORKERS + STT_MAX_PENDING)
+    return _pool
+
+
+async def run_in_pool(fn, *args, wait: float = 0):
+    """Run fn(*args) in the worker pool. If the bounded queue is full, wait up
+    to `wait` seconds for room; return None if there is still none."""
+    pool = get_pool()
+    if _slots.locked() and not wait:
+        return None
+    try:
+        await asyncio.wait_for(_slots.acquire(), timeout=wait or None)
+    except asyncio.TimeoutError:
+        return None
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    finally:
+        _slots.release()
+
+
+async def transcribe(audio_content: bytes) -> dict:
+    """Async entry point used by /transcribe-audio/."""
+    result = await run_in_pool(transcribe_and_translate_audio, audio_content)
+    return result if result is not None else {"text_english": BUSY_TEXT}
+
+
+async def transcribe_utterance(pcm: bytes, wait: float = 0):
+    """Async entry point used by /ws/transcribe for one (partial or final)
+    utterance. Returns None if the pool stayed busy for `wait` seconds."""
+    return await run_in_pool(transcribe_pcm, pcm, wait=wait)
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,136 @@
+"""
+static_assets.py — Precompressed, fingerprinted static assets and cached HTML pages.
+
+At startup every frontend asset (CSS/JS/images) is read once, given a
+content-hash fingerprinted URL (/assets/style.3f2a9c1b7e4d.css) and, for text
+types, compressed to gzip and brotli variants held in memory. Fingerprinted
+URLs never change content, so they are served with a one-year immutable
+Cache-Control. HTML pages are loaded once with their /static/... references
+rewritten to the fingerprinted URLs, and served with an ETag so repeat visits
+get a 304.
+
+With DEV_RELOAD=1 files are re-read when their mtime changes, so editing the
+frontend does not need a server restart.
+"""
+
+import os                        # os.getenv() for DEV_RELOAD
+import re                        # Rewrite /static/... references inside HTML
+import gzip                      # Precompressed gzip variants
+import hashlib                   # Content-hash fingerprints and ETags
+import mimetypes                 # Content-Type for assets
+from pathlib import Path         # Object-oriented filesystem path construction
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli                # Optional: brotli variants are skipped when unavailable
+except ImportError:
+    brotli = None
+
+DEV_RELOAD = os.getenv("DEV_RELOAD", "0") == "1"
+
+ASSET_URL_PREFIX = "/assets"
+ASSET_EXTENSIONS = {".css", ".js", ".png", ".jpg", ".jpeg", ".svg", ".ico", ".webp"}
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".html"}
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+STATIC_REF_PATTERN = re.compile(r'/static/([A-Za-z0-9._/-]+)')
+
+
+def _etag(data: bytes) -> str:
+    return '"' + hashlib.sha256(data).hexdigest()[:16] + '"'
+
+
+def _variants(data: bytes, suffix: str) -> dict:
+    """Encoded bodies by Content-Encoding ("" = identity)."""
+    variants = {"": data}
+    if suffix in COMPRESSIBLE_EXTENSIONS:
+        variants["gzip"] = gzip.compress(data, compresslevel=9, mtime=0)
+        if brotli is not None:
+            variants["br"] = brotli.compress(data, quality=11)
+    return variants
+
+
+def _negotiate(request: Request, variants: dict) -> str:
+    accepted = request.headers.get("accept-encoding", "")
+    for encoding in ("br", "gzip"):
+        if encoding in variants and encoding in accepted:
+            return encoding
+    return ""
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    return etag in {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}
+
+
+class _Entry:
+    """One file loaded into memory with its encoded variants."""
+
+    def __init__(self, path: Path, data: bytes):
+        self.path = path
+        self.mtime = path.stat().st_mtime
+        self.etag = _etag(data)
+        self.variants = _variants(data, path.suffix.lower())
+        self.media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+    def respond(self, request: Request, cache_control: str) -> Response:
+        headers = {"ETag": self.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if _not_modified(request, self.etag):
+            return Response(status_code=304, headers=headers)
+        encoding = _negotiate(request, self.variants)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=self.variants[encoding], media_type=self.media_type, headers=headers)
+
+
+class StaticAssets:
+    """Fingerprinted assets + cached HTML templates for one frontend directory."""
+
+    def __init__(self, frontend_dir: Path):
+        self.frontend_dir = frontend_dir
+        self.assets = {}         # fingerprinted name -> _Entry
+        self.urls = {}           # original relative path -> fingerprinted URL
+        self.pages = {}          # template name -> _Entry
+        self._build_assets()
+
+    def _build_assets(self):
+        self.assets.clear()
+        self.urls.clear()
+        for path in sorted(self.frontend_dir.rglob("*")):
+            if not path.is_file() or path.suffix.lower() not in ASSET_EXTENSIONS:
+                continue
+            data = path.read_bytes()
+            relative = path.relative_to(self.frontend_dir).as_posix()
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            stem, suffix = relative.rsplit(".", 1) if "." in relative else (relative, "")
+            fingerprinted = f"{stem}.{digest}.{suffix}"
+            self.assets[fingerprinted] = _Entry(path, data)
+            self.urls[relative] = f"{ASSET_URL_PREFIX}/{fingerprinted}"
+        print(f"[ASSETS] {len(self.assets)} assets fingerprinted "
+              f"(brotli {'on' if brotli is not None else 'off'}).")
+
+    def _assets_changed(self) -> bool:
+        return any(entry.path.stat().st_mtime != entry.mtime for entry in self.assets.values())
+
+    def _load_page(self, name: str) -> _Entry:
+        path = self.frontend_dir / name
+        html = path.read_text(encoding="utf-8")
+        html = STATIC_REF_PATTERN.sub(lambda m: self.urls.get(m.group(1), m.group(0)), html)
+        return _Entry(path, html.encode("utf-8"))
+
+    def page(self, request: Request, name: str) -> Response:
+        """Serve an HTML page from memory with ETag/304 support."""
+        if DEV_RELOAD and self._assets_changed():
+            self._build_assets()
+            self.pages.clear()
+        entry = self.pages.get(name)
+        if entry is None or (DEV_RELOAD and entry.path.stat().st_mtime != entry.mtime):
+            entry = self.pages[name] = self._load_page(name)
+        # HTML must revalidate so new fingerprinted URLs are picked up after a deploy.
+        return entry.respond(request, "no-cache")
+
+    def asset(self, request: Request, fingerprinted: str) -> Response:
+        """Serve a fingerprinted asset with immutable caching, or 404."""
+        entry = self.assets.get(fingerprinted)
+        if entry is None:
+            return Response(status_code=404)
+        return entry.respond(request, IMMUTABLE_CACHE)
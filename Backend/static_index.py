@@ -0,0 +1,145 @@
+"""
+static_index.py — In-process exact-search index for the static professor collection.
+
+The global collection is small (~1.1k vectors), so a single matrix-vector
+product answers top-k faster than a round trip through Chroma's HNSW layer
+and metadata fetch. Chroma stays the source of truth: the index is rebuilt
+from the collection by refresh() after check_and_ingest_json().
+
+Modes (STATIC_INDEX env var):
+    off     Query Chroma directly (default)
+    memory  Hold the normalized float32 matrix in RAM
+    mmap    Persist the matrix as float16 .npy next to the DB and memory-map it
+
+Any other value is a configuration error and raises ValueError on import.
+
+The mmap cache (vectors.f16.npy + records.json) is reused as long as its
+fingerprint — the collection's id, count and metadata, which carries the
+ingest version — still matches; re-ingestion recreates the collection and so
+invalidates it. Files are written under temporary names and swapped in with
+os.replace(), so a process that still maps the old matrix keeps a valid file.
+"""
+
+import os                        # os.getenv() for the index mode; os.replace() for atomic cache writes
+import json                      # Persist documents/metadata next to the mmap'd matrix
+import numpy as np               # Matrix storage and the top-k matrix-vector product
+from pathlib import Path         # Object-oriented filesystem path construction
+
+STATIC_INDEX_MODES = ("off", "memory", "mmap")
+STATIC_INDEX_MODE = os.getenv("STATIC_INDEX", "off").lower()
+if STATIC_INDEX_MODE not in STATIC_INDEX_MODES:
+    raise ValueError(f"Unknown STATIC_INDEX '{STATIC_INDEX_MODE}' (expected one of {', '.join(STATIC_INDEX_MODES)})")
+
+# Rows of the float16 matrix converted to float32 per step of a search, so a
+# query never materialises a float32 copy of the whole memory-mapped matrix.
+SEARCH_BLOCK_ROWS = 4096
+
+
+class StaticVectorIndex:
+    """Normalized embedding matrix + parallel document/metadata arrays."""
+
+    def __init__(self, vectors: np.ndarray, documents: list[str], metadatas: list[dict]):
+        self.vectors = vectors
+        self.documents = documents
+        self.metadatas = metadatas
+
+    def __len__(self):
+        return len(self.documents)
+
+    @classmethod
+    def from_collection(cls, collection, mode: str = "memory", cache_dir: Path = None):
+        """Load every vector of a Chroma collection. In "mmap" mode the matrix is
+        memory-mapped from cache_dir as float16, rebuilt only when the cache is stale."""
+        if mode not in ("memory", "mmap"):
+            raise ValueError(f"Unknown static index mode '{mode}'")
+        if mode == "mmap":
+            fingerprint = {
+                "collection_id": str(collection.id),
+                "count": collection.count(),
+                "metadata": collection.metadata or {},
+            }
+            cached = cls._load_cache(cache_dir, fingerprint)
+            if cached is not None:
+                return cached
+
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        vectors = np.asarray(data["embeddings"], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+        documents = list(data["documents"])
+        metadatas = [m or {} for m in data["metadatas"]]
+
+        if mode == "mmap":
+            cls._write_cache(cache_dir, fingerprint, vectors, documents, metadatas)
+            vectors = np.load(cache_dir / "vectors.f16.npy", mmap_mode="r")
+
+        return cls(vectors, documents, metadatas)
+
+    @classmethod
+    def _load_cache(cls, cache_dir: Path, fingerprint: dict):
+        """The cached index if it was built from this exact collection state, else None."""
+        try:
+            with open(cache_dir / "records.json", encoding="utf-8") as f:
+                records = json.load(f)
+            if records.get("fingerprint") != fingerprint:
+                return None
+            vectors = np.load(cache_dir / "vectors.f16.npy", mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if len(vectors) != len(records["documents"]):
+            return None
+        return cls(vectors, records["documents"], records["metadatas"])
+
+    @staticmethod
+    def _write_cache(cache_dir: Path, fingerprint: dict, vectors, documents: list[str], metadatas: list[dict]):
+        # Matrix first, records.json (which carries the fingerprint) last:
+        # a crash in between leaves a cache that fails validation.
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        suffix = f".{os.getpid()}.tmp"
+        matrix_tmp = cache_dir / ("vectors.f16.npy" + suffix)
+        with open(matrix_tmp, "wb") as f:
+            np.save(f, vectors.astype(np.float16))
+        os.replace(matrix_tmp, cache_dir / "vectors.f16.npy")
+        records_tmp = cache_dir / ("records.json" + suffix)
+        with open(records_tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "documents": documents, "metadatas": metadatas}, f)
+        os.replace(records_tmp, cache_dir / "records.json")
+
+    def search(self, query_vector, k: int) -> list[tuple[int, float]]:
+        """Return up to k (row, cosine similarity) pairs, best first."""
+        return self.search_batch([query_vector], k)[0]
+
+    def search_batch(self, query_vectors, k: int) -> list[list[tuple[int, float]]]:
+        """search() for many queries with one matrix-matrix product."""
+        if not len(self):
+            return [[] for _ in query_vectors]
+        q = np.asarray(query_vectors, dtype=np.float32).reshape(len(query_vectors), -1)
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        q = q / np.where(norms == 0, 1, norms)
+        scores = self._scores(q)
+        k = min(k, scores.shape[1])
+        results = []
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            results.append([(int(i), float(row[i])) for i in top])
+        return results
+
+    def _scores(self, q: np.ndarray) -> np.ndarray:
+        """Cosine similarities of normalized float32 queries against every row."""
+        if self.vectors.dtype == np.float32:
+            return q @ self.vectors.T
+        # float16 has no BLAS matmul: convert block by block and use the float32 one.
+        scores = np.empty((len(q), len(self.vectors)), dtype=np.float32)
+        for start in range(0, len(self.vectors), SEARCH_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            scores[:, start:start + len(block)] = q @ block.T
+        return scores
+
+    def similarity_search_with_score_by_vectors(self, query_vectors, k: int) -> list[list]:
+        """Top-k per query as (LangChain Document, cosine similarity) pairs, best first."""
+        from langchain_core.documents import Document
+        return [
+            [(Document(page_content=self.documents[i], metadata=self.metadatas[i]), score) for i, score in hits]
+            for hits in self.search_batch(query_vectors, k)
+        ]
@@ -0,0 +1,217 @@
+"""
+telemetry.py — Hot-path timing spans, LLM token accounting and a Prometheus /metrics registry.
+
+Minimal in-process implementation of the Prometheus text exposition format
+(counters + histograms with labels), so instrumenting a stage costs a dict
+lookup and a few float additions:
+
+    with span("embed_query"):
+        vector = embeddings.embed_query(query)
+
+Spans feed the `rag_stage_duration_seconds{stage=...}` histogram and, while a
+request trace is open (trace_request()), are also collected into a per-request
+trace that is printed as one JSON line when TRACE_LOG=1. LLM calls are
+reported through record_llm_call() by the LangChain callback in
+llm_callbacks.py. This module has no third-party imports, so importing it
+never slows down startup.
+
+The registry lives in one process. With several gunicorn workers each one
+exports its series (export_metrics()) to the shared store and /metrics
+renders the sum over all workers (render_metrics(exports)), so a scrape sees
+server-wide counters whichever worker answers it.
+"""
+
+import os                        # os.getenv() for TRACE_LOG
+import json                      # Structured per-request trace log lines
+import time                      # perf_counter() for span timing
+import uuid                      # Trace IDs
+import threading                 # Guard metric updates from worker threads
+import contextvars                # Current request trace, propagated into LangChain's executor threads
+from contextlib import contextmanager
+
+TRACE_LOG = os.getenv("TRACE_LOG", "0") == "1"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_lock = threading.Lock()
+_metrics = {}
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help = name, help_text
+        self.values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.help, self.buckets = name, help_text, buckets
+        self.series = {}         # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            series = self.series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+def counter(name: str, help_text: str) -> Counter:
+    return _metrics.setdefault(name, Counter(name, help_text))
+
+
+def histogram(name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    return _metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+
+def export_metrics() -> dict:
+    """JSON-serialisable copy of this process's series: {name: [[labels, value or histogram series]]}."""
+    with _lock:
+        return {
+            name: [[list(map(list, key)), value] for key, value in
+                   (metric.values if isinstance(metric, Counter) else metric.series).items()]
+            for name, metric in _metrics.items()
+        }
+
+
+def _merge(exports: list[dict]) -> list:
+    """Registry-shaped metrics holding the sum of every export's series."""
+    merged = []
+    for name, metric in list(_metrics.items()):
+        if isinstance(metric, Counter):
+            total = Counter(name, metric.help)
+            for export in exports:
+                for labels, value in export.get(name, []):
+                    key = tuple(map(tuple, labels))
+                    total.values[key] = total.values.get(key, 0) + value
+        else:
+            total = Histogram(name, metric.help, metric.buckets)
+            for export in exports:
+                for labels, series in export.get(name, []):
+                    if len(series) != len(metric.buckets) + 2:
+                        continue     # Exported by a build with different buckets
+                    key = tuple(map(tuple, labels))
+                    current = total.series.setdefault(key, [0] * len(series))
+                    total.series[key] = [a + b for a, b in zip(current, series)]
+        merged.append(total)
+    return merged
+
+
+def render_metrics(exports: list[dict] = None) -> str:
+    """Prometheus text exposition of every registered metric; with exports
+    (from export_metrics() in each worker), of their sum instead of this process."""
+    lines = []
+    for metric in (_merge(exports) if exports is not None else list(_metrics.values())):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = histogram("rag_stage_duration_seconds", "Duration of RAG hot-path stages.")
+PIPELINE_STAGE_SECONDS = histogram(
+    "pipeline_stage_duration_seconds", "Duration of PDF pipeline subprocess stages.",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1200),
+)
+REQUEST_SECONDS = histogram("chat_request_duration_seconds", "End-to-end /chat latency by route taken.")
+REQUESTS_TOTAL = counter("chat_requests_total", "Chat requests by route taken.")
+LLM_TOKENS_TOTAL = counter("llm_tokens_total", "LLM prompt/completion tokens by stage.")
+RETRIEVAL_DEPTH = histogram(
+    "retrieval_depth", "Documents kept per retrieval source after the score cut.",
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 12, 16),
+)
+
+
+def _record(stage: str, seconds: float, **extra):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace["spans"].append({"stage": stage, "ms": round(seconds * 1000, 2), **extra})
+
+
+@contextmanager
+def span(stage: str, metric: Histogram = STAGE_SECONDS, **labels):
+    """Time a block, observe it on `metric` (labelled stage=...) and add it to the open trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metric.observe(elapsed, stage=stage, **labels)
+        _record(stage, elapsed, **labels)
+
+
+def record_retrieval(source: str, scores: list[float], kept: int):
+    """Record one source's adaptive-depth decision: the kept count on the
+    retrieval_depth histogram, and the candidate scores in the open trace."""
+    RETRIEVAL_DEPTH.observe(kept, source=source)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.setdefault("retrieval", []).append(
+            {"source": source, "k": kept, "scores": [round(score, 3) for score in scores]}
+        )
+
+
+@contextmanager
+def trace_request(name: str):
+    """Open a per-request trace. Yields the trace dict; set trace["route"] to
+    label the request. Emits one JSON log line on exit when TRACE_LOG=1."""
+    trace = {"trace_id": uuid.uuid4().hex[:16], "name": name, "route": None, "spans": [], "tokens": {}}
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        elapsed = time.perf_counter() - start
+        _current_trace.reset(token)
+        route = trace["route"] or "error"
+        REQUEST_SECONDS.observe(elapsed, route=route)
+        REQUESTS_TOTAL.inc(route=route)
+        if TRACE_LOG:
+            trace["total_ms"] = round(elapsed * 1000, 2)
+            print(json.dumps({"trace": trace}))
+
+
+def record_llm_call(stage: str, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0):
+    """Record one LLM call: latency histogram, token counters and the open trace."""
+    STAGE_SECONDS.observe(seconds, stage=f"llm_{stage}")
+    LLM_TOKENS_TOTAL.inc(prompt_tokens, stage=stage, kind="prompt")
+    LLM_TOKENS_TOTAL.inc(completion_tokens, stage=stage, kind="completion")
+    _record(f"llm_{stage}", seconds, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    trace = _current_trace.get()
+    if trace is not None:
+        totals = trace["tokens"].setdefault(stage, {"prompt": 0, "completion": 0})
+        totals["prompt"] += prompt_tokens
+        totals["completion"] += completion_tokens
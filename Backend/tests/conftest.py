@@ -0,0 +1,11 @@
+"""
+conftest.py — Let tests import the pipeline modules the way the pipeline scripts do.
+
+Base.py, Image-Testo.py and Emmbed.py run with Backend/ as their working
+directory and use flat imports (e.g. chunk_dedup's `from md_chunker import ...`).
+"""
+
+import sys                       # Put Backend/ on the import path
+from pathlib import Path         # Object-oriented filesystem path construction
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
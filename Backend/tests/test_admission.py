@@ -0,0 +1,102 @@
+"""
+test_admission.py — Per-worker budgets, shedding, priorities and the shared upload/batch queue.
+"""
+
+import asyncio
+
+import pytest
+
+from Backend import admission as admission_module
+from Backend.admission import AdmissionController, RequestClass, SharedRequestClass, Overloaded
+from Backend.shared_state import SharedStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SharedStore(tmp_path / "state.sqlite3")
+
+
+def controller(store, chat_queue=1, max_wait=5):
+    return AdmissionController(
+        [RequestClass("chat", 0, concurrency=1, max_queue=chat_queue, max_wait=max_wait, service_seconds=2, workers=1)],
+        [SharedRequestClass("upload", 2, concurrency=1, max_queue=1, max_wait=0, service_seconds=60, store=store)],
+        store=store,
+    )
+
+
+def test_budget_is_split_between_workers():
+    chat = RequestClass("chat", 0, concurrency=8, max_queue=32, max_wait=20, service_seconds=4, workers=3)
+    assert (chat.concurrency, chat.max_queue) == (3, 11)
+    assert RequestClass("t", 1, concurrency=1, max_queue=0, max_wait=0, service_seconds=1, workers=4).concurrency == 1
+
+
+def test_queue_then_shed_then_hand_over(store):
+    gate = controller(store)
+
+    async def scenario():
+        await gate.acquire("chat")                     # Takes the only slot
+        queued = asyncio.create_task(gate.acquire("chat"))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as shed:        # Slot and queue both taken
+            await gate.acquire("chat")
+        assert shed.value.retry_after >= 1
+        gate.release("chat", service_seconds=2)
+        await asyncio.wait_for(queued, 1)              # Released slot goes to the waiter
+        assert gate.classes["chat"].active == 1
+
+    asyncio.run(scenario())
+
+
+def test_waiter_is_shed_after_max_wait(store):
+    gate = controller(store, max_wait=0.05)
+
+    async def scenario():
+        await gate.acquire("chat")
+        with pytest.raises(Overloaded):
+            await gate.acquire("chat")
+        assert not gate.classes["chat"].waiters
+
+    asyncio.run(scenario())
+
+
+def test_queued_chat_in_another_worker_blocks_uploads(store):
+    gate = controller(store)
+    assert not gate._blocked(2)
+    gate._remote["chat"]["queued"] = 1
+    assert gate._blocked(2)
+    assert not gate._blocked(0)
+
+
+def test_shared_queue_is_fifo_across_workers(store):
+    upload = SharedRequestClass("upload", 2, concurrency=1, max_queue=1, max_wait=0, service_seconds=60, store=store)
+    other_worker = SharedRequestClass("upload", 2, concurrency=1, max_queue=1, max_wait=0, service_seconds=60, store=store)
+    first, second = upload.reserve(), other_worker.reserve()
+    with pytest.raises(Overloaded):
+        upload.reserve()
+    assert not other_worker.try_start(second, blocked=False)   # Not at the head of the queue
+    assert not upload.try_start(first, blocked=True)           # Held back by higher-priority work
+    assert upload.try_start(first, blocked=False)
+    assert not other_worker.try_start(second, blocked=False)   # Slot taken
+    upload.release(first, service_seconds=30)
+    assert other_worker.try_start(second, blocked=False)
+    assert upload.state()["service_seconds"] == pytest.approx(60 + 0.2 * (30 - 60))
+
+
+def test_expired_ticket_frees_its_slot(store, monkeypatch):
+    upload = SharedRequestClass("upload", 2, concurrency=1, max_queue=0, max_wait=0, service_seconds=60, store=store)
+    ticket = upload.reserve()
+    assert upload.try_start(ticket, blocked=False)
+    now = admission_module.time.time()
+    monkeypatch.setattr(admission_module.time, "time", lambda: now + admission_module.SHARED_LEASE_SECONDS + 1)
+    assert upload.state()["active"] == {}
+    assert upload.try_start(upload.reserve(), blocked=False)
+
+
+def test_heartbeat_exchange_sums_other_workers(store):
+    gate = controller(store)
+    store.set("admission", "worker:-1", {"chat": {"active": 2, "queued": 3}})
+    gate.classes["chat"].active = 1
+    remote, shared_queued = gate._exchange_depths()
+    assert remote == {"chat": {"active": 2, "queued": 3}}
+    assert shared_queued == {"upload": 0}
+    assert store.get("admission", f"worker:{admission_module.os.getpid()}") == {"chat": {"active": 1, "queued": 0}}
@@ -0,0 +1,86 @@
+"""
+test_chunk_dedup.py — Boilerplate page thresholds, SimHash banding and duplicate removal.
+"""
+
+import random
+
+import pytest
+
+import chunk_dedup
+from chunk_dedup import strip_boilerplate, dedup_chunks, _bands, SIMHASH_BITS, SIMHASH_MAX_DISTANCE
+
+
+def paged(pages: list[str]) -> str:
+    return "\n".join(f"{{{i}}}------------------------------------------------\n{page}" for i, page in enumerate(pages))
+
+
+def test_footer_on_enough_pages_is_removed():
+    pages = [f"Content of page {i} is unique text.\nConfidential - Page {i} of 10" for i in range(10)]
+    text, removed = strip_boilerplate(paged(pages))
+    assert removed == 10
+    assert "confidential" not in text
+    assert "Content of page 7 is unique text." in text
+
+
+def test_line_below_page_thresholds_is_kept(monkeypatch):
+    monkeypatch.setattr(chunk_dedup, "BOILERPLATE_MIN_PAGES", 3)
+    monkeypatch.setattr(chunk_dedup, "BOILERPLATE_MIN_FRACTION", 0.3)
+    pages = [f"Body text of page {i} with its own distinct words." for i in range(10)]
+    for i in (1, 5):                          # 2 of 10 pages: below BOILERPLATE_MIN_PAGES
+        pages[i] += "\nSee the appendix for details."
+    for i in (2, 4, 6):                       # 3 of 10 pages: meets both thresholds
+        pages[i] += "\nDraft version, do not cite."
+    text, removed = strip_boilerplate(paged(pages))
+    assert text.count("See the appendix for details.") == 2
+    assert "Draft version" not in text and removed == 3
+
+    monkeypatch.setattr(chunk_dedup, "BOILERPLATE_MIN_FRACTION", 0.5)   # Now needs 5 of 10 pages
+    assert strip_boilerplate(paged(pages))[1] == 0
+
+
+def test_documents_without_enough_pages_are_untouched():
+    markdown = paged(["Header line here\nA", "Header line here\nB"])
+    assert strip_boilerplate(markdown) == (markdown, 0)
+    assert strip_boilerplate("no separators\nno separators\nno separators")[1] == 0
+
+
+def test_long_lines_differing_in_numbers_are_content():
+    pages = [f"The measured value in experiment run was {i} units overall today." for i in range(6)]
+    assert strip_boilerplate(paged(pages))[1] == 0
+
+
+def test_near_duplicates_always_share_a_band():
+    rng = random.Random(0)
+    for _ in range(500):
+        fingerprint = rng.getrandbits(SIMHASH_BITS)
+        flipped = fingerprint
+        for bit in rng.sample(range(SIMHASH_BITS), SIMHASH_MAX_DISTANCE):
+            flipped ^= 1 << bit
+        assert set(_bands(fingerprint)) & set(_bands(flipped))
+
+
+WORDS = ("graph neural networks molecule property prediction benchmark dataset training "
+         "validation split protein ligand binding affinity docking score attention layer "
+         "message passing readout pooling regression error baseline model").split()
+# A chunk-sized passage (~150 words); one-word edits stay within SIMHASH_MAX_DISTANCE.
+CHUNK = " ".join(random.Random(1).choice(WORDS) for _ in range(150)) + " every year"
+
+
+def test_exact_and_near_duplicates_are_absorbed():
+    chunks = [
+        (f"Intro\n\n{CHUNK}", {"section": "Intro", "chunk_index": 0}),
+        (f"Other\n\n{CHUNK.upper()}!", {"section": "Other", "chunk_index": 1}),
+        (CHUNK.replace("every year", "each year"), {"section": "", "chunk_index": 2}),
+        ("Completely unrelated text about the cafeteria menu and opening hours on weekends.",
+         {"section": "", "chunk_index": 3}),
+    ]
+    kept, stats = dedup_chunks(chunks)
+    assert stats == {"exact": 1, "near": 1}
+    assert [metadata["chunk_index"] for _, metadata in kept] == [0, 3]
+    assert kept[0][1]["duplicates_absorbed"] == 2
+    assert kept[1][1]["duplicates_absorbed"] == 0
+
+
+def test_short_chunks_only_match_exactly():
+    kept, stats = dedup_chunks([("Table 1: results", {}), ("Table 2: results", {})])
+    assert len(kept) == 2 and stats == {"exact": 0, "near": 0}
@@ -0,0 +1,79 @@
+"""
+test_conversation_store.py — History window, overflow claiming and summary folding.
+"""
+
+import pytest
+
+from Backend import conversation_store
+from Backend.conversation_store import ConversationStore
+from Backend.shared_state import SharedStore
+
+
+@pytest.fixture
+def conversations(tmp_path, monkeypatch):
+    monkeypatch.setattr(conversation_store, "HISTORY_WINDOW_TURNS", 2)
+    monkeypatch.setattr(conversation_store, "SUMMARY_BATCH_TURNS", 2)
+    return ConversationStore(SharedStore(tmp_path / "state.sqlite3"))
+
+
+def add_turns(conversations, n):
+    for i in range(n):
+        conversations.add_turn("c", f"q{i}", f"a{i}")
+
+
+def test_recent_turns_are_the_window(conversations):
+    add_turns(conversations, 3)
+    conversation = conversations.get("c")
+    assert conversation.questions == ["q0", "q1", "q2"]
+    assert [turn["question"] for turn in conversation.recent_turns()] == ["q1", "q2"]
+
+
+def test_overflow_waits_for_a_full_batch(conversations):
+    add_turns(conversations, 3)                    # One turn outside the window
+    assert conversations.take_overflow("c") == ("", [])
+    add_turns(conversations, 1)
+    summary, turns = conversations.take_overflow("c")
+    assert [turn["question"] for turn in turns] == ["q0", "q1"]
+
+
+def test_running_summary_is_not_claimed_twice(conversations):
+    add_turns(conversations, 4)
+    assert len(conversations.take_overflow("c")[1]) == 2
+    assert conversations.take_overflow("c")[1] == []
+
+
+def test_fold_replaces_summary_and_drops_turns(conversations):
+    add_turns(conversations, 4)
+    _, turns = conversations.take_overflow("c")
+    conversations.fold("c", "they asked about q0 and q1", len(turns))
+    conversation = conversations.get("c")
+    assert conversation.summary == "they asked about q0 and q1"
+    assert [turn["question"] for turn in conversation.turns] == ["q2", "q3"]
+    assert conversation.questions == ["q0", "q1", "q2", "q3"]   # Questions are kept for lookups
+    assert conversation.summarizing_since is None
+
+
+def test_failed_summary_keeps_turns_and_allows_retry(conversations):
+    add_turns(conversations, 4)
+    conversations.take_overflow("c")
+    conversations.fold("c", None, 2)
+    assert len(conversations.get("c").turns) == 4
+    assert len(conversations.take_overflow("c")[1]) == 2
+
+
+def test_seed_only_fills_empty_conversations(conversations):
+    history = [
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "hi"},
+        {"role": "user", "content": "unanswered"},
+    ]
+    conversation = conversations.seed("c", history)
+    assert conversation.questions == ["hello", "unanswered"]
+    assert conversation.turns == [{"question": "hello", "answer": "hi"}]
+    assert conversations.seed("c", [{"role": "user", "content": "other"}]).questions == ["hello", "unanswered"]
+
+
+def test_delete(conversations):
+    add_turns(conversations, 1)
+    conversations.delete("c")
+    assert conversations.get("c").is_empty()
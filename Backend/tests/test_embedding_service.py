@@ -0,0 +1,52 @@
+"""
+test_embedding_service.py — Micro-batching: results, priorities and concurrent start-up.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from Backend.embedding_service import EmbeddingService
+
+
+class FakeModel:
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+def test_results_match_inputs():
+    service = EmbeddingService(FakeModel(), max_batch=4, max_wait_ms=1)
+    assert service.embed_query("abc") == [3.0]
+    assert service.embed_documents(["a", "bb", "cccccc"]) == [[1.0], [2.0], [6.0]]
+
+
+def test_concurrent_first_calls_start_one_dispatcher(monkeypatch):
+    service = EmbeddingService(FakeModel(), max_batch=64, max_wait_ms=20)
+    started = []
+    original = service._dispatch_forever
+    monkeypatch.setattr(service, "_dispatch_forever", lambda: (started.append(1), original()))
+    barrier = threading.Barrier(16)
+
+    def call(i):
+        barrier.wait()
+        return service.embed_query("x" * i)
+
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(call, range(16)))
+    assert results == [[float(i)] for i in range(16)]
+    assert len(started) == 1
+
+
+def test_interactive_texts_go_first():
+    model = FakeModel()
+    service = EmbeddingService(model, max_batch=2, max_wait_ms=50)
+    service._ensure_dispatcher()
+    with service._cond:                  # Hold the dispatcher while both queues fill
+        bulk = service._submit(["b1", "b2", "b3"], "bulk")
+        query = service._submit(["q"], "interactive")
+    assert query[0].result() == [1.0]
+    assert [f.result() for f in bulk] == [[2.0]] * 3
+    assert model.batches[0][0] == "q"
@@ -0,0 +1,47 @@
+"""
+test_image_prep.py — Image filtering, and what happens when an image fails to prepare.
+"""
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from Backend import image_prep
+from Backend.image_prep import prepare_images, rewrite_image_links
+
+
+def noise(width, height):
+    return Image.effect_noise((width, height), 64).convert("RGB")
+
+
+def test_drops_icons_and_keeps_figures(tmp_path):
+    images = {"_page_1_Picture_0.jpeg": noise(16, 16), "_page_1_Figure_1.jpeg": noise(400, 300)}
+    dropped, renamed, stats = prepare_images(images, tmp_path)
+    assert dropped == {"_page_1_Picture_0.jpeg"}
+    assert stats["kept"] == 1 and stats["dropped"] == 1
+    written = renamed.get("_page_1_Figure_1.jpeg", "_page_1_Figure_1.jpeg")
+    assert (tmp_path / written).stat().st_size == stats["bytes_after"]
+
+
+def test_failed_shrink_saves_original(tmp_path, monkeypatch):
+    def broken(image):
+        raise OSError("encoder failed")
+
+    monkeypatch.setattr(image_prep, "shrink", broken)
+    dropped, renamed, stats = prepare_images({"_page_2_Figure_0.png": noise(400, 300)}, tmp_path)
+    assert dropped == set() and renamed == {}
+    assert (tmp_path / "_page_2_Figure_0.png").exists()
+    assert stats["kept"] == 1
+
+
+def test_unsavable_image_is_dropped_from_markdown(tmp_path, monkeypatch):
+    def broken(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(image_prep, "shrink", broken)
+    monkeypatch.setattr(image_prep, "_save_original", broken)
+    dropped, _, stats = prepare_images({"_page_3_Figure_0.jpeg": noise(400, 300)}, tmp_path)
+    assert dropped == {"_page_3_Figure_0.jpeg"}
+    assert stats["dropped"] == 1
+    markdown = "Intro\n![](_page_3_Figure_0.jpeg)\nEnd"
+    assert rewrite_image_links(markdown, dropped, {}) == "Intro\n\nEnd"
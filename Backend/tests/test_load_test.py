@@ -0,0 +1,37 @@
+"""
+test_load_test.py — Per-stage breakdown parsed from two /metrics scrapes.
+"""
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("itsdangerous")
+
+from Backend.telemetry import Histogram
+from Backend.benchmarks.load_test import parse_stage_histograms, stage_breakdown
+
+
+def scrape(histogram: Histogram) -> dict:
+    return parse_stage_histograms("\n".join(histogram.render()))
+
+
+def test_stage_breakdown_counts_only_observations_between_scrapes():
+    histogram = Histogram("rag_stage_duration_seconds", "test", buckets=(0.1, 0.5, 1))
+    histogram.observe(0.05, stage="embed_query")
+    before = scrape(histogram)
+    for _ in range(19):
+        histogram.observe(0.3, stage="llm_qa")
+    histogram.observe(0.9, stage="llm_qa")
+    after = scrape(histogram)
+
+    breakdown = stage_breakdown(before, after)
+    assert "embed_query" not in breakdown
+    assert breakdown["llm_qa"]["count"] == 20
+    assert breakdown["llm_qa"]["mean_ms"] == pytest.approx(330.0)
+    assert breakdown["llm_qa"]["p95_le_ms"] == 500.0
+
+
+def test_other_metrics_are_ignored():
+    other = Histogram("embedding_batch_size", "test", buckets=(1, 2))
+    other.observe(1, priority="bulk")
+    assert parse_stage_histograms("\n".join(other.render())) == {}
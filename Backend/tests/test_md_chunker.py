@@ -0,0 +1,70 @@
+"""
+test_md_chunker.py — Section paths, pages, token budgets and table/code handling.
+"""
+
+from Backend.md_chunker import chunk_markdown
+
+
+def count_words(text):
+    return len(text.split())
+
+
+DOCUMENT = """<span id="page-0-0"></span># Thesis
+
+Intro paragraph.
+
+## Methods
+
+We measured things.
+
+{1}------------------------------------------------
+
+## Results
+
+| Model | Score |
+|-------|-------|
+| A | 1 |
+| B | 2 |
+
+```
+print("kept whole")
+```
+"""
+
+
+def test_sections_and_pages():
+    chunks = chunk_markdown(DOCUMENT, count_words, max_tokens=100)
+    sections = [metadata["section"] for _, metadata in chunks]
+    assert sections == ["Thesis", "Thesis > Methods", "Thesis > Results"]
+    assert [metadata.get("page") for _, metadata in chunks] == [1, 1, 2]
+    assert [metadata["chunk_index"] for _, metadata in chunks] == [0, 1, 2]
+    assert chunks[1][0] == "Thesis > Methods\n\nWe measured things."
+
+
+def test_tables_and_code_stay_whole_when_they_fit():
+    results = chunk_markdown(DOCUMENT, count_words, max_tokens=100)[2][0]
+    assert "| Model | Score |\n|-------|-------|\n| A | 1 |\n| B | 2 |" in results
+    assert '```\nprint("kept whole")\n```' in results
+
+
+def test_chunks_respect_the_token_budget():
+    text = "# Long\n\n" + " ".join(f"Sentence number {i} ends here." for i in range(200))
+    chunks = chunk_markdown(text, count_words, max_tokens=50)
+    assert len(chunks) > 1
+    assert all(count_words(chunk) <= 50 for chunk, _ in chunks)
+    assert all(chunk.startswith("Long\n\n") for chunk, _ in chunks)
+
+
+def test_oversized_table_repeats_its_header():
+    rows = "\n".join(f"| name {i} | value {i} |" for i in range(60))
+    text = f"# T\n\n| Name | Value |\n|---|---|\n{rows}\n"
+    chunks = chunk_markdown(text, count_words, max_tokens=60)
+    assert len(chunks) > 1
+    for chunk, _ in chunks:
+        assert "| Name | Value |\n|---|---|" in chunk
+        assert count_words(chunk) <= 60
+
+
+def test_text_before_first_heading_has_no_section():
+    chunks = chunk_markdown("Preface text.\n\n# Body\n\nMain text.", count_words)
+    assert chunks[0] == ("Preface text.", {"section": "", "chunk_index": 0})
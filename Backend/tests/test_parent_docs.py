@@ -0,0 +1,86 @@
+"""
+test_parent_docs.py — Child splitting and mapping ranked children back to parent records.
+"""
+
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.documents import Document
+
+from Backend import parent_docs
+from Backend.parent_docs import (
+    load_parents, split_records, expand_to_parents, parent_id, PARENT_ID_KEY, CHILD_INDEX_KEY,
+)
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def record(name, kind, content, branch="cse"):
+    return {"page_content": content, "branch": branch, "metadata": {"source": name, "type": kind, "name": name}}
+
+
+PUBLICATIONS = "Publications by Dr. A:\n" + "\n".join(f"Paper {i} on topic {i} in a journal." for i in range(40))
+DATA = [
+    record("Dr. A", "profile_summary", "Dr. A is a professor of computer science."),
+    record("Dr. A", "publications", PUBLICATIONS),
+    record("Dr. B", "profile_summary", "Dr. B works on networks."),
+    {"note": "records without page_content are ignored"},
+]
+
+
+def children_of(data, max_tokens=40):
+    return split_records(data, count_words, max_tokens=max_tokens)
+
+
+def test_long_records_split_into_headed_children():
+    children = children_of(DATA)
+    publications = [(text, meta) for text, meta in children if meta["type"] == "publications"]
+    assert len(publications) > 1
+    assert all(text.startswith("Publications by Dr. A:\n") for text, _ in publications)
+    assert all(count_words(text) <= 40 for text, _ in publications)
+    assert [meta[CHILD_INDEX_KEY] for _, meta in publications] == list(range(len(publications)))
+    assert {meta[PARENT_ID_KEY] for _, meta in publications} == {parent_id(DATA[1])}
+    assert len(children) == len(publications) + 2
+
+
+def ranked(children, rows, score=0.9):
+    return [(Document(page_content=children[i][0], metadata=children[i][1]), score - 0.01 * n)
+            for n, i in enumerate(rows)]
+
+
+def test_children_collapse_into_one_parent_with_its_profile():
+    children = children_of(DATA)
+    parents, profiles = load_parents(DATA)
+    hits = ranked(children, [2, 3, 1])                 # Three children of the publications record
+    results = expand_to_parents(hits, parents, profiles, k=4)
+    assert [doc.page_content for doc, _ in results] == [PUBLICATIONS, DATA[0]["page_content"]]
+    assert results[0][1] == pytest.approx(0.9)
+    assert results[1][1] == pytest.approx(0.9)        # Profile scored as the record that linked to it
+
+
+def test_oversized_parent_is_represented_by_matched_children(monkeypatch):
+    monkeypatch.setattr(parent_docs, "PARENT_MAX_CHARS", 200)
+    children = children_of(DATA)
+    parents, profiles = load_parents(DATA)
+    results = expand_to_parents(ranked(children, [3, 1]), parents, profiles, k=1)
+    content = results[0][0].page_content
+    assert content.startswith("Publications by Dr. A:\n")
+    assert content.count("Publications by Dr. A:") == 1
+    assert "\n...\n" in content
+    assert content.index(children[1][0].split("\n", 1)[1]) < content.index(children[3][0].split("\n", 1)[1])
+
+
+def test_context_budget_and_k_are_respected():
+    children = children_of(DATA)
+    parents, profiles = load_parents(DATA)
+    hits = ranked(children, [0, 1, 2])
+    results = expand_to_parents(hits, parents, profiles, k=2, max_chars=len(DATA[0]["page_content"]) + 10)
+    assert [doc.page_content for doc, _ in results] == [DATA[0]["page_content"]]
+
+
+def test_documents_without_parent_pass_through():
+    parents, profiles = load_parents(DATA)
+    legacy = Document(page_content="old whole-record chunk", metadata={"source": "x"})
+    assert expand_to_parents([(legacy, 0.5)], parents, profiles, k=3) == [(legacy, 0.5)]
@@ -0,0 +1,42 @@
+"""
+test_select_by_score.py — Adaptive retrieval depth: score floor, gap cut and [min_k, max_k] clamp.
+"""
+
+from Backend.rag_components import select_by_score
+
+
+def pairs(*scores):
+    return [(f"doc{i}", score) for i, score in enumerate(scores)]
+
+
+def names(kept):
+    return [doc for doc, _ in kept]
+
+
+def test_keeps_run_above_floor():
+    kept = select_by_score(pairs(0.9, 0.8, 0.7, 0.3, 0.2), min_k=1, max_k=10, min_score=0.5, max_gap=1)
+    assert names(kept) == ["doc0", "doc1", "doc2"]
+
+
+def test_cuts_at_large_gap():
+    kept = select_by_score(pairs(0.9, 0.88, 0.6, 0.59), min_k=1, max_k=10, min_score=0, max_gap=0.1)
+    assert names(kept) == ["doc0", "doc1"]
+
+
+def test_min_k_kept_even_below_floor():
+    kept = select_by_score(pairs(0.2, 0.1, 0.05), min_k=2, max_k=10, min_score=0.5, max_gap=1)
+    assert names(kept) == ["doc0", "doc1"]
+
+
+def test_max_k_caps_depth():
+    kept = select_by_score(pairs(*[0.9] * 8), min_k=1, max_k=5, min_score=0, max_gap=1)
+    assert len(kept) == 5
+
+
+def test_input_is_ranked_best_first():
+    kept = select_by_score(pairs(0.4, 0.9, 0.85), min_k=1, max_k=10, min_score=0.5, max_gap=1)
+    assert kept == [("doc1", 0.9), ("doc2", 0.85)]
+
+
+def test_empty_candidates():
+    assert select_by_score([], min_k=2, max_k=5, min_score=0, max_gap=1) == []
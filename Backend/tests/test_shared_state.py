@@ -0,0 +1,73 @@
+"""
+test_shared_state.py — SharedStore: expiry, atomic updates, namespaces and leases.
+"""
+
+import threading
+import time
+
+import pytest
+
+from Backend.shared_state import SharedStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SharedStore(tmp_path / "state.sqlite3")
+
+
+def test_get_set_delete(store):
+    assert store.get("ns", "missing", "default") == "default"
+    store.set("ns", "key", {"a": [1, 2]})
+    assert store.get("ns", "key") == {"a": [1, 2]}
+    store.delete("ns", "key")
+    assert store.get("ns", "key") is None
+
+
+def test_expired_entries_are_invisible_and_purged(store, monkeypatch):
+    store.set("ns", "short", 1, ttl=10)
+    store.set("ns", "forever", 2)
+    now = time.time()
+    monkeypatch.setattr("Backend.shared_state.time.time", lambda: now + 60)
+    assert store.get("ns", "short") is None
+    assert store.items("ns") == {"forever": 2}
+    store.purge_expired()
+    assert store.items("ns") == {"forever": 2}
+
+
+def test_items_and_clear_are_per_namespace(store):
+    store.set("a", "x", 1)
+    store.set("a", "y", 2)
+    store.set("b", "x", 3)
+    assert store.items("a") == {"x": 1, "y": 2}
+    store.clear("a")
+    assert store.items("a") == {}
+    assert store.items("b") == {"x": 3}
+
+
+def test_update_is_atomic_across_threads(store):
+    def bump():
+        for _ in range(50):
+            store.update("ns", "counter", lambda current: current + 1, default=0)
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get("ns", "counter") == 200
+
+
+def test_update_returning_none_deletes(store):
+    store.set("ns", "key", 1)
+    assert store.update("ns", "key", lambda current: None) is None
+    assert store.get("ns", "key") is None
+
+
+def test_lease_held_until_expiry(store, monkeypatch):
+    assert store.acquire_lease("job", ttl=30)
+    assert store.acquire_lease("job", ttl=30)          # Re-entrant for the holder
+    monkeypatch.setattr("Backend.shared_state.os.getpid", lambda: -1)
+    assert not store.acquire_lease("job", ttl=30)      # Another process while it is held
+    now = time.time()
+    monkeypatch.setattr("Backend.shared_state.time.time", lambda: now + 60)
+    assert store.acquire_lease("job", ttl=30)          # Taken over once expired
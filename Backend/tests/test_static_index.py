@@ -0,0 +1,93 @@
+"""
+test_static_index.py — Exact top-k search, the float16 mmap cache and mode validation.
+"""
+
+import importlib
+
+import numpy as np
+import pytest
+
+from Backend import static_index
+from Backend.static_index import StaticVectorIndex
+
+
+class FakeCollection:
+    """The parts of a Chroma collection that from_collection() reads."""
+
+    def __init__(self, vectors, id="c1", metadata=None):
+        self.id = id
+        self.metadata = metadata or {"ingest_version": 1}
+        self.vectors = vectors
+        self.gets = 0
+
+    def count(self):
+        return len(self.vectors)
+
+    def get(self, include):
+        self.gets += 1
+        return {
+            "embeddings": self.vectors,
+            "documents": [f"doc {i}" for i in range(len(self.vectors))],
+            "metadatas": [{"row": i} for i in range(len(self.vectors))],
+        }
+
+
+def random_vectors(n=300, dim=32, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def brute_force(vectors, query, k):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = vectors @ (query / np.linalg.norm(query))
+    return list(np.argsort(-scores)[:k])
+
+
+def test_memory_search_matches_brute_force():
+    vectors = random_vectors()
+    index = StaticVectorIndex.from_collection(FakeCollection(vectors), mode="memory")
+    query = random_vectors(1, seed=1)[0]
+    hits = index.search(query, k=5)
+    assert [row for row, _ in hits] == brute_force(vectors, query, 5)
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+
+def test_mmap_blocks_match_float32_search(tmp_path, monkeypatch):
+    monkeypatch.setattr(static_index, "SEARCH_BLOCK_ROWS", 64)   # Several blocks, last one partial
+    vectors = random_vectors()
+    memory = StaticVectorIndex.from_collection(FakeCollection(vectors), mode="memory")
+    mapped = StaticVectorIndex.from_collection(FakeCollection(vectors), mode="mmap", cache_dir=tmp_path)
+    assert mapped.vectors.dtype == np.float16
+    queries = random_vectors(3, seed=2)
+    for exact, approx in zip(memory.search_batch(queries, 10), mapped.search_batch(queries, 10)):
+        assert [row for row, _ in exact][:3] == [row for row, _ in approx][:3]
+        assert np.allclose([s for _, s in exact], [s for _, s in approx], atol=1e-2)
+
+
+def test_mmap_cache_reused_until_fingerprint_changes(tmp_path):
+    vectors = random_vectors(50)
+    StaticVectorIndex.from_collection(FakeCollection(vectors), mode="mmap", cache_dir=tmp_path)
+
+    same = FakeCollection(vectors)
+    cached = StaticVectorIndex.from_collection(same, mode="mmap", cache_dir=tmp_path)
+    assert same.gets == 0 and len(cached) == 50
+
+    reingested = FakeCollection(vectors, id="c2")
+    StaticVectorIndex.from_collection(reingested, mode="mmap", cache_dir=tmp_path)
+    assert reingested.gets == 1
+
+
+def test_k_larger_than_index_and_empty_index():
+    index = StaticVectorIndex.from_collection(FakeCollection(random_vectors(3)), mode="memory")
+    assert len(index.search(random_vectors(1)[0], k=10)) == 3
+    empty = StaticVectorIndex(np.zeros((0, 32), dtype=np.float32), [], [])
+    assert empty.search_batch(random_vectors(2), 5) == [[], []]
+
+
+def test_unknown_mode_is_rejected(monkeypatch):
+    with pytest.raises(ValueError):
+        StaticVectorIndex.from_collection(FakeCollection(random_vectors(3)), mode="disk")
+    monkeypatch.setenv("STATIC_INDEX", "memmap")
+    with pytest.raises(ValueError, match="STATIC_INDEX"):
+        importlib.reload(static_index)
+    monkeypatch.setenv("STATIC_INDEX", "off")
+    importlib.reload(static_index)
@@ -0,0 +1,29 @@
+"""
+test_user_storage.py — Per-document user collections: naming and quota eviction.
+"""
+
+from Backend.rag_components import (
+    get_user_collection_name,
+    document_collection_name,
+    select_quota_evictions,
+    _collection_owner,
+)
+
+
+def test_document_collection_name_matches_legacy_scheme():
+    user = get_user_collection_name("1093-user@example")
+    assert user == "u_1093userexample"
+    assert document_collection_name(user, "My_Paper.v2") == "u_1093userexample_My_Paper.v2"
+    assert len(document_collection_name(user, "x" * 80)) == 63
+
+
+def test_collection_owner_is_user_prefix():
+    user = get_user_collection_name("42")
+    assert _collection_owner(document_collection_name(user, "notes_week_1")) == user
+
+
+def test_quota_evicts_oldest_until_under_limit():
+    documents = [("new", 300, 30.0), ("old", 400, 10.0), ("mid", 500, 20.0)]
+    assert select_quota_evictions(documents, max_chunks=1000) == ["old"]
+    assert select_quota_evictions(documents, max_chunks=300) == ["old", "mid"]
+    assert select_quota_evictions(documents, max_chunks=1200) == []
@@ -0,0 +1,32 @@
+/**
+ * pcm-worklet.js — AudioWorklet that streams microphone audio as 16-bit PCM.
+ *
+ * Runs inside an AudioContext created at 16 kHz, so the browser does the
+ * resampling. Every ~100 ms of samples is converted to Int16 and posted to
+ * the main thread, which forwards it over the /ws/transcribe WebSocket.
+ */
+
+class PcmCaptureProcessor extends AudioWorkletProcessor {
+  constructor() {
+    super();
+    this.buffer = new Int16Array(1600);   // 100 ms at 16 kHz
+    this.offset = 0;
+  }
+
+  process(inputs) {
+    const channel = inputs[0] && inputs[0][0];
+    if (!channel) return true;
+
+    for (let i = 0; i < channel.length; i++) {
+      const s = Math.max(-1, Math.min(1, channel[i]));
+      this.buffer[this.offset++] = s < 0 ? s * 0x8000 : s * 0x7fff;
+      if (this.offset === this.buffer.length) {
+        this.port.postMessage(this.buffer.buffer.slice(0));
+        this.offset = 0;
+      }
+    }
+    return true;
+  }
+}
+
+registerProcessor('pcm-capture', PcmCaptureProcessor);
@@ -22,6 +22,8 @@ let currentCollectionName = sessionStorage.getItem('activeCollectionName') || nu
 // In-memory chat history array, its storage key, and guest flag.
 let conversationHistory = [];
 let historyStorageKey = null;
+// Whether the server already holds this conversation (see sendMessage).
+let historySynced = false;
 let isGuestUser = false;
 
 // Return current time as a short "HH:MM" string for message timestamps.
@@ -120,8 +122,26 @@ function displayMessage(template, text, isUser = false) {
 }
 
 // --- 3. SEND MESSAGE ---
-// Send user's message to /chat with last 10 history items and the active
-// collection name. Shows a typing indicator while waiting, then displays
+// If chat requests are queued on the server, show the expected wait next to
+// the typing indicator (from /queue-status, see admission.py).
+async function showWaitEstimate(typingClone) {
+  try {
+    const queue = await (await fetch('/queue-status')).json();
+    const wait = Math.ceil(queue.chat.wait_seconds);
+    if (wait > 0 && chatContainer.contains(typingClone)) {
+      const note = document.createElement('span');
+      note.className = 'font-body text-xs text-on-surface-variant self-center';
+      note.textContent = `Busy — about ${wait} s wait`;
+      typingClone.querySelector('.msg-row').appendChild(note);
+    }
+  } catch (error) {
+    console.error(error);
+  }
+}
+
+// Send user's message to /chat with the active collection name. History
+// lives server-side; the stored local history is sent only with the first
+// message of a page load so the server can restore it after a restart. Shows a typing indicator while waiting, then displays
 // the bot's response and persists both messages to history.
 async function sendMessage() {
   const message = messageInput.value.trim();
@@ -131,7 +151,7 @@ async function sendMessage() {
   messageInput.value = '';
 
   // Capture last 10 messages as context BEFORE adding the current one
-  const historySlice = conversationHistory.slice(-10);
+  const historySlice = historySynced ? [] : conversationHistory.slice(-10);
 
   conversationHistory.push({ role: 'user', content: message });
   saveHistory();
@@ -142,6 +162,7 @@ async function sendMessage() {
   typingClone.classList.remove('hidden');
   chatContainer.appendChild(typingClone);
   chatContainer.scrollTop = chatContainer.scrollHeight;
+  showWaitEstimate(typingClone);
 
   try {
     const response = await fetch('/chat', {
@@ -152,8 +173,17 @@ async function sendMessage() {
 
     chatContainer.removeChild(typingClone);
 
+    if (response.status === 429) {
+      // Shed by the server's admission control: tell the user how long to wait.
+      const retryAfter = response.headers.get('Retry-After') || '10';
+      displayMessage(botMessageTemplate, `The server is busy right now. Please try again in about ${retryAfter} seconds.`);
+      conversationHistory.pop();
+      saveHistory();
+      return;
+    }
     if (!response.ok) throw new Error('Network response was not ok');
     const data = await response.json();
+    historySynced = true;
     displayMessage(botMessageTemplate, data.answer);
 
     conversationHistory.push({ role: 'assistant', content: data.answer });
@@ -167,48 +197,142 @@ async function sendMessage() {
 }
 
 // --- 4. MICROPHONE LOGIC ---
-// Toggle voice recording on button click. Uses MediaRecorder API to capture
-// audio in WebM format, sends to /transcribe-audio/ for speech-to-text,
-// then auto-sends the transcribed text as a chat message.
+// Toggle voice recording on button click. Where AudioWorklet is available the
+// microphone is streamed as 16 kHz PCM over the /ws/transcribe WebSocket and
+// partial transcripts appear in the input box while the user speaks; the
+// finalized text is sent as a chat message when recording stops. Older
+// browsers fall back to recording a WebM clip and uploading it to
+// /transcribe-audio/.
 let isRecording = false;
 let mediaRecorder;
 let audioChunks = [];
+let streamingSession = null;
+
+const canStreamAudio = typeof AudioWorkletNode !== 'undefined' && typeof WebSocket !== 'undefined';
+
+// Open the transcription socket and pipe microphone PCM frames into it.
+async function startStreamingTranscription(stream) {
+  const audioContext = new AudioContext({ sampleRate: 16000 });
+  await audioContext.audioWorklet.addModule('/static/pcm-worklet.js');
+  const source = audioContext.createMediaStreamSource(stream);
+  const worklet = new AudioWorkletNode(audioContext, 'pcm-capture');
+
+  const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+  const socket = new WebSocket(`${protocol}://${window.location.host}/ws/transcribe`);
+  socket.binaryType = 'arraybuffer';
+
+  const session = { stream, audioContext, socket, finals: [], partial: '' };
+  const showTranscript = () => {
+    messageInput.value = [...session.finals, session.partial].filter(Boolean).join(' ');
+  };
+
+  socket.onmessage = (event) => {
+    const data = JSON.parse(event.data);
+    if (data.type === 'partial') {
+      session.partial = data.text;
+      showTranscript();
+    } else if (data.type === 'final') {
+      if (data.text) session.finals.push(data.text);
+      session.partial = '';
+      showTranscript();
+    } else if (data.type === 'error') {
+      // An utterance was dropped because the speech service stayed busy.
+      session.partial = '';
+      showTranscript();
+      displayMessage(botMessageTemplate, data.text);
+    } else if (data.type === 'done') {
+      socket.close();
+      if (messageInput.value.trim()) {
+        sendMessage();
+      } else {
+        displayMessage(botMessageTemplate, "Could not understand audio.");
+      }
+    }
+  };
+
+  // 1013 = the server's transcription budget is full (admission control).
+  socket.onclose = (event) => {
+    if (event.code === 1013) {
+      stream.getTracks().forEach(t => t.stop());
+      audioContext.close();
+      voiceBtn.classList.remove('recording');
+      isRecording = false;
+      streamingSession = null;
+      displayMessage(botMessageTemplate, "Voice input is busy right now. Please try again in a few seconds.");
+    }
+  };
 
-voiceBtn.addEventListener('click', async () => {
-  if (isRecording) {
-    voiceBtn.classList.remove('recording');
-    isRecording = false;
-    if (mediaRecorder) mediaRecorder.stop();
+  worklet.port.onmessage = (event) => {
+    if (socket.readyState === WebSocket.OPEN) socket.send(event.data);
+  };
+  source.connect(worklet);
+
+  messageInput.value = '';
+  return session;
+}
+
+// Stop capturing and ask the server to finalize the open utterance.
+function stopStreamingTranscription(session) {
+  session.stream.getTracks().forEach(t => t.stop());
+  session.audioContext.close();
+  if (session.socket.readyState === WebSocket.OPEN) {
+    session.socket.send(JSON.stringify({ type: 'stop' }));
   } else {
-    try {
-      const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-      mediaRecorder = new MediaRecorder(stream);
-      audioChunks = [];
+    session.socket.close();
+  }
+}
 
-      mediaRecorder.ondataavailable = e => audioChunks.push(e.data);
+// Fallback: record a whole WebM clip and upload it for transcription.
+function startClipRecording(stream) {
+  mediaRecorder = new MediaRecorder(stream);
+  audioChunks = [];
 
-      mediaRecorder.onstop = async () => {
-        const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
-        stream.getTracks().forEach(t => t.stop());
+  mediaRecorder.ondataavailable = e => audioChunks.push(e.data);
 
-        const formData = new FormData();
-        formData.append("audio_file", audioBlob, "recording.webm");
+  mediaRecorder.onstop = async () => {
+    const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
+    stream.getTracks().forEach(t => t.stop());
 
-        const loadingMsg = displayMessage(botMessageTemplate, "*Transcribing audio…*");
-        const res = await fetch("/transcribe-audio/", { method: "POST", body: formData });
-        const data = await res.json();
+    const formData = new FormData();
+    formData.append("audio_file", audioBlob, "recording.webm");
 
-        chatContainer.removeChild(loadingMsg);
+    const loadingMsg = displayMessage(botMessageTemplate, "*Transcribing audio…*");
+    const res = await fetch("/transcribe-audio/", { method: "POST", body: formData });
+    const data = await res.json();
 
-        if (data.text_english) {
-          messageInput.value = data.text_english;
-          sendMessage();
-        } else {
-          displayMessage(botMessageTemplate, "Could not understand audio.");
-        }
-      };
+    chatContainer.removeChild(loadingMsg);
+
+    if (res.status === 429) {
+      displayMessage(botMessageTemplate, data.detail);
+    } else if (data.text_english) {
+      messageInput.value = data.text_english;
+      sendMessage();
+    } else {
+      displayMessage(botMessageTemplate, "Could not understand audio.");
+    }
+  };
+
+  mediaRecorder.start();
+}
 
-      mediaRecorder.start();
+voiceBtn.addEventListener('click', async () => {
+  if (isRecording) {
+    voiceBtn.classList.remove('recording');
+    isRecording = false;
+    if (streamingSession) {
+      stopStreamingTranscription(streamingSession);
+      streamingSession = null;
+    } else if (mediaRecorder) {
+      mediaRecorder.stop();
+    }
+  } else {
+    try {
+      const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
+      if (canStreamAudio) {
+        streamingSession = await startStreamingTranscription(stream);
+      } else {
+        startClipRecording(stream);
+      }
       voiceBtn.classList.add('recording');
       isRecording = true;
     } catch (err) {
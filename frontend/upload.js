@@ -57,6 +57,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // --- Status Polling ---
     // Poll /status/{collectionName} every 2 seconds.
+    // On "queued" → show the wait estimate from /queue-status.
     // On "completed" → redirect to chat page. On "failed" → show error and re-enable upload.
     const pollProcessingStatus = async (collectionName) => {
         const intervalId = setInterval(async () => {
@@ -64,7 +65,16 @@ document.addEventListener('DOMContentLoaded', () => {
                 const res = await fetch(`/status/${collectionName}`);
                 const data = await res.json();
 
-                if (data.status === 'completed') {
+                if (data.status === 'queued') {
+                    // Waiting for an upload slot: show the server's wait estimate.
+                    const queue = await (await fetch('/queue-status')).json();
+                    const wait = Math.ceil(queue.upload.wait_seconds);
+                    statusMessage.textContent = wait > 0
+                        ? `⏳ Queued — processing starts in about ${wait} s.`
+                        : '⏳ Queued — starting shortly.';
+                } else if (data.status === 'processing') {
+                    statusMessage.textContent = '';
+                } else if (data.status === 'completed') {
                     clearInterval(intervalId);
                     window.location.href = '/chat'; // Redirect to Chat
                 } else if (data.status === 'failed') {